@@ -2,29 +2,179 @@ import streamlit as st
 import sys
 import os
 import json
+import time
+import uuid
+import threading
+from datetime import datetime
 from dotenv import load_dotenv
 
 # Añadir el directorio raíz al path y cargar .env
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 load_dotenv()
 
-from database.database_manager import db_manager
-from core.profile_parser import parse_cv_to_profile
-from core.orchestrator import run_full_pipeline
-from core.pdf_processor import convert_pdf_to_markdown
+# Solo se importan aquí los módulos ligeros. LangChain, Gemini y PyMuPDF (a través de `core.*`)
+# se importan dentro de cada acción que los necesita, para no retrasar el primer renderizado.
+from database.database_manager import get_db_manager, DEFAULT_USER_ID
 from app.profile_editor_ui import show_profile_editor
 
+# (clave en st.session_state['results'], sección del pipeline, título del expander)
+RESULT_SECTIONS = [
+    ("cv", "cv", "📄 CV Optimizado"),
+    ("cl", "cover_letter", "✉️ Carta de Presentación"),
+    ("ip", "interview_prep", "🎙️ Preparación de Entrevista")
+]
+NO_RESEARCH_TEXT = "No se seleccionó ninguna investigación."
+JOB_POLL_SECONDS = 1.5
+JOB_STATUS_ICONS = {"queued": "⏳", "running": "🔥", "done": "✅", "error": "❌"}
+METRICS_CACHE_SECONDS = 30
+PROFILE_CACHE_SECONDS = 10
+
 st.set_page_config(page_title="CareerForge AI - Final", layout="wide")
 st.image("https://www.gstatic.com/lamda/images/gemini/google_gemini_lockup_white_2x_web_pLPMff.png", width=200)
 st.title("🔥 CareerForge AI: Tu Co-piloto de Carrera")
 
-# Inicialización del Perfil
+@st.cache_resource
+def start_background_warm_up() -> threading.Thread:
+    """
+    Importa los módulos pesados y construye los clientes y cadenas compartidos en un hilo
+    de fondo, una sola vez por proceso, sin bloquear el primer renderizado de la página.
+    """
+    def run():
+        try:
+            from core.registry import warm_up
+            warm_up()
+        except Exception as e:
+            print(f"Advertencia: No se pudieron precalentar los modelos de IA: {e}")
+
+    thread = threading.Thread(target=run, name="careerforge-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_resource
+def load_db_manager():
+    """Prepara el esquema de la base de datos una sola vez por proceso."""
+    return get_db_manager()
+
+@st.cache_resource
+def load_job_workers():
+    """Arranca una sola vez por proceso el pool que ejecuta las generaciones en segundo plano."""
+    from core.jobs import start_job_workers
+    return start_job_workers()
+
+start_background_warm_up()
+db_manager = load_db_manager()
+load_job_workers()
+
+@st.cache_data(ttl=PROFILE_CACHE_SECONDS, show_spinner=False)
+def load_stored_profile(user_id: int) -> dict:
+    """
+    Perfil guardado del usuario. Se cachea entre reruns y sesiones (cada llamada devuelve una
+    copia, que la sesión puede editar) y se invalida al guardar con `save_stored_profile`.
+    Los guardados de otros procesos (`core.http_api`, `core.batch`) no pueden invalidarla: la
+    copia caduca a los `PROFILE_CACHE_SECONDS` segundos.
+    """
+    return load_db_manager().load_profile(user_id) or {}
+
+def save_stored_profile(profile_data: dict, user_id: int) -> dict:
+    """Guarda el perfil de forma incremental e invalida la copia cacheada."""
+    changes = db_manager.save_profile(profile_data, user_id)
+    load_stored_profile.clear()
+    return changes
+
+@st.cache_data(ttl=METRICS_CACHE_SECONDS, show_spinner=False)
+def load_stage_stats() -> list:
+    """Estadísticas por etapa; se recalculan como mucho cada `METRICS_CACHE_SECONDS` segundos."""
+    from core.telemetry import metrics_store
+    return metrics_store.stage_stats()
+
+def fragment(func):
+    """Fragmento de Streamlit: sus widgets solo vuelven a ejecutar la función, no toda la página."""
+    return st.fragment(func) if hasattr(st, "fragment") else func
+
+def auth_configured() -> bool:
+    """Indica si la autenticación de Streamlit (`[auth]` en `.streamlit/secrets.toml`) está configurada."""
+    try:
+        return hasattr(st, "login") and "auth" in st.secrets
+    except Exception:  # Sin archivo de secretos
+        return False
+
+def resolve_user_id() -> int:
+    """
+    El usuario sale siempre de una identidad autenticada, nunca de la URL. Con la autenticación
+    de Streamlit configurada, cada cuenta tiene su propio perfil (se pide iniciar sesión si no
+    la hay); sin ella, la instalación es local y de un solo usuario.
+    """
+    if not auth_configured():
+        return DEFAULT_USER_ID
+    current_user = st.user if hasattr(st, "user") else st.experimental_user
+    if not current_user.get("is_logged_in"):
+        st.info("Inicia sesión para trabajar con tu perfil.")
+        st.button("🔑 Iniciar sesión", on_click=st.login)
+        st.stop()
+    identity = current_user.get("email") or current_user.get("sub")
+    return load_db_manager().user_id_for_identity(identity)
+
+# Inicialización del Perfil (uno por usuario; cada sesión trabaja con el suyo)
+if 'user_id' not in st.session_state:
+    st.session_state['user_id'] = resolve_user_id()
+user_id = st.session_state['user_id']
 if 'profile' not in st.session_state:
-    st.session_state['profile'] = db_manager.load_profile() or {}
+    st.session_state['profile'] = load_stored_profile(user_id)
+
+@fragment
+def show_history_panel(user_id: int) -> None:
+    """Búsqueda en el historial: escribir una consulta solo vuelve a ejecutar este panel."""
+    from core.history import application_history
+    history_query = st.text_input(
+        "Buscar en tus paquetes anteriores", placeholder="Ej: Google data engineer", key="history_query"
+    )
+    matches = application_history.search(history_query, user_id=user_id, limit=10)
+    if not matches:
+        st.caption("Ningún paquete coincide con la búsqueda." if history_query
+                   else "Todavía no hay paquetes en el historial.")
+    for match in matches:
+        created = datetime.fromtimestamp(match['created_at']).strftime('%d/%m/%Y')
+        label = " · ".join(part for part in (match['company_name'], match['job_title'], created) if part)
+        if match.get('failed'):
+            label = f"⚠️ {label} (incompleto)"
+        if st.button(label, key=f"history_{match['id']}", use_container_width=True):
+            application = application_history.get(match['id'])
+            st.session_state['results'] = {
+                "cv": application['cv'], "cl": application['cover_letter'], "ip": application['interview_prep'],
+                "rc": application['research'] or NO_RESEARCH_TEXT, "folder": application['folder'],
+                "job_description": application['job_description'] or ""
+            }
+            st.session_state.pop('active_job', None)
+            st.rerun()
+        if match.get('snippet'):
+            st.caption(match['snippet'])
+
+@fragment
+def show_stage_stats() -> None:
+    """Panel de p50/p95 por etapa, con las estadísticas cacheadas unos segundos."""
+    stage_stats = load_stage_stats()
+    if not stage_stats:
+        st.caption("Aún no hay métricas: se registran con cada generación.")
+    else:
+        st.dataframe(
+            [
+                {
+                    "Etapa": stats['stage'], "N": stats['count'],
+                    "p50 (ms)": stats['p50_ms'], "p95 (ms)": stats['p95_ms'],
+                    "Tokens entrada": stats['avg_input_tokens'], "Tokens salida": stats['avg_output_tokens'],
+                    "Caché": f"{stats['cache_hit_rate']:.0%}", "Reintentos": stats['retries']
+                }
+                for stats in stage_stats
+            ],
+            hide_index=True, use_container_width=True
+        )
+        st.caption("Tokens medios estimados por ejecución, sobre las últimas ejecuciones de cada etapa.")
 
 # BARRA LATERAL
 with st.sidebar:
     st.header("👤 Gestión de Perfil")
+    if auth_configured():
+        st.button("Cerrar sesión", on_click=st.logout)
     
     st.subheader("Opción 1: Cargar Perfil desde PDF (Recomendado)")
     uploaded_pdf = st.file_uploader(
@@ -34,19 +184,20 @@ with st.sidebar:
     if uploaded_pdf:
         if st.button("Procesar PDF con IA"):
             with st.spinner("Leyendo PDF y contactando a la IA... Este proceso puede tardar un momento."):
-                # Paso 1: Convertir PDF a Markdown
-                markdown_cv = convert_pdf_to_markdown(uploaded_pdf)
-                
-                if not markdown_cv:
+                from core.ingestion_cache import ingest_pdf
+                # Extrae el texto, lo convierte a Markdown y puebla el perfil estructurado.
+                # Un archivo idéntico a uno ya procesado se recupera de la caché de ingesta.
+                ingestion = ingest_pdf(uploaded_pdf.getvalue())
+
+                if not ingestion['markdown']:
                     st.error("No se pudo extraer contenido del PDF.")
                 else:
-                    # Paso 2: Usar el Markdown para poblar el perfil estructurado
-                    st.info("PDF convertido a texto. Ahora extrayendo la estructura del perfil...")
-                    parsed_data = parse_cv_to_profile(markdown_cv)
+                    parsed_data = ingestion['profile']
                     if parsed_data:
                         st.session_state['profile'] = parsed_data
-                        db_manager.save_profile(parsed_data)
-                        st.success("¡Perfil actualizado desde el PDF con éxito!")
+                        save_stored_profile(parsed_data, user_id)
+                        st.success("¡Perfil recuperado de la caché de ingesta!" if ingestion['cached']
+                                   else "¡Perfil actualizado desde el PDF con éxito!")
                         st.rerun() # Recarga la app para que el editor muestre los datos
                     else:
                         st.error("No se pudo procesar la estructura del CV desde el texto convertido.")
@@ -61,23 +212,52 @@ with st.sidebar:
     if uploaded_text_cv:
         if st.button("Analizar archivo de texto"):
             with st.spinner("IA analizando tu CV..."):
+                from core.ingestion_cache import ingest_text
                 cv_text = uploaded_text_cv.read().decode("utf-8")
-                parsed_data = parse_cv_to_profile(cv_text)
+                ingestion = ingest_text(cv_text)
+                parsed_data = ingestion['profile']
                 if parsed_data:
                     st.session_state['profile'] = parsed_data
-                    db_manager.save_profile(parsed_data)
-                    st.success("¡Perfil actualizado desde el archivo de texto!")
+                    save_stored_profile(parsed_data, user_id)
+                    st.success("¡Perfil recuperado de la caché de ingesta!" if ingestion['cached']
+                               else "¡Perfil actualizado desde el archivo de texto!")
                     st.rerun()
                 else:
                     st.error("No se pudo procesar el archivo de texto.")
     
     st.markdown("---")
 
+    with st.expander("🗂️ Generaciones recientes"):
+        from core.jobs import job_queue
+        recent_jobs = job_queue.list_jobs(user_id)
+        if not recent_jobs:
+            st.caption("Todavía no has forjado ningún paquete.")
+        for job in recent_jobs:
+            created = datetime.fromtimestamp(job['created_at']).strftime('%d/%m %H:%M')
+            label = f"{JOB_STATUS_ICONS.get(job['status'], '')} {job['company_name']} · {created}"
+            if job['status'] == "done" and st.button(label, key=f"job_{job['id']}", use_container_width=True):
+                st.session_state['results'] = job_queue.get(job['id'])['result']
+                st.session_state.pop('active_job', None)
+                st.rerun()
+            elif job['status'] != "done":
+                st.caption(label)
+
+    with st.expander("🔎 Historial de aplicaciones"):
+        show_history_panel(user_id)
+
+    with st.expander("📊 Rendimiento del pipeline"):
+        show_stage_stats()
+
+    st.markdown("---")
+
     with st.expander("Editar Perfil Manualmente"):
         show_profile_editor()
         if st.button("💾 Guardar Cambios en Perfil", type="primary"):
-            db_manager.save_profile(st.session_state['profile'])
-            st.success("¡Perfil guardado en la base de datos!")
+            changes = save_stored_profile(st.session_state['profile'], user_id)
+            if any(changes.values()):
+                st.success(f"¡Perfil guardado en la base de datos! ({sum(changes.values())} cambios)")
+            else:
+                st.info("No hay cambios que guardar.")
 
 # ÁREA PRINCIPAL
 col1, col2 = st.columns([0.45, 0.55])
@@ -93,6 +273,76 @@ with col1:
         ["Análisis de la Empresa", "Estimación Salarial", "Ninguna"],
         horizontal=True, key="research_choice"
     )
+    stored_research = None
+    refresh_research = False
+    if company_name and job_description and research_type != "Ninguna":
+        from core.research_store import research_store, research_subject
+        stored_research = research_store.lookup(company_name, research_subject(job_description, research_type), research_type)
+        # La actualización se aplica al forjar, con `refresh_research`, solo para estos mismos datos
+        refresh_key = (company_name, job_description, research_type)
+        refresh_research = st.session_state.get('refresh_research') == refresh_key
+        if stored_research and refresh_research:
+            st.caption("🔄 La investigación se generará de nuevo al forjar el paquete.")
+        elif stored_research:
+            stored_at = datetime.fromtimestamp(stored_research['created_at']).strftime('%d/%m/%Y %H:%M')
+            research_col, refresh_col = st.columns([0.7, 0.3])
+            research_col.caption(f"📦 Se reutilizará la investigación guardada el {stored_at} para esta empresa y puesto.")
+            if refresh_col.button("🔄 Actualizar investigación"):
+                st.session_state['refresh_research'] = refresh_key
+                st.rerun()
+    bypass_cache = st.checkbox(
+        "Forzar una nueva respuesta de la IA (ignorar la caché)",
+        help="Por defecto, las respuestas repetidas se sirven desde la caché local para ahorrar tiempo y tokens."
+    )
+    # Precarga especulativa: la investigación solo depende de empresa, puesto y tipo, así que
+    # se adelanta en segundo plano mientras se termina de rellenar el formulario.
+    from core.prefetch import research_prefetcher
+    prefetch_owner = st.session_state.setdefault('prefetch_owner', uuid.uuid4().hex)
+    if company_name and job_description and research_type != "Ninguna" and not stored_research and not bypass_cache:
+        research_prefetcher.prefetch(prefetch_owner, company_name, job_description, research_type)
+        if research_prefetcher.in_flight(company_name, job_description, research_type):
+            st.caption("⏳ Preparando la investigación en segundo plano...")
+    else:
+        research_prefetcher.release(prefetch_owner)
+    generation_choice = st.radio(
+        "Modo de generación:",
+        ["En vivo (streaming)", "Paralelo por secciones"],
+        horizontal=True,
+        help="En vivo muestra cada documento en cuanto termina; en paralelo cada documento se genera con su propia llamada simultánea."
+    )
+    if company_name and job_description and st.session_state.get('profile'):
+        # Ofertas casi idénticas ya procesadas con este mismo perfil (p. ej. la misma oferta republicada)
+        from core.near_duplicates import near_duplicate_index, profile_version
+        from core.history import application_history
+        duplicates = near_duplicate_index.find(job_description, user_id, profile_version(st.session_state['profile']))
+        previous = application_history.get_by_folder(duplicates[0]['folder']) if duplicates else None
+        if previous:
+            generated_at = datetime.fromtimestamp(previous['created_at']).strftime('%d/%m/%Y')
+            st.info(
+                f"♊ Esta oferta coincide en un {duplicates[0]['similarity']:.0%} con la de "
+                f"{previous['company_name']} del {generated_at}, generada con tu perfil actual."
+            )
+            reuse_col, regenerate_col = st.columns(2)
+            if reuse_col.button("📂 Reutilizar paquete anterior", use_container_width=True):
+                st.session_state['results'] = {
+                    "cv": previous['cv'], "cl": previous['cover_letter'], "ip": previous['interview_prep'],
+                    "rc": previous['research'] or NO_RESEARCH_TEXT, "folder": previous['folder'],
+                    "job_description": previous['job_description'] or ""
+                }
+                st.session_state.pop('active_job', None)
+                st.rerun()
+            if regenerate_col.button("♻️ Regenerar reutilizando la investigación", use_container_width=True):
+                from core.jobs import job_queue
+                st.session_state['active_job'] = job_queue.enqueue(user_id, {
+                    "profile_data": st.session_state['profile'],
+                    "job_description": job_description,
+                    "company_name": company_name,
+                    "research_type": previous['research_type'] or research_type,
+                    "use_cache": not bypass_cache,
+                    "generation_mode": "stream" if generation_choice == "En vivo (streaming)" else "parallel",
+                    "research_context": previous['research'] or NO_RESEARCH_TEXT
+                })
+                st.session_state.pop('results', None)
 
 if st.button("Forjar Paquete de Aplicación", type="primary", use_container_width=True):
     if not st.session_state.get('profile'):
@@ -100,39 +350,103 @@ if st.button("Forjar Paquete de Aplicación", type="primary", use_container_widt
     elif not company_name or not job_description:
         st.warning("Por favor, completa el nombre de la empresa y la descripción de la oferta.")
     else:
-        with st.spinner("🔥 Forjando tu futuro... La IA está trabajando intensamente..."):
-            try:
-                output_folder, cv_opt, cover_letter, interview_prep, research_context = run_full_pipeline(
-                    profile_data=st.session_state['profile'],
-                    job_description=job_description,
-                    company_name=company_name,
-                    research_type=research_type
-                )
-                st.success(f"¡Paquete generado con éxito en la carpeta: `{output_folder}`!")
-                
-                # Guardar resultados en el estado de la sesión para mostrarlos
-                st.session_state['results'] = {
-                    "cv": cv_opt, "cl": cover_letter, "ip": interview_prep, "rc": research_context
-                }
-            except Exception as e:
-                st.error(f"Ocurrió un error: {e}")
+        # La generación se ejecuta en segundo plano: la página solo encola el trabajo y
+        # consulta su estado, así que no se bloquea ni se pierde el resultado al navegar.
+        from core.jobs import job_queue
+        st.session_state['active_job'] = job_queue.enqueue(user_id, {
+            "profile_data": st.session_state['profile'],
+            "job_description": job_description,
+            "company_name": company_name,
+            "research_type": research_type,
+            "use_cache": not bypass_cache,
+            "refresh_research": refresh_research,
+            # En vivo: cada sección se publica como progreso del trabajo en cuanto se genera
+            "generation_mode": "stream" if generation_choice == "En vivo (streaming)" else "parallel"
+        })
+        st.session_state.pop('results', None)
+        st.session_state.pop('refresh_research', None)
+
+def show_active_job(job_id: int) -> None:
+    """Muestra el estado y el progreso del trabajo en curso; al terminar, pasa a mostrar el resultado."""
+    from core.jobs import job_queue
+    job = job_queue.get(job_id)
+    if job is None or job['status'] in ("done", "error"):
+        # Se vuelve a ejecutar la página completa para salir del bloque de consulta.
+        st.session_state.pop('active_job', None)
+        if job and job['status'] == "done":
+            st.session_state['results'] = job['result']
+        else:
+            st.session_state['job_error'] = job['error'] if job else "el trabajo ya no existe."
+        st.rerun()
+
+    progress = job['progress'] or {}
+    st.header("📄 Tus Activos Generados")
+    if job['status'] == "queued":
+        label = "⏳ En cola, esperando un worker libre..."
+    elif progress.get('stage') == "research":
+        label = "🔥 Investigando la oportunidad..."
+    else:
+        label = "✍️ Generando tu paquete de aplicación..."
+    st.status(label, state="running", expanded=False)
+    if progress.get('research') and progress['research'] != NO_RESEARCH_TEXT:
+        st.markdown(progress['research'])
+    for _, section, title in RESULT_SECTIONS:
+        if progress.get('sections', {}).get(section):
+            with st.expander(title, expanded=True):
+                st.markdown(progress['sections'][section])
+
+if 'job_error' in st.session_state:
+    with col2:
+        st.error(f"Ocurrió un error: {st.session_state.pop('job_error')}")
+
+if 'active_job' in st.session_state:
+    with col2:
+        if hasattr(st, "fragment"):
+            # Solo este bloque se vuelve a ejecutar en cada consulta, no la página entera.
+            st.fragment(run_every=JOB_POLL_SECONDS)(show_active_job)(st.session_state['active_job'])
+        else:
+            show_active_job(st.session_state['active_job'])
+            time.sleep(JOB_POLL_SECONDS)
+            st.rerun()
 
 # Mostrar resultados
 if 'results' in st.session_state:
     with col2:
         st.header("📄 Tus Activos Generados")
         results = st.session_state['results']
+        st.caption(f"Carpeta de salida: `{results['folder']}`")
+        compaction = results.get('compaction')
+        if compaction:
+            st.caption(
+                f"🪶 Perfil enviado a la IA: {compaction['compact_tokens']} tokens en lugar de "
+                f"{compaction['original_tokens']} (~{compaction['saved_tokens']} ahorrados; "
+                f"{compaction['achievements_kept']} de {compaction['achievements_total']} logros relevantes)."
+            )
         
-        if results['rc'] != "No se seleccionó ninguna investigación.":
+        if results['rc'] != NO_RESEARCH_TEXT:
             with st.expander("🧠 Inteligencia Estratégica", expanded=True):
                 st.markdown(results['rc'])
         
-        with st.expander("📄 CV Optimizado"):
-            st.markdown(results['cv'])
-        with st.expander("✉️ Carta de Presentación"):
-            st.markdown(results['cl'])
-        with st.expander("🎙️ Preparación de Entrevista"):
-            st.markdown(results['ip'])
-else:
+        # Cada sección puede regenerarse por separado sin repetir las otras dos
+        for result_key, section, title in RESULT_SECTIONS:
+            with st.expander(title):
+                st.markdown(results[result_key])
+                if st.button("🔁 Regenerar esta sección", key=f"regen_{section}"):
+                    with st.spinner("Regenerando la sección..."):
+                        from core.orchestrator import regenerate_section
+                        try:
+                            results[result_key] = regenerate_section(
+                                section,
+                                profile_data=st.session_state['profile'],
+                                job_description=results['job_description'],
+                                research_context=results['rc'],
+                                output_folder=results['folder'],
+                                use_cache=False
+                            )
+                        except Exception as e:
+                            st.error(f"Ocurrió un error: {e}")
+                        else:
+                            st.rerun()
+elif 'active_job' not in st.session_state:
     with col2:
         st.info("Ingresa los datos de la oportunidad y haz clic en 'Forjar' para ver los resultados aquí.")
@@ -1,9 +1,40 @@
+import uuid
 import streamlit as st
 
+# Experiencias por página del editor: con perfiles grandes solo se renderizan las de la página actual.
+EXPERIENCES_PER_PAGE = 5
+
+def _item_key(item: dict) -> str:
+    """
+    Devuelve una clave estable para los widgets de una experiencia o logro.
+    Los elementos guardados usan su ID de la base de datos; los nuevos reciben una clave
+    temporal que se conserva en la sesión hasta que se guardan. Así, al eliminar un elemento,
+    los widgets de los demás no se desplazan ni intercambian sus valores.
+    """
+    if item.get('id') is not None:
+        return str(item['id'])
+    return item.setdefault('_key', f"new-{uuid.uuid4().hex[:8]}")
+
+def _fragment(func):
+    """
+    Convierte la función en un fragmento de Streamlit: sus widgets solo vuelven a ejecutar la
+    propia función, no toda la página. Sin soporte de fragmentos se ejecuta como siempre.
+    """
+    return st.fragment(func) if hasattr(st, "fragment") else func
+
+def _rerun_fragment() -> None:
+    """Vuelve a ejecutar solo el fragmento en curso (o la página, sin soporte de fragmentos)."""
+    if hasattr(st, "fragment"):
+        st.rerun(scope="fragment")
+    else:
+        st.rerun()
+
 def show_profile_editor():
     """
     Muestra una interfaz CRUD (Crear, Leer, Actualizar, Eliminar) completa
     para editar el perfil del usuario almacenado en st.session_state['profile'].
+    Cada bloque (información general, lista de experiencias y cada experiencia) es un
+    fragmento independiente: editar un campo o un logro no vuelve a renderizar el resto.
     """
     st.header("✍️ Editor del Perfil Profesional")
     st.caption("Aquí puedes ver, modificar y guardar la información de tu perfil. Estos datos son la base para todas las optimizaciones.")
@@ -22,73 +53,108 @@ def show_profile_editor():
             st.rerun()
         return
 
+    show_general_info()
+    st.markdown("---")
+    show_experience_list()
+
+@_fragment
+def show_general_info():
+    """Nombre, contacto y resumen profesional."""
     # Atajo para acceder al perfil en el estado de la sesión
     profile_data = st.session_state['profile']
 
     # --- Sección de Información General ---
     st.subheader("Información General")
     profile_data['full_name'] = st.text_input(
-        "Nombre Completo", 
+        "Nombre Completo",
         value=profile_data.get('full_name', '')
     )
-    
-    contact_data = profile_data.setdefault('contact', {})
+
+    contact_data = profile_data.setdefault('contact', {}) or {}
+    profile_data['contact'] = contact_data
     contact_data['email'] = st.text_input("Email", value=contact_data.get('email', ''))
     contact_data['linkedin'] = st.text_input("LinkedIn", value=contact_data.get('linkedin', ''))
     contact_data['phone'] = st.text_input("Teléfono", value=contact_data.get('phone', ''))
-    
+
     profile_data['base_summary'] = st.text_area(
-        "Resumen Profesional Base", 
-        value=profile_data.get('base_summary', ''), 
+        "Resumen Profesional Base",
+        value=profile_data.get('base_summary', ''),
         height=150
     )
 
-    st.markdown("---")
-    
+@_fragment
+def show_experience_list():
+    """Lista paginada de experiencias, con los botones para añadir, eliminar y cambiar de página."""
+    profile_data = st.session_state['profile']
+    experiences = profile_data.get('experiences') or []
+
     # --- Sección de Experiencia Laboral (CRUD) ---
     st.subheader("Experiencia Laboral")
-    
-    # Iterar sobre una copia para poder modificar la lista original de forma segura
-    for i, exp in enumerate(profile_data.get('experiences', [])):
+
+    page_count = max(1, -(-len(experiences) // EXPERIENCES_PER_PAGE))
+    page = min(st.session_state.get('experience_page', 0), page_count - 1)
+    if page_count > 1:
+        prev_col, page_col, next_col = st.columns([0.25, 0.5, 0.25])
+        if prev_col.button("◀", key="experience_prev", disabled=page == 0, use_container_width=True):
+            st.session_state['experience_page'] = page - 1
+            _rerun_fragment()
+        page_col.caption(f"Página {page + 1} de {page_count} · {len(experiences)} experiencias")
+        if next_col.button("▶", key="experience_next", disabled=page == page_count - 1, use_container_width=True):
+            st.session_state['experience_page'] = page + 1
+            _rerun_fragment()
+
+    # Las claves de los widgets se basan en IDs estables (no en la posición), de modo que
+    # `db_manager.save_profile` pueda guardar solo lo que cambió.
+    start = page * EXPERIENCES_PER_PAGE
+    for i, exp in enumerate(experiences[start:start + EXPERIENCES_PER_PAGE], start=start):
         with st.container(border=True):
             st.markdown(f"**Experiencia {i+1}**")
-            
-            # Widgets para editar los detalles de la experiencia
-            exp['role'] = st.text_input("Cargo", value=exp.get('role', ''), key=f"role_{i}")
-            exp['company'] = st.text_input("Empresa", value=exp.get('company', ''), key=f"company_{i}")
-            exp['period'] = st.text_input("Periodo", value=exp.get('period', ''), key=f"period_{i}")
-            
+            show_experience(exp)
+
             # Botón para eliminar esta experiencia específica
-            if st.button("❌ Eliminar Experiencia", key=f"del_exp_{i}", use_container_width=True):
-                profile_data['experiences'].pop(i)
-                st.rerun()
-
-            # Sub-sección para los logros de esta experiencia
-            st.markdown("***Logros Clave***")
-            for j, ach in enumerate(exp.get('achievements', [])):
-                ach['description'] = st.text_area(
-                    f"Descripción del Logro {j+1}", 
-                    value=ach.get('description', ''), 
-                    key=f"ach_desc_{i}_{j}"
-                )
-                if st.button("➖ Eliminar Logro", key=f"del_ach_{i}_{j}"):
-                    exp['achievements'].pop(j)
-                    st.rerun()
-
-            if st.button("➕ Añadir Logro", key=f"add_ach_{i}"):
-                if 'achievements' not in exp:
-                    exp['achievements'] = []
-                exp['achievements'].append({"description": "", "skills": []})
-                st.rerun()
+            if st.button("❌ Eliminar Experiencia", key=f"del_exp_{_item_key(exp)}", use_container_width=True):
+                experiences.pop(i)
+                _rerun_fragment()
 
     # Botón para añadir una nueva experiencia a la lista
     if st.button("➕ Añadir Experiencia", use_container_width=True):
-        if 'experiences' not in profile_data:
+        if not profile_data.get('experiences'):
             profile_data['experiences'] = []
         profile_data['experiences'].append({
-            "role": "", 
-            "company": "", 
-            "period": "", 
+            "role": "",
+            "company": "",
+            "period": "",
             "achievements": []
         })
-        st.rerun()
+        # La nueva experiencia queda en la última página
+        st.session_state['experience_page'] = (len(profile_data['experiences']) - 1) // EXPERIENCES_PER_PAGE
+        _rerun_fragment()
+
+@_fragment
+def show_experience(exp: dict):
+    """Campos y logros de una experiencia; sus botones solo vuelven a renderizar esta experiencia."""
+    exp_key = _item_key(exp)
+
+    # Widgets para editar los detalles de la experiencia
+    exp['role'] = st.text_input("Cargo", value=exp.get('role', ''), key=f"role_{exp_key}")
+    exp['company'] = st.text_input("Empresa", value=exp.get('company', ''), key=f"company_{exp_key}")
+    exp['period'] = st.text_input("Periodo", value=exp.get('period', ''), key=f"period_{exp_key}")
+
+    # Sub-sección para los logros de esta experiencia
+    st.markdown("***Logros Clave***")
+    for j, ach in enumerate(exp.get('achievements') or []):
+        ach_key = _item_key(ach)
+        ach['description'] = st.text_area(
+            f"Descripción del Logro {j+1}",
+            value=ach.get('description', ''),
+            key=f"ach_desc_{exp_key}_{ach_key}"
+        )
+        if st.button("➖ Eliminar Logro", key=f"del_ach_{exp_key}_{ach_key}"):
+            exp['achievements'].pop(j)
+            _rerun_fragment()
+
+    if st.button("➕ Añadir Logro", key=f"add_ach_{exp_key}"):
+        if not exp.get('achievements'):
+            exp['achievements'] = []
+        exp['achievements'].append({"description": "", "skills": []})
+        _rerun_fragment()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+"""
+Prueba de carga sin conexión de la API HTTP (`core.http_api`) con el modelo falso.
+
+Levanta la API en un puerto libre, en un directorio temporal, y lanza dos ráfagas:
+
+1. `--identical` peticiones idénticas simultáneas a /applications: con la coalescencia
+   deberían ejecutar un solo pipeline (las llamadas al modelo no crecen con la ráfaga).
+2. `--distinct` peticiones distintas simultáneas con `--max-pending` como límite de la cola:
+   las que no caben reciben 429 con Retry-After en lugar de acumularse.
+
+Uso:
+    python benchmarks/api_load_test.py
+    python benchmarks/api_load_test.py --identical 50 --distinct 40 --max-pending 8 --latency 0.5
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+import contextlib
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# El limitador de Gemini no debe frenar al modelo falso: se configura antes de importar `core`.
+os.environ.setdefault("GEMINI_RPM", "1000000")
+os.environ.setdefault("GEMINI_TPM", "1000000000")
+os.environ.setdefault("GEMINI_MAX_CONCURRENCY", "64")
+
+from core.fakes import install_fake_models
+
+RESEARCH_TYPE = "Análisis de la Empresa"
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _summary(responses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = sorted(response['ms'] for response in responses)
+    return {
+        "requests": len(responses),
+        "status": dict(Counter(response['status'] for response in responses)),
+        "coalesced": sum(response.get('coalesced', False) for response in responses),
+        "median_ms": round(statistics.median(latencies), 1),
+        "max_ms": round(latencies[-1], 1)
+    }
+
+async def run_load_test(
+    models: List[Any], identical: int, distinct: int, max_concurrency: int, max_pending: int
+) -> Dict[str, Any]:
+    """`models` es la lista de modelos falsos instalados, para contar las llamadas."""
+    from tornado.httpclient import AsyncHTTPClient
+    from core.http_api import make_app
+    from core.service import GenerationService
+    from db_benchmark import make_synthetic_profile
+
+    port = _free_port()
+    server = make_app(GenerationService(max_concurrency, max_pending), api_token="").listen(port, address="127.0.0.1")
+    client = AsyncHTTPClient(max_clients=identical + distinct)
+    profile = make_synthetic_profile(4, 5)
+
+    async def post(body: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        response = await client.fetch(
+            f"http://127.0.0.1:{port}/applications", method="POST", body=json.dumps(body),
+            headers={"Content-Type": "application/json"}, raise_error=False, request_timeout=600
+        )
+        payload = json.loads(response.body or b"{}")
+        return {"status": response.code, "ms": (time.perf_counter() - started) * 1000,
+                "coalesced": payload.get('coalesced', False)}
+
+    def body(index: int) -> Dict[str, Any]:
+        return {
+            "company_name": f"Empresa {index}", "research_type": RESEARCH_TYPE, "profile": profile,
+            "job_description": f"Ingeniero/a de Datos {index}\nPython, SQL y liderazgo de equipos."
+        }
+
+    try:
+        calls_before = sum(model.calls for model in models)
+        identical_responses = await asyncio.gather(*(post(body(0)) for _ in range(identical)))
+        identical_calls = sum(model.calls for model in models) - calls_before
+
+        calls_before = sum(model.calls for model in models)
+        distinct_responses = await asyncio.gather(*(post(body(index + 1)) for index in range(distinct)))
+        distinct_calls = sum(model.calls for model in models) - calls_before
+    finally:
+        client.close()
+        server.stop()
+
+    return {
+        "identical": {**_summary(identical_responses), "llm_calls": identical_calls},
+        "distinct": {**_summary(distinct_responses), "llm_calls": distinct_calls},
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga sin conexión de la API HTTP.")
+    parser.add_argument("--identical", type=int, default=20, help="Peticiones idénticas simultáneas.")
+    parser.add_argument("--distinct", type=int, default=20, help="Peticiones distintas simultáneas.")
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--max-pending", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.3, help="Segundos hasta el primer token del modelo falso.")
+    parser.add_argument("--json", help="Ruta donde guardar el informe en JSON.")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("tornado.access").setLevel(logging.WARNING)  # Sin una línea por petición
+    original_cwd = os.getcwd()
+    models = install_fake_models(latency_seconds=args.latency)
+    with tempfile.TemporaryDirectory() as workspace:
+        # Las cachés, los almacenes y las carpetas de salida usan rutas relativas.
+        os.chdir(workspace)
+        os.makedirs("database")
+        try:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                report = asyncio.run(run_load_test(
+                    models, args.identical, args.distinct, args.max_concurrency, args.max_pending
+                ))
+        finally:
+            os.chdir(original_cwd)  # Se sale del directorio antes de borrarlo
+
+    for name, result in report.items():
+        print(f"{name:>10}: {json.dumps(result, ensure_ascii=False)}")
+    if args.json:
+        with open(args.json, "w", encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de carga y guardado de perfiles en `DatabaseManager`.
+
+Genera perfiles sintéticos con miles de logros y mide la latencia de `save_profile`
+(perfil completo y una sola edición) y `load_profile` con la implementación actual y con la
+implementación anterior (una conexión nueva por operación, una consulta de logros por
+experiencia, borrado y reinserción completa con un INSERT por fila).
+
+Uso:
+    python benchmarks/db_benchmark.py
+    python benchmarks/db_benchmark.py --sizes 10x10 100x20 500x20 --repeat 5 --json db.json
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import copy
+import argparse
+import tempfile
+import statistics
+import contextlib
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.database_manager import DatabaseManager
+
+DEFAULT_SIZES = ["10x10", "100x20", "250x40"]
+
+class LegacyDatabaseManager(DatabaseManager):
+    """Reproduce el acceso a datos anterior para comparar: N+1 consultas e INSERT fila a fila."""
+
+    def _legacy_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def save_profile(self, profile_data: Dict[str, Any]) -> None:
+        with self._legacy_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN TRANSACTION;")
+            cursor.execute("DELETE FROM achievements WHERE experience_id IN (SELECT id FROM experiences WHERE user_id = 1);")
+            cursor.execute("DELETE FROM experiences WHERE user_id = 1;")
+            cursor.execute("DELETE FROM user WHERE id = 1;")
+            contact_info = profile_data.get('contact') or {}
+            cursor.execute(
+                "INSERT INTO user (id, full_name, email, linkedin, phone, base_summary) VALUES (?, ?, ?, ?, ?, ?);",
+                (1, profile_data.get('full_name'), contact_info.get('email'), contact_info.get('linkedin'),
+                 contact_info.get('phone'), profile_data.get('base_summary'))
+            )
+            for exp in profile_data.get('experiences', []):
+                cursor.execute(
+                    "INSERT INTO experiences (user_id, role, company, period) VALUES (1, ?, ?, ?);",
+                    (exp.get('role'), exp.get('company'), exp.get('period'))
+                )
+                experience_id = cursor.lastrowid
+                for ach in exp.get('achievements', []):
+                    cursor.execute(
+                        "INSERT INTO achievements (experience_id, description) VALUES (?, ?);",
+                        (experience_id, ach.get('description'))
+                    )
+            conn.commit()
+
+    def load_profile(self) -> Optional[Dict[str, Any]]:
+        with self._legacy_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM user WHERE id = 1;")
+            user_row = cursor.fetchone()
+            if not user_row:
+                return None
+            profile = {
+                "full_name": user_row['full_name'],
+                "base_summary": user_row['base_summary'],
+                "contact": {"email": user_row['email'], "linkedin": user_row['linkedin'], "phone": user_row['phone']},
+                "experiences": []
+            }
+            cursor.execute("SELECT * FROM experiences WHERE user_id = 1 ORDER BY id;")
+            for exp_row in cursor.fetchall():
+                experience = dict(exp_row)
+                cursor.execute("SELECT * FROM achievements WHERE experience_id = ? ORDER BY id;", (experience['id'],))
+                experience['achievements'] = [dict(ach_row) for ach_row in cursor.fetchall()]
+                profile['experiences'].append(experience)
+            return profile
+
+def make_synthetic_profile(experiences: int, achievements_per_experience: int) -> Dict[str, Any]:
+    """Crea un perfil con `experiences` experiencias y `achievements_per_experience` logros en cada una."""
+    return {
+        "full_name": "Perfil Sintético",
+        "contact": {"email": "test@example.com", "linkedin": "linkedin.com/in/test", "phone": "+00 000"},
+        "base_summary": "Resumen profesional de prueba. " * 10,
+        "experiences": [
+            {
+                "role": f"Rol {i}",
+                "company": f"Empresa {i}",
+                "period": "2020 - 2024",
+                "achievements": [
+                    {"description": f"Logro {j} de la experiencia {i}: mejoró la métrica clave un {j}%.", "skills": []}
+                    for j in range(achievements_per_experience)
+                ]
+            }
+            for i in range(experiences)
+        ]
+    }
+
+def _time_ms(operation: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": round(statistics.median(samples), 2), "min_ms": round(min(samples), 2)}
+
+def benchmark_manager(manager: DatabaseManager, profile: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    # Los mensajes de `save_profile` ensuciarían la tabla de resultados.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return _benchmark_manager(manager, profile, repeat)
+
+def _benchmark_manager(manager: DatabaseManager, profile: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    manager.setup_database()
+    manager.save_profile(copy.deepcopy(profile))  # Calentamiento
+    loaded = manager.load_profile()
+    assert loaded and len(loaded['experiences']) == len(profile['experiences'])
+
+    # Guardado de un perfil sin IDs: reemplaza el perfil completo.
+    full_save = _time_ms(lambda: manager.save_profile(copy.deepcopy(profile)), repeat)
+
+    # Guardado tras editar un único logro del perfil cargado (el caso del editor).
+    edited = manager.load_profile()
+    counter = iter(range(repeat))
+    def save_one_edit():
+        edited['experiences'][0]['achievements'][0]['description'] = f"Logro editado {next(counter)}"
+        manager.save_profile(edited)
+
+    return {
+        "save": full_save,
+        "save_one_edit": _time_ms(save_one_edit, repeat),
+        "load": _time_ms(manager.load_profile, repeat)
+    }
+
+def parse_size(size: str) -> Tuple[int, int]:
+    experiences, achievements = size.lower().split("x")
+    return int(experiences), int(achievements)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mide la latencia de carga/guardado de perfiles.")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES,
+                        help="Tamaños como EXPERIENCIASxLOGROS (p. ej. 100x20).")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Ruta donde guardar el informe en JSON.")
+    args = parser.parse_args(argv)
+
+    report = []
+    print(f"{'Tamaño':<10}{'Logros':>8}  {'Guardar antes':>14}{'Guardar ahora':>15}  "
+          f"{'1 edición antes':>16}{'1 edición ahora':>17}  {'Cargar antes':>13}{'Cargar ahora':>14}")
+    for size in args.sizes:
+        experiences, achievements = parse_size(size)
+        profile = make_synthetic_profile(experiences, achievements)
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy = benchmark_manager(LegacyDatabaseManager(os.path.join(tmp, "legacy.db")), profile, args.repeat)
+            current_manager = DatabaseManager(os.path.join(tmp, "current.db"))
+            current = benchmark_manager(current_manager, profile, args.repeat)
+            current_manager.close()
+        report.append({"size": size, "achievements": experiences * achievements, "legacy": legacy, "current": current})
+        print(f"{size:<10}{experiences * achievements:>8}  "
+              f"{legacy['save']['median_ms']:>12.1f}ms{current['save']['median_ms']:>13.1f}ms  "
+              f"{legacy['save_one_edit']['median_ms']:>14.1f}ms{current['save_one_edit']['median_ms']:>15.1f}ms  "
+              f"{legacy['load']['median_ms']:>11.1f}ms{current['load']['median_ms']:>12.1f}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
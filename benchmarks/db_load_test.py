@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+"""
+Prueba de carga del almacén de perfiles multiusuario.
+
+Llena una base de datos temporal con N perfiles pequeños (por defecto 10, 100, 1.000, 10.000
+y 100.000 usuarios) y mide la latencia de `load_profile` y de un guardado con una edición
+para usuarios aleatorios, primero desde un hilo y después desde varios hilos a la vez
+(como varias sesiones de Streamlit compartiendo el mismo `DatabaseManager`).
+
+Uso:
+    python benchmarks/db_load_test.py
+    python benchmarks/db_load_test.py --users 1000 100000 --threads 8 --json carga.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import statistics
+import threading
+from contextlib import redirect_stdout
+from typing import Dict, Any, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.database_manager import DatabaseManager
+
+DEFAULT_USER_COUNTS = [10, 100, 1000, 10000, 100000]
+EXPERIENCES_PER_USER = 3
+ACHIEVEMENTS_PER_EXPERIENCE = 4
+
+def populate(db_path: str, users: int) -> None:
+    """Inserta `users` perfiles sintéticos en bloque (sin pasar por `save_profile`, para que sea rápido)."""
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO user (id, full_name, email, linkedin, phone, base_summary) VALUES (?, ?, ?, ?, ?, ?);",
+            ((u, f"Usuario {u}", f"u{u}@example.com", None, None, "Resumen de prueba.") for u in range(1, users + 1))
+        )
+        conn.executemany(
+            "INSERT INTO experiences (id, user_id, role, company, period) VALUES (?, ?, ?, ?, ?);",
+            (
+                (u * EXPERIENCES_PER_USER + e, u, f"Rol {e}", f"Empresa {e}", "2020 - 2024")
+                for u in range(1, users + 1) for e in range(EXPERIENCES_PER_USER)
+            )
+        )
+        conn.executemany(
+            "INSERT INTO achievements (experience_id, description) VALUES (?, ?);",
+            (
+                (u * EXPERIENCES_PER_USER + e, f"Logro {a} del usuario {u}.")
+                for u in range(1, users + 1) for e in range(EXPERIENCES_PER_USER)
+                for a in range(ACHIEVEMENTS_PER_EXPERIENCE)
+            )
+        )
+    conn.close()
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "ops": len(ordered)
+    }
+
+def _load_and_edit(manager: DatabaseManager, users: int, operations: int, seed: int) -> Dict[str, List[float]]:
+    rng = random.Random(seed)
+    loads, saves = [], []
+    for _ in range(operations):
+        user_id = rng.randint(1, users)
+        started = time.perf_counter()
+        profile = manager.load_profile(user_id)
+        loads.append((time.perf_counter() - started) * 1000)
+        profile['experiences'][0]['achievements'][0]['description'] += " (editado)"
+        started = time.perf_counter()
+        manager.save_profile(profile, user_id)
+        saves.append((time.perf_counter() - started) * 1000)
+    return {"load": loads, "save_one_edit": saves}
+
+def run_load_test(users: int, operations: int, threads: int) -> Dict[str, Any]:
+    """Mide latencias con un hilo y con `threads` hilos sobre una base de `users` perfiles."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "load_test.db")
+        manager = DatabaseManager(db_path, pool_size=threads)
+        manager.setup_database()
+        started = time.perf_counter()
+        populate(db_path, users)
+        populate_seconds = time.perf_counter() - started
+
+        # Los mensajes de `save_profile` ensuciarían la tabla de resultados.
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            single = _load_and_edit(manager, users, operations, seed=0)
+
+            results: List[Dict[str, List[float]]] = [None] * threads
+            def worker(index: int) -> None:
+                results[index] = _load_and_edit(manager, users, operations, seed=index + 1)
+            workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+            started = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            concurrent_seconds = time.perf_counter() - started
+        manager.close()
+
+    concurrent_loads = [s for r in results for s in r["load"]]
+    concurrent_saves = [s for r in results for s in r["save_one_edit"]]
+    return {
+        "users": users,
+        "populate_s": round(populate_seconds, 2),
+        "single": {"load": _percentiles(single["load"]), "save_one_edit": _percentiles(single["save_one_edit"])},
+        "concurrent": {
+            "threads": threads,
+            "load": _percentiles(concurrent_loads),
+            "save_one_edit": _percentiles(concurrent_saves),
+            "throughput_ops_s": round(2 * len(concurrent_loads) / concurrent_seconds, 1)
+        }
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga del almacén de perfiles multiusuario.")
+    parser.add_argument("--users", type=int, nargs="+", default=DEFAULT_USER_COUNTS,
+                        help="Número de perfiles en la base de datos para cada ejecución.")
+    parser.add_argument("--operations", type=int, default=200, help="Cargas y guardados por hilo.")
+    parser.add_argument("--threads", type=int, default=8, help="Hilos simultáneos en la fase concurrente.")
+    parser.add_argument("--json", help="Ruta donde guardar el informe en JSON.")
+    args = parser.parse_args(argv)
+
+    report = []
+    print(f"{'Usuarios':>9}  {'Carga p50':>10}{'Carga p95':>10}  {'Edición p50':>12}{'Edición p95':>12}  "
+          f"{'Carga p95 ({} hilos)'.format(args.threads):>20}{'Ops/s':>9}")
+    for users in args.users:
+        result = run_load_test(users, args.operations, args.threads)
+        report.append(result)
+        single, concurrent = result["single"], result["concurrent"]
+        print(f"{users:>9}  {single['load']['p50_ms']:>8.2f}ms{single['load']['p95_ms']:>8.2f}ms  "
+              f"{single['save_one_edit']['p50_ms']:>10.2f}ms{single['save_one_edit']['p95_ms']:>10.2f}ms  "
+              f"{concurrent['load']['p95_ms']:>18.2f}ms{concurrent['throughput_ops_s']:>9.0f}")
+
+    if args.json:
+        with open(args.json, "w", encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
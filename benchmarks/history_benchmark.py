@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de búsqueda en el historial de aplicaciones (SQLite FTS5).
+
+Registra miles de paquetes sintéticos en un historial temporal y mide la latencia de
+`ApplicationHistory.search` (p50/p95) con consultas de uno y varios términos, con y sin
+filtro por usuario.
+
+Uso:
+    python benchmarks/history_benchmark.py
+    python benchmarks/history_benchmark.py --sizes 1000 10000 --queries 200 --json history.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import itertools
+from typing import Dict, Any, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.history import ApplicationHistory
+
+DEFAULT_SIZES = [1000, 5000, 20000]
+USERS = 20
+COMPANIES = ["Google", "Mercado Libre", "Globant", "Spotify", "Telefónica", "BBVA", "Cabify", "Glovo", "Stripe", "Shopify"]
+ROLES = ["Data Engineer", "Backend Developer", "Product Manager", "ML Engineer", "SRE", "Frontend Developer"]
+SKILLS = ["python", "sql", "kubernetes", "spark", "react", "go", "terraform", "airflow", "kafka", "django", "aws", "gcp"]
+QUERIES = ["python", "kafka spark", "google data", "liderazgo equipo", "terraform aws", "react", "machine learning"]
+
+VOCABULARY_SIZE = 5000
+SEARCH_TERMS_RANK = 1000  # Posición de los términos buscados en la distribución de frecuencias
+
+def _vocabulary(rng: random.Random) -> List[str]:
+    """
+    Vocabulario sintético ordenado por frecuencia. Los términos que se buscan quedan en la
+    parte media, de modo que cada consulta coincide con una fracción de los paquetes y no con todos.
+    """
+    syllables = ["ca", "de", "lo", "mi", "ra", "si", "to", "ven", "bar", "pel", "qui", "dor", "nes", "tal"]
+    search_terms = SKILLS + ["liderazgo", "equipo", "impacto", "métricas", "cliente", "machine", "learning", "data"]
+    filler = ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(VOCABULARY_SIZE)]
+    return filler[:SEARCH_TERMS_RANK] + search_terms + filler[SEARCH_TERMS_RANK:]
+
+def _text(rng: random.Random, vocabulary: List[str], cum_weights: List[float], words: int) -> str:
+    return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=words))
+
+def populate(history: ApplicationHistory, size: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng)
+    # Distribución de Zipf: pocas palabras muy frecuentes y una cola larga.
+    cum_weights = list(itertools.accumulate(1 / (rank + 20) for rank in range(len(vocabulary))))
+    text = lambda words: _text(rng, vocabulary, cum_weights, words)
+    for index in range(size):
+        company, role = rng.choice(COMPANIES), rng.choice(ROLES)
+        history.record(
+            user_id=index % USERS + 1,
+            company_name=company,
+            job_description=f"{role}\n{text(120)}",
+            research_type="Análisis de la Empresa",
+            folder=os.path.join("outputs", f"{company}_{index}"),
+            research=text(150),
+            sections={"cv": text(300), "cover_letter": text(200), "interview_prep": text(150)},
+            created_at=time.time() - index
+        )
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3)
+    }
+
+def run_benchmark(size: int, queries: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        history = ApplicationHistory(os.path.join(tmp, "history.db"))
+        started = time.perf_counter()
+        populate(history, size)
+        populate_seconds = time.perf_counter() - started
+
+        rng = random.Random(1)
+        all_users, one_user = [], []
+        for _ in range(queries):
+            query = rng.choice(QUERIES)
+            started = time.perf_counter()
+            history.search(query)
+            all_users.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            history.search(query, user_id=rng.randint(1, USERS))
+            one_user.append((time.perf_counter() - started) * 1000)
+        return {
+            "applications": size,
+            "populate_seconds": round(populate_seconds, 2),
+            "search_all_users": _percentiles(all_users),
+            "search_one_user": _percentiles(one_user)
+        }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mide la latencia de búsqueda en el historial de aplicaciones.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--json", help="Ruta donde guardar el informe en JSON.")
+    args = parser.parse_args(argv)
+
+    report = []
+    print(f"{'Paquetes':>9}  {'Todos p50':>10}{'Todos p95':>11}  {'Usuario p50':>12}{'Usuario p95':>13}")
+    for size in args.sizes:
+        result = run_benchmark(size, args.queries)
+        report.append(result)
+        print(f"{size:>9}  {result['search_all_users']['p50_ms']:>8.2f}ms{result['search_all_users']['p95_ms']:>9.2f}ms"
+              f"  {result['search_one_user']['p50_ms']:>10.2f}ms{result['search_one_user']['p95_ms']:>11.2f}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
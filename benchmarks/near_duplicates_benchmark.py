@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark del índice de ofertas casi duplicadas (MinHash + LSH en SQLite).
+
+Registra miles de ofertas sintéticas en un índice temporal y mide la latencia de
+`NearDuplicateIndex.find` (p50/p95) para ofertas republicadas con pequeños cambios y para
+ofertas nuevas, junto con la tasa de detección de las republicadas y de falsos positivos.
+
+Uso:
+    python benchmarks/near_duplicates_benchmark.py
+    python benchmarks/near_duplicates_benchmark.py --sizes 1000 10000 --queries 200 --json near.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from typing import Dict, Any, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.near_duplicates import NearDuplicateIndex, minhash_signature
+
+DEFAULT_SIZES = [1000, 5000, 10000]
+USERS = 20
+PROFILE_VERSION = "benchmark"
+OFFER_WORDS = 250
+EDITED_WORDS = 3  # Palabras sustituidas al "republicar" una oferta (similitud de Jaccard ~0.88)
+
+def _vocabulary(rng: random.Random, size: int = 3000) -> List[str]:
+    syllables = ["ca", "de", "lo", "mi", "ra", "si", "to", "ven", "bar", "pel", "qui", "dor", "nes", "tal"]
+    return ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+def _offer(rng: random.Random, vocabulary: List[str]) -> List[str]:
+    return rng.choices(vocabulary, k=OFFER_WORDS)
+
+def _republish(rng: random.Random, words: List[str], vocabulary: List[str]) -> str:
+    """Copia de la oferta con unas pocas palabras cambiadas, como una oferta republicada."""
+    edited = list(words)
+    for position in rng.sample(range(len(edited)), EDITED_WORDS):
+        edited[position] = rng.choice(vocabulary)
+    return " ".join(edited)
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3)
+    }
+
+def run_benchmark(size: int, queries: int, seed: int = 7) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng)
+    offers = [_offer(rng, vocabulary) for _ in range(size)]
+    with tempfile.TemporaryDirectory() as tmp:
+        index = NearDuplicateIndex(os.path.join(tmp, "near_duplicates.db"))
+        started = time.perf_counter()
+        for position, words in enumerate(offers):
+            index.add(position % USERS + 1, PROFILE_VERSION, " ".join(words), os.path.join("outputs", f"oferta_{position}"))
+        populate_seconds = time.perf_counter() - started
+
+        republished, new, detected, false_positives = [], [], 0, 0
+        for _ in range(queries):
+            position = rng.randrange(size)
+            text = _republish(rng, offers[position], vocabulary)
+            minhash_signature.cache_clear()  # Se mide también el cálculo de la firma
+            started = time.perf_counter()
+            matches = index.find(text, position % USERS + 1, PROFILE_VERSION)
+            republished.append((time.perf_counter() - started) * 1000)
+            detected += any(match['folder'].endswith(f"oferta_{position}") for match in matches)
+
+            text = " ".join(_offer(rng, vocabulary))
+            started = time.perf_counter()
+            matches = index.find(text, rng.randint(1, USERS), PROFILE_VERSION)
+            new.append((time.perf_counter() - started) * 1000)
+            false_positives += bool(matches)
+        return {
+            "offers": size,
+            "populate_seconds": round(populate_seconds, 2),
+            "find_republished": _percentiles(republished),
+            "find_new": _percentiles(new),
+            "recall": round(detected / queries, 3),
+            "false_positive_rate": round(false_positives / queries, 3)
+        }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mide la latencia y la precisión del índice de ofertas casi duplicadas.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--json", help="Ruta donde guardar el informe en JSON.")
+    args = parser.parse_args(argv)
+
+    report = []
+    print(f"{'Ofertas':>8}  {'Republ. p50':>12}{'p95':>9}  {'Nueva p50':>10}{'p95':>9}  {'Recall':>7}{'Falsos +':>9}")
+    for size in args.sizes:
+        result = run_benchmark(size, args.queries)
+        report.append(result)
+        print(f"{size:>8}  {result['find_republished']['p50_ms']:>10.2f}ms{result['find_republished']['p95_ms']:>7.2f}ms"
+              f"  {result['find_new']['p50_ms']:>8.2f}ms{result['find_new']['p95_ms']:>7.2f}ms"
+              f"  {result['recall']:>7.2f}{result['false_positive_rate']:>9.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
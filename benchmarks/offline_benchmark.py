@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark del pipeline completo sin conexión, con modelos falsos deterministas.
+
+Sustituye `ChatGoogleGenerativeAI` y `genai.GenerativeModel` por los modelos de `core.fakes`
+(latencia, ritmo de tokens y longitud de salida configurables) y mide, con entradas
+sintéticas de tamaño creciente:
+
+- `run_full_pipeline` en modo "single" y "parallel".
+- `parse_cv_to_profile`, y el reparseo de un CV al que se añade un puesto (completo frente a
+  incremental por secciones).
+- `convert_pdf_to_markdown` con el conversor de maquetación y con el LLM.
+- `DatabaseManager.save_profile` / `load_profile`.
+
+Todo se ejecuta en un directorio temporal (cachés, almacenes y carpetas de salida) y sin
+caché de respuestas, de modo que cada medida incluye las llamadas al modelo falso. El informe
+JSON incluye el commit actual; con `--compare` se muestran las diferencias con un informe anterior.
+
+Uso:
+    python benchmarks/offline_benchmark.py
+    python benchmarks/offline_benchmark.py --scales 1 4 16 --latency 0.2 --tokens-per-second 80 --json offline.json
+    python benchmarks/offline_benchmark.py --json nuevo.json --compare offline.json
+"""
+
+import os
+import sys
+import json
+import time
+import copy
+import platform
+import argparse
+import tempfile
+import statistics
+import contextlib
+import subprocess
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(REPO_ROOT)
+
+# El limitador de Gemini no debe frenar al modelo falso: se configura antes de importar `core`.
+os.environ.setdefault("GEMINI_RPM", "1000000")
+os.environ.setdefault("GEMINI_TPM", "1000000000")
+os.environ.setdefault("GEMINI_MAX_CONCURRENCY", "64")
+
+from core.fakes import install_fake_models
+from db_benchmark import make_synthetic_profile, benchmark_manager
+
+DEFAULT_SCALES = [1, 4, 16]
+ACHIEVEMENTS_PER_EXPERIENCE = 5
+RESEARCH_TYPE = "Análisis de la Empresa"
+
+def _time_ms(operation: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": round(statistics.median(samples), 2), "min_ms": round(min(samples), 2)}
+
+def _quiet(operation: Callable[[], Any]) -> Callable[[], Any]:
+    """Silencia los mensajes de progreso del pipeline para no ensuciar la tabla."""
+    def run() -> Any:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            return operation()
+    return run
+
+def make_job_description(scale: int) -> str:
+    requirements = "\n".join(
+        f"- Requisito {i}: experiencia con Python, SQL y liderazgo de equipos de datos." for i in range(5 * scale)
+    )
+    return f"Ingeniero/a de Datos Senior\n\nBuscamos una persona para liderar la plataforma de datos.\n{requirements}"
+
+def make_cv_text(scale: int) -> str:
+    lines = ["Perfil Sintético", "Ingeniero de datos con experiencia en plataformas a gran escala."]
+    for i in range(2 * scale):
+        lines.append(f"Rol {i} en Empresa {i} (2020 - 2024)")
+        lines.extend(
+            f"- Logro {j}: redujo la latencia del pipeline un {j + 10}% con Python y SQL."
+            for j in range(ACHIEVEMENTS_PER_EXPERIENCE)
+        )
+    return "\n".join(lines)
+
+def benchmark_pipeline(scale: int, repeat: int) -> Dict[str, Any]:
+    from core.orchestrator import run_full_pipeline
+
+    profile = make_synthetic_profile(2 * scale, ACHIEVEMENTS_PER_EXPERIENCE)
+    job_description = make_job_description(scale)
+    result = {}
+    for mode in ("single", "parallel"):
+        result[mode] = _time_ms(_quiet(lambda: run_full_pipeline(
+            profile, job_description, "Empresa Sintética", RESEARCH_TYPE,
+            use_cache=False, generation_mode=mode, refresh_research=True
+        )), repeat)
+    return result
+
+def benchmark_parser(scale: int, repeat: int) -> Dict[str, Any]:
+    from core.profile_parser import parse_cv_to_profile
+
+    cv_text = make_cv_text(scale)
+    profile = _quiet(lambda: parse_cv_to_profile(cv_text, use_cache=False))()
+    if not profile:
+        raise RuntimeError("El parser no devolvió un perfil con el modelo falso.")
+    return {
+        "cv_chars": len(cv_text),
+        "parse": _time_ms(_quiet(lambda: parse_cv_to_profile(cv_text, use_cache=False)), repeat)
+    }
+
+def make_markdown_cv(scale: int, new_jobs: int = 0) -> str:
+    """CV en Markdown por secciones; `new_jobs` añade puestos recientes al principio de la experiencia."""
+    def job(title: str) -> List[str]:
+        return [f"### {title} (2020 - 2024)"] + [
+            f"- Logro {j}: redujo la latencia del pipeline un {j + 10}% con Python y SQL."
+            for j in range(ACHIEVEMENTS_PER_EXPERIENCE)
+        ]
+    lines = ["# Candidata Sintética", "candidata@example.com · +34 600 000 000", "",
+             "## Resumen", "Ingeniero de datos con experiencia en plataformas a gran escala.", "", "## Experiencia"]
+    for i in range(new_jobs):
+        lines.extend(job(f"Rol nuevo {i} en Empresa Nueva {i}.{scale}"))
+    for i in range(2 * scale):
+        lines.extend(job(f"Rol {i} en Empresa {i}"))
+    lines.extend(["", "## Habilidades", "- Python, SQL, Spark, Airflow, Kafka", "", "## Educación", "- Ingeniería Informática"])
+    return "\n".join(lines)
+
+def benchmark_parser_edit(scale: int, repeat: int) -> Dict[str, Any]:
+    """Reparseo tras añadir un puesto: CV completo frente a solo las secciones que cambiaron."""
+    from core.profile_parser import parse_cv_to_profile
+    from core.telemetry import span
+
+    def measure(operation: Callable[[], Any]) -> Dict[str, float]:
+        with span("benchmark") as record:
+            started = time.perf_counter()
+            if not _quiet(operation)():
+                raise RuntimeError("El parser no devolvió un perfil con el modelo falso.")
+            elapsed = (time.perf_counter() - started) * 1000
+        return {"median_ms": elapsed, "input_tokens": record['input_tokens'], "llm_calls": record['llm_calls']}
+
+    _quiet(lambda: parse_cv_to_profile(make_markdown_cv(scale)))()
+    full, incremental = [], []
+    for index in range(repeat):
+        # Cada repetición añade un puesto más, que nunca se ha parseado antes
+        edited = make_markdown_cv(scale, new_jobs=index + 1)
+        full.append(measure(lambda: parse_cv_to_profile(edited, use_cache=False, incremental=False)))
+        incremental.append(measure(lambda: parse_cv_to_profile(edited)))
+
+    def summary(samples: List[Dict[str, float]]) -> Dict[str, float]:
+        return {key: round(statistics.median(sample[key] for sample in samples), 2) for key in samples[0]}
+    return {"full": summary(full), "incremental": summary(incremental)}
+
+def benchmark_pdf(scale: int, repeat: int, workspace: str) -> Dict[str, Any]:
+    from pdf_benchmark import make_synthetic_pdf
+    from core.pdf_processor import convert_pdf_to_markdown
+
+    path = os.path.join(workspace, f"cv_{scale}.pdf")
+    make_synthetic_pdf(path, 2 * scale)
+    return {
+        "pages": 2 * scale,
+        "layout": _time_ms(_quiet(lambda: convert_pdf_to_markdown(path, use_cache=False)), repeat),
+        "llm": _time_ms(_quiet(lambda: convert_pdf_to_markdown(path, use_cache=False, use_layout=False)), repeat)
+    }
+
+def benchmark_database(scale: int, repeat: int, workspace: str) -> Dict[str, Any]:
+    from database.database_manager import DatabaseManager
+
+    manager = DatabaseManager(os.path.join(workspace, f"profiles_{scale}.db"))
+    try:
+        profile = make_synthetic_profile(10 * scale, 10 * scale)
+        return benchmark_manager(manager, copy.deepcopy(profile), repeat)
+    finally:
+        manager.close()
+
+BENCHMARKS = {
+    "pipeline": lambda scale, repeat, workspace: benchmark_pipeline(scale, repeat),
+    "parse_cv": lambda scale, repeat, workspace: benchmark_parser(scale, repeat),
+    "parse_cv_edit": lambda scale, repeat, workspace: benchmark_parser_edit(scale, repeat),
+    "pdf_to_markdown": benchmark_pdf,
+    "database": benchmark_database,
+}
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _flatten(value: Any, prefix: str = "") -> Dict[str, float]:
+    """Aplana el informe a {"ruta.de.la.medida": milisegundos} para compararlo."""
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+        return flat
+    return {prefix: value} if prefix.endswith("median_ms") else {}
+
+def compare_reports(previous: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Diferencias de las medianas entre dos informes (positivo: más lento ahora)."""
+    before, after = _flatten(previous["results"]), _flatten(current["results"])
+    rows = []
+    for key in sorted(before.keys() & after.keys()):
+        change = (after[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+        rows.append({"metric": key, "before_ms": before[key], "after_ms": after[key], "change_pct": round(change, 1)})
+    return rows
+
+def run_suite(scales: List[int], repeat: int, only: List[str], fake_settings: Dict[str, Any]) -> Dict[str, Any]:
+    from core.registry import set_model_factories
+
+    original_cwd = os.getcwd()
+    install_fake_models(**fake_settings)
+    results: Dict[str, Any] = {name: {} for name in only}
+    try:
+        with tempfile.TemporaryDirectory() as workspace:
+            # Las cachés, los almacenes y las carpetas de salida usan rutas relativas.
+            os.chdir(workspace)
+            os.makedirs("database")
+            for name in only:
+                for scale in scales:
+                    try:
+                        results[name][str(scale)] = BENCHMARKS[name](scale, repeat, workspace)
+                    except ImportError as e:
+                        results[name][str(scale)] = {"skipped": f"Falta una dependencia: {e}"}
+                    print(f"{name:>16} x{scale:<4} {json.dumps(results[name][str(scale)], ensure_ascii=False)}")
+            os.chdir(original_cwd)  # Se sale del directorio antes de borrarlo
+    finally:
+        os.chdir(original_cwd)
+        set_model_factories()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scales": scales,
+            "repeat": repeat,
+            "fake_model": fake_settings
+        },
+        "results": results
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline sin conexión con un LLM falso.")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="Factores de tamaño de las entradas sintéticas.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos hasta el primer token del modelo falso.")
+    parser.add_argument("--tokens-per-second", type=float, default=None,
+                        help="Ritmo de generación del modelo falso (sin límite por defecto).")
+    parser.add_argument("--output-tokens", type=int, default=300, help="Tokens por respuesta de texto.")
+    parser.add_argument("--json", help="Ruta donde guardar el informe en JSON.")
+    parser.add_argument("--compare", help="Informe JSON anterior con el que comparar.")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.scales, args.repeat, args.only, {
+        "latency_seconds": args.latency,
+        "tokens_per_second": args.tokens_per_second,
+        "output_tokens": args.output_tokens
+    })
+
+    if args.json:
+        with open(args.json, "w", encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Informe guardado en {args.json}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"\nComparación con {previous['meta'].get('commit')} (mediana, ms):")
+        for row in compare_reports(previous, report):
+            print(f"{row['metric']:<45}{row['before_ms']:>12.1f}{row['after_ms']:>12.1f}{row['change_pct']:>+9.1f}%")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
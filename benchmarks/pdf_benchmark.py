@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de extracción de texto de PDF.
+
+Genera PDFs sintéticos de varios tamaños con PyMuPDF y compara la extracción anterior
+(lectura completa del búfer y concatenación con `+=`, en un solo núcleo) con
+`extract_pdf_text` en serie y repartida entre procesos por rangos de páginas.
+
+Uso:
+    python benchmarks/pdf_benchmark.py
+    python benchmarks/pdf_benchmark.py --pages 50 400 --workers 4 --json pdf.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from typing import Callable, Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.pdf_processor import extract_pdf_text
+
+DEFAULT_PAGE_COUNTS = [10, 100, 400]
+LINES_PER_PAGE = 45
+
+def make_synthetic_pdf(path: str, pages: int) -> None:
+    """Escribe en `path` un PDF de `pages` páginas llenas de texto."""
+    import fitz
+
+    document = fitz.open()
+    for number in range(pages):
+        page = document.new_page()
+        text = "\n".join(
+            f"Página {number}, línea {line}: Logro cuantificable con impacto en la métrica clave."
+            for line in range(LINES_PER_PAGE)
+        )
+        page.insert_text((36, 36), text, fontsize=8)
+    document.save(path)
+    document.close()
+
+def legacy_extract(pdf_buffer: io.BytesIO) -> str:
+    """Reproduce la extracción anterior para comparar."""
+    import fitz
+
+    document = fitz.open(stream=pdf_buffer.read(), filetype="pdf")
+    full_text = ""
+    for page in document:
+        full_text += page.get_text("text") + "\n"
+    return full_text
+
+def _time_ms(operation: Callable[[], Any], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 2)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compara la extracción de texto de PDF anterior y actual.")
+    parser.add_argument("--pages", type=int, nargs="+", default=DEFAULT_PAGE_COUNTS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Ruta donde guardar el informe en JSON.")
+    args = parser.parse_args(argv)
+
+    report: List[Dict[str, Any]] = []
+    print(f"{'Páginas':>8}  {'Antes':>10}{'Serie':>10}{'Procesos ({})'.format(args.workers):>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = os.path.join(tmp, f"sintetico_{pages}.pdf")
+            make_synthetic_pdf(path, pages)
+            with open(path, "rb") as f:
+                data = f.read()
+            result = {
+                "pages": pages,
+                "legacy_ms": _time_ms(lambda: legacy_extract(io.BytesIO(data)), args.repeat),
+                "serial_ms": _time_ms(lambda: extract_pdf_text(path, workers=1), args.repeat),
+                "parallel_ms": _time_ms(lambda: extract_pdf_text(path, workers=args.workers), args.repeat)
+            }
+            report.append(result)
+            print(f"{pages:>8}  {result['legacy_ms']:>8.1f}ms{result['serial_ms']:>8.1f}ms{result['parallel_ms']:>14.1f}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+Simulación del limitador de Gemini contra un endpoint falso con cuota.
+
+Lanza N hilos que hacen llamadas a `FakeGeminiEndpoint` directamente y a través de
+`RateLimiter`, y compara los errores 429, las llamadas completadas y el rendimiento.
+La ventana de cuota se acorta (`--window`) para que la simulación dure segundos.
+
+Uso:
+    python benchmarks/rate_limit_simulation.py
+    python benchmarks/rate_limit_simulation.py --threads 32 --calls 240 --rpm 30 --window 5 --json rl.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from typing import Dict, Any, Callable
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.fakes import FakeGeminiEndpoint
+from core.rate_limit import RateLimiter, is_rate_limit_error
+
+PROMPT = "Genera un resumen profesional para el puesto. " * 20
+
+def _run(threads: int, calls: int, call: Callable[[str], str]) -> Dict[str, Any]:
+    """Reparte `calls` llamadas entre `threads` hilos y cuenta éxitos y errores de cuota."""
+    counts = {"ok": 0, "rate_limited": 0}
+    lock = threading.Lock()
+    remaining = iter(range(calls))
+
+    def worker() -> None:
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            try:
+                call(PROMPT)
+                key = "ok"
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                key = "rate_limited"
+            with lock:
+                counts[key] += 1
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {**counts, "elapsed_seconds": round(elapsed, 2), "ok_per_second": round(counts["ok"] / elapsed, 2)}
+
+def simulate(threads: int, calls: int, rpm: int, window: float, latency: float, max_attempts: int) -> Dict[str, Any]:
+    # El límite del limitador se expresa por minuto: se escala a la ventana acortada.
+    scaled_rpm = rpm * 60.0 / window
+
+    endpoint = FakeGeminiEndpoint(rpm=rpm, latency_seconds=latency, window_seconds=window)
+    without_limiter = _run(threads, calls, endpoint.generate)
+    without_limiter["endpoint"] = endpoint.snapshot()
+
+    endpoint = FakeGeminiEndpoint(rpm=rpm, latency_seconds=latency, window_seconds=window)
+    limiter = RateLimiter(rpm=scaled_rpm, max_concurrency=threads, max_attempts=max_attempts, burst=rpm)
+    with_limiter = _run(threads, calls, lambda prompt: limiter.call(endpoint.generate, prompt))
+    with_limiter["endpoint"] = endpoint.snapshot()
+    with_limiter["limiter"] = limiter.snapshot()
+
+    return {
+        "config": {"threads": threads, "calls": calls, "rpm": rpm, "window_seconds": window, "latency_seconds": latency},
+        "without_limiter": without_limiter,
+        "with_limiter": with_limiter
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simula el limitador de Gemini contra un endpoint falso.")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=120)
+    parser.add_argument("--rpm", type=int, default=30, help="Peticiones admitidas por ventana en el endpoint falso.")
+    parser.add_argument("--window", type=float, default=3.0, help="Duración de la ventana de cuota en segundos.")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max-attempts", type=int, default=8)
+    parser.add_argument("--json", help="Ruta donde guardar los resultados en JSON.")
+    args = parser.parse_args()
+
+    results = simulate(args.threads, args.calls, args.rpm, args.window, args.latency, args.max_attempts)
+    for name in ("without_limiter", "with_limiter"):
+        run = results[name]
+        print(f"{name:>16}: {run['ok']} completadas, {run['rate_limited']} con 429, "
+              f"{run['endpoint']['rejected']} rechazos del endpoint, "
+              f"{run['elapsed_seconds']} s ({run['ok_per_second']} ok/s)")
+    print(f"Limitador: {results['with_limiter']['limiter']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.json}")
+
+if __name__ == "__main__":
+    main()
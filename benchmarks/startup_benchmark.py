@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+"""
+Mide el coste de importación en frío de los módulos de CareerForge AI.
+
+Cada módulo se importa en un intérprete nuevo con `python -X importtime`, de modo que
+el resultado refleja lo que paga un worker de Streamlit recién arrancado. Los módulos
+de la ruta de arranque (lo que `app/main_ui.py` importa antes del primer renderizado)
+se suman y se comparan con un presupuesto; si se supera, el script termina con código 1.
+
+Uso:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --budget-ms 800 --json startup.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, Any, List, Optional
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Módulos que `app/main_ui.py` importa al arrancar, antes de renderizar la página.
+STARTUP_MODULES = [
+    "streamlit",
+    "dotenv",
+    "database.database_manager",
+    "app.profile_editor_ui",
+]
+
+# Módulos pesados que solo deberían cargarse cuando el usuario ejecuta una acción.
+DEFERRED_MODULES = [
+    "core.registry",
+    "core.llm_cache",
+    "core.chains",
+    "core.orchestrator",
+    "core.streaming",
+    "core.profile_parser",
+    "core.pdf_processor",
+    "langchain_google_genai",
+    "google.generativeai",
+    "fitz",
+]
+
+DEFAULT_BUDGET_MS = 1500.0
+
+def measure_import(module: str) -> Dict[str, Any]:
+    """Importa `module` en un intérprete nuevo y devuelve su tiempo acumulado de importación."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        last_line = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "error desconocido"
+        return {"module": module, "ok": False, "error": last_line}
+
+    cumulative_us = 0
+    heaviest = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, self_us, cumulative, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+            self_us, cumulative = int(self_us), int(cumulative)
+        except ValueError:
+            continue  # Cabecera de la tabla
+        heaviest.append((self_us, name))
+        if name == module:
+            cumulative_us = cumulative
+
+    heaviest.sort(reverse=True)
+    return {
+        "module": module,
+        "ok": True,
+        "cumulative_ms": round(cumulative_us / 1000, 1),
+        "heaviest": [{"module": name, "self_ms": round(us / 1000, 1)} for us, name in heaviest[:5]]
+    }
+
+def run_benchmark(modules: List[str]) -> List[Dict[str, Any]]:
+    return [measure_import(module) for module in modules]
+
+def print_report(title: str, results: List[Dict[str, Any]]) -> None:
+    print(f"\n{title}")
+    print(f"{'Módulo':<32}{'Acumulado (ms)':>16}   Dependencias más costosas")
+    for r in results:
+        if not r['ok']:
+            print(f"{r['module']:<32}{'n/d':>16}   {r['error']}")
+            continue
+        top = ", ".join(f"{h['module']} {h['self_ms']}ms" for h in r['heaviest'][:3])
+        print(f"{r['module']:<32}{r['cumulative_ms']:>16.1f}   {top}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mide el tiempo de importación en frío de la aplicación.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Presupuesto para la suma de los módulos de arranque.")
+    parser.add_argument("--json", help="Ruta donde guardar el informe en JSON.")
+    args = parser.parse_args(argv)
+
+    startup = run_benchmark(STARTUP_MODULES)
+    deferred = run_benchmark(DEFERRED_MODULES)
+    print_report("Ruta de arranque (se paga en cada worker nuevo)", startup)
+    print_report("Módulos diferidos (se pagan en la primera acción que los usa)", deferred)
+
+    startup_total = sum(r.get('cumulative_ms', 0.0) for r in startup)
+    within_budget = startup_total <= args.budget_ms and all(r['ok'] for r in startup)
+    print(f"\nTotal de arranque: {startup_total:.1f} ms (presupuesto {args.budget_ms:.0f} ms) -> "
+          f"{'OK' if within_budget else 'EXCEDIDO'}")
+
+    if args.json:
+        with open(args.json, "w", encoding='utf-8') as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "budget_ms": args.budget_ms,
+                "startup_total_ms": round(startup_total, 1),
+                "within_budget": within_budget,
+                "startup": startup,
+                "deferred": deferred
+            }, f, indent=2, ensure_ascii=False)
+
+    return 0 if within_budget else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
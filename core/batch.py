@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+"""
+Modo lote del pipeline: forja paquetes de aplicación para muchas ofertas a la vez.
+
+Las llamadas al LLM se ejecutan de forma asíncrona (`ainvoke`) con concurrencia acotada,
+de modo que el tiempo total depende de la latencia de la red en paralelo y no en serie.
+
+Uso desde la línea de comandos:
+    python -m core.batch ofertas.jsonl --concurrency 8
+    python -m core.batch carpeta_de_ofertas/ --profile perfil.json
+
+Cada registro es un objeto JSON con las claves `company_name`, `job_description`
+y, opcionalmente, `research_type` ("Análisis de la Empresa", "Estimación Salarial" o "Ninguna").
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, Any, List, Optional
+
+from core.orchestrator import arun_full_pipeline, GENERATION_MODES
+from database.database_manager import DEFAULT_USER_ID
+
+DEFAULT_RESEARCH_TYPE = "Ninguna"
+DEFAULT_CONCURRENCY = 8
+
+def _normalize_record(raw: Any, origin: str) -> Dict[str, str]:
+    """Valida un registro de entrada y completa los campos opcionales."""
+    if not isinstance(raw, dict):
+        raise ValueError(f"{origin}: se esperaba un objeto JSON.")
+    company_name = (raw.get('company_name') or "").strip()
+    job_description = (raw.get('job_description') or "").strip()
+    if not company_name or not job_description:
+        raise ValueError(f"{origin}: faltan 'company_name' o 'job_description'.")
+    return {
+        "company_name": company_name,
+        "job_description": job_description,
+        "research_type": raw.get('research_type') or DEFAULT_RESEARCH_TYPE
+    }
+
+def _load_records_from_file(path: str) -> List[Dict[str, str]]:
+    """Lee registros de un archivo .jsonl (uno por línea) o .json (objeto o lista)."""
+    records = []
+    with open(path, "r", encoding='utf-8') as f:
+        if path.endswith(".jsonl"):
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    records.append(_normalize_record(json.loads(line), f"{path}:{line_number}"))
+        else:
+            data = json.load(f)
+            items = data if isinstance(data, list) else [data]
+            for index, item in enumerate(items):
+                records.append(_normalize_record(item, f"{path}[{index}]"))
+    return records
+
+def load_batch_records(source: str) -> List[Dict[str, str]]:
+    """
+    Carga los registros de un lote desde un archivo JSONL/JSON o desde un directorio
+    que contenga archivos .json y .jsonl (se procesan en orden alfabético).
+    """
+    if os.path.isdir(source):
+        records = []
+        for file_name in sorted(os.listdir(source)):
+            if file_name.endswith((".json", ".jsonl")):
+                records.extend(_load_records_from_file(os.path.join(source, file_name)))
+        return records
+    return _load_records_from_file(source)
+
+async def arun_batch_pipeline(
+    profile_data: Dict[str, Any],
+    records: List[Dict[str, str]],
+    max_concurrency: int = DEFAULT_CONCURRENCY,
+    generation_mode: str = "single",
+    user_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Ejecuta el pipeline completo para cada registro con, como máximo, `max_concurrency`
+    aplicaciones en vuelo. Un fallo en un registro no detiene el resto del lote.
+    Los paquetes se registran en el historial de `user_id` (por defecto, el usuario local).
+
+    Returns:
+        Una lista (en el mismo orden que `records`) de diccionarios con el estado,
+        la carpeta de salida o el error, y la duración de cada aplicación.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def process(record: Dict[str, str]) -> Dict[str, Any]:
+        async with semaphore:
+            started = time.perf_counter()
+            result = {"company_name": record['company_name'], "research_type": record['research_type']}
+            try:
+                output_folder, *_ = await arun_full_pipeline(
+                    profile_data=profile_data,
+                    job_description=record['job_description'],
+                    company_name=record['company_name'],
+                    research_type=record['research_type'],
+                    generation_mode=generation_mode,
+                    user_id=DEFAULT_USER_ID if user_id is None else user_id
+                )
+                result.update(status="ok", output_folder=output_folder)
+            except Exception as e:
+                result.update(status="error", error=str(e))
+            result['seconds'] = round(time.perf_counter() - started, 2)
+            print(f"[{result['status']}] {record['company_name']} ({result['seconds']}s)")
+            return result
+
+    return await asyncio.gather(*(process(record) for record in records))
+
+def run_batch_pipeline(
+    profile_data: Dict[str, Any],
+    records: List[Dict[str, str]],
+    max_concurrency: int = DEFAULT_CONCURRENCY,
+    generation_mode: str = "single",
+    user_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Punto de entrada síncrono para `arun_batch_pipeline`."""
+    return asyncio.run(arun_batch_pipeline(profile_data, records, max_concurrency, generation_mode, user_id))
+
+def print_batch_summary(results: List[Dict[str, Any]], elapsed: float) -> None:
+    """Imprime un resumen legible del lote."""
+    succeeded = [r for r in results if r['status'] == "ok"]
+    failed = [r for r in results if r['status'] != "ok"]
+    print("\n===== Resumen del lote =====")
+    print(f"Aplicaciones: {len(results)} | Éxitos: {len(succeeded)} | Fallos: {len(failed)}")
+    print(f"Tiempo total: {elapsed:.1f}s")
+    for r in succeeded:
+        print(f"  ✅ {r['company_name']} -> {r['output_folder']}")
+    for r in failed:
+        print(f"  ❌ {r['company_name']}: {r['error']}")
+
+def _load_profile(profile_path: Optional[str], user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Carga el perfil desde un archivo JSON o, si no se indica, el del usuario `user_id` en la base de datos."""
+    if profile_path:
+        with open(profile_path, "r", encoding='utf-8') as f:
+            return json.load(f)
+    from database.database_manager import get_db_manager
+    return get_db_manager().load_profile(DEFAULT_USER_ID if user_id is None else user_id)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Forja paquetes de aplicación para un lote de ofertas.")
+    parser.add_argument("source", help="Archivo .jsonl/.json o directorio con registros de ofertas.")
+    parser.add_argument("--profile", help="Archivo JSON con el perfil. Por defecto se usa el perfil guardado en la base de datos.")
+    parser.add_argument("--user-id", type=int,
+                        help="Usuario cuyo perfil guardado se usa si no se indica --profile y en cuyo historial se registran los paquetes.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Aplicaciones simultáneas como máximo.")
+    parser.add_argument("--generation-mode", choices=GENERATION_MODES, default="single",
+                        help="'parallel' genera cada sección con su propia cadena de forma concurrente.")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    profile_data = _load_profile(args.profile, args.user_id)
+    if not profile_data:
+        print("Error: No hay un perfil disponible. Usa --profile o guarda uno desde la aplicación.")
+        return 1
+
+    records = load_batch_records(args.source)
+    if not records:
+        print("No se encontraron registros en la fuente indicada.")
+        return 1
+
+    from core.registry import warm_up
+    warm_up()
+
+    print(f"Procesando {len(records)} ofertas con concurrencia {args.concurrency}...")
+    started = time.perf_counter()
+    results = run_batch_pipeline(profile_data, records, args.concurrency, args.generation_mode, args.user_id)
+    print_batch_summary(results, time.perf_counter() - started)
+    return 0 if all(r['status'] == "ok" for r in results) else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,40 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
+import time
+import asyncio
+from typing import Any, Dict, Iterator
+
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain.schema.runnable import Runnable
+from langchain.schema.runnable import Runnable, RunnableLambda, RunnableParallel
+
+from core.llm_cache import cached_chat_model, stream_cached_chat_model
+from core.rate_limit import is_rate_limit_error, backoff_delay
+from core.telemetry import record_retry
+from core.registry import get_chat_model, get_or_build
+
+MODEL_NAME = "gemini-1.5-pro-latest"
+NO_RESEARCH_TEXT = "No se seleccionó ninguna investigación."
+NO_RESEARCH_TYPE = "Ninguna"
+RESEARCH_TYPES = ("Análisis de la Empresa", "Estimación Salarial", NO_RESEARCH_TYPE)
+SECTION_MAX_ATTEMPTS = 3
+GENERATION_TEMPERATURE = 0.6
+
+def get_llm(temperature: float) -> Runnable:
+    """Devuelve el modelo de Gemini compartido, envuelto en la caché persistente de respuestas."""
+    return get_or_build(
+        ("llm", MODEL_NAME, temperature),
+        lambda: cached_chat_model(get_chat_model(MODEL_NAME, temperature), MODEL_NAME, temperature)
+    )
 
 def get_research_chain(research_type: str) -> Runnable:
     """
-    Crea dinámicamente una cadena para investigación de empresas o salarios
-    utilizando el conocimiento interno del LLM.
+    Devuelve la cadena para investigación de empresas o salarios que utiliza
+    el conocimiento interno del LLM. Se construye una sola vez por tipo y proceso.
     """
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro-latest", temperature=0.3)
+    return get_or_build(("research", research_type), lambda: _build_research_chain(research_type))
+
+def _build_research_chain(research_type: str) -> Runnable:
+    """Crea dinámicamente la cadena de investigación para el tipo indicado."""
+    llm = get_llm(temperature=0.3)
     
     if research_type == "Análisis de la Empresa":
         prompt_text = """
@@ -39,15 +65,12 @@ def get_research_chain(research_type: str) -> Runnable:
         Descripción de la oferta: {job_description}
         """
     else:
-        return Runnable.from_callable(lambda x: "No se seleccionó ninguna investigación.")
+        return RunnableLambda(lambda x: NO_RESEARCH_TEXT)
 
     prompt = PromptTemplate.from_template(prompt_text)
     return prompt | llm | StrOutputParser()
 
-def get_generation_chain() -> Runnable:
-    """Crea la cadena principal que genera el paquete de aplicación."""
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro-latest", temperature=0.6)
-    prompt_text = """
+GENERATION_PROMPT = """
     Eres CareerForge AI, un coach de carrera experto. Tu tarea es generar un paquete de aplicación
     completo y 'spotless' usando el contexto proporcionado.
     Genera el contenido para cada una de las 3 secciones solicitadas y sepáralas
@@ -78,5 +101,138 @@ def get_generation_chain() -> Runnable:
     - Una lista de 3 preguntas inteligentes que el candidato puede hacer para demostrar su interés y senior-level.
     ---IP_END---
     """
-    prompt = PromptTemplate.from_template(prompt_text)
-    return prompt | llm | StrOutputParser()
+
+def _get_generation_prompt() -> PromptTemplate:
+    return get_or_build("generation_prompt", lambda: PromptTemplate.from_template(GENERATION_PROMPT))
+
+def get_generation_chain() -> Runnable:
+    """Devuelve la cadena principal que genera el paquete de aplicación."""
+    return get_or_build(
+        "generation",
+        lambda: _get_generation_prompt() | get_llm(temperature=GENERATION_TEMPERATURE) | StrOutputParser()
+    )
+
+def stream_generation(generation_input: Dict[str, str], use_cache: bool = True) -> Iterator[str]:
+    """
+    Genera el paquete de aplicación completo emitiendo el texto a medida que llega del LLM.
+    El texto incluye los delimitadores ---CV_END---, ---CL_END--- y ---IP_END---.
+    """
+    llm = get_chat_model(MODEL_NAME, GENERATION_TEMPERATURE)
+    prompt_value = _get_generation_prompt().invoke(generation_input)
+    return stream_cached_chat_model(llm, MODEL_NAME, GENERATION_TEMPERATURE, prompt_value, use_cache=use_cache)
+
+# ----------------------------------------------------------------------------
+# Generación por secciones en paralelo
+# Cada sección tiene su propia cadena enfocada, de modo que la latencia total es
+# la de la sección más lenta y un fallo solo obliga a repetir esa sección.
+# ----------------------------------------------------------------------------
+
+SECTION_CONTEXT = """
+    Eres CareerForge AI, un coach de carrera experto. Usa el contexto proporcionado para generar
+    únicamente la sección solicitada, con calidad 'spotless'. No incluyas títulos como 'SECCIÓN 1'
+    ni delimitadores.
+
+    **CONTEXTO PROPORCIONADO:**
+    1.  **Perfil del Candidato:** {profile_text}
+    2.  **Oferta Laboral:** {job_description}
+    3.  **Investigación Estratégica:** {research_context}
+"""
+
+SECTION_INSTRUCTIONS = {
+    "cv": """
+    **INSTRUCCIONES: genera el contenido del CV OPTIMIZADO.**
+    Revisa el perfil del candidato y adáptalo a la oferta. Enfócate en reescribir los logros de la experiencia
+    laboral para que resuenen con los requisitos de la oferta, usando el método STAR (Situación, Tarea, Acción, Resultado)
+    y cuantificando el impacto. Crea un resumen profesional potente y directo.
+    """,
+    "cover_letter": """
+    **INSTRUCCIONES: genera el contenido de la CARTA DE PRESENTACIÓN.**
+    Escribe una carta de presentación concisa y persuasiva. Usa la 'Investigación Estratégica' para personalizar
+    el primer párrafo y demostrar un interés genuino. En el segundo párrafo, conecta 2-3 logros clave
+    del perfil directamente con las necesidades de la oferta.
+    """,
+    "interview_prep": """
+    **INSTRUCCIONES: genera el contenido de la PREPARACIÓN PARA LA ENTREVISTA.**
+    Basado en la oferta y el perfil, genera:
+    - Una lista de 3 posibles preguntas de comportamiento o técnicas que probablemente le harán al candidato.
+    - Una lista de 3 preguntas inteligentes que el candidato puede hacer para demostrar su interés y senior-level.
+    """
+}
+
+SECTION_ERROR_TEXT = {
+    "cv": "Error: No se pudo generar la sección del CV.",
+    "cover_letter": "Error: No se pudo generar la sección de la Carta de Presentación.",
+    "interview_prep": "Error: No se pudo generar la sección de Preparación de Entrevista."
+}
+
+# Marcadores de las secciones que no se pudieron separar en la salida del LLM (modos único y streaming)
+SECTION_PARSE_ERRORS = {
+    "cv": "Error: No se pudo parsear la sección del CV.",
+    "cover_letter": "Error: No se pudo parsear la sección de la Carta de Presentación.",
+    "interview_prep": "Error: No se pudo parsear la sección de Preparación de Entrevista."
+}
+
+def is_failed_section(content: str) -> bool:
+    """Indica si el texto de una sección es un marcador de error en lugar de contenido generado."""
+    return content in SECTION_ERROR_TEXT.values() or content in SECTION_PARSE_ERRORS.values()
+
+def get_section_chain(section: str) -> Runnable:
+    """
+    Devuelve la cadena que genera una única sección del paquete ("cv", "cover_letter" o "interview_prep").
+    Cada llamada se reintenta por separado ante errores del LLM que no son de cuota (los 429
+    ya los reintenta el limitador de `core.rate_limit`).
+    """
+    if section not in SECTION_INSTRUCTIONS:
+        raise ValueError(f"Sección desconocida: {section}")
+    return get_or_build(("section", section), lambda: _build_section_chain(section))
+
+def _build_section_chain(section: str) -> Runnable:
+    llm = get_llm(temperature=GENERATION_TEMPERATURE)
+    prompt = PromptTemplate.from_template(SECTION_CONTEXT + SECTION_INSTRUCTIONS[section])
+    return with_non_quota_retry(prompt | llm | StrOutputParser(), SECTION_MAX_ATTEMPTS)
+
+def with_non_quota_retry(chain: Runnable, max_attempts: int) -> Runnable:
+    """
+    Reintenta `chain` con espera exponencial ante cualquier error salvo los de cuota. Un 429 que
+    llega hasta aquí es porque el limitador ya agotó sus reintentos: repetirlo multiplicaría las
+    llamadas y volvería a reservar RPM/TPM justo cuando el límite AIMD pide frenar.
+    """
+    def invoke(inputs: Any, config) -> Any:
+        for attempt in range(max_attempts):
+            try:
+                return chain.invoke(inputs, config)
+            except Exception as e:
+                if is_rate_limit_error(e) or attempt == max_attempts - 1:
+                    raise
+                print(f"Reintentando tras un error del LLM ({attempt + 1}/{max_attempts - 1}): {e}")
+                record_retry()
+                time.sleep(backoff_delay(attempt))
+
+    async def ainvoke(inputs: Any, config) -> Any:
+        for attempt in range(max_attempts):
+            try:
+                return await chain.ainvoke(inputs, config)
+            except Exception as e:
+                if is_rate_limit_error(e) or attempt == max_attempts - 1:
+                    raise
+                print(f"Reintentando tras un error del LLM ({attempt + 1}/{max_attempts - 1}): {e}")
+                record_retry()
+                await asyncio.sleep(backoff_delay(attempt))
+
+    return RunnableLambda(invoke, afunc=ainvoke)
+
+def get_parallel_generation_chain() -> Runnable:
+    """
+    Devuelve una cadena que genera las tres secciones del paquete de forma concurrente.
+    Devuelve un diccionario con las claves "cv", "cover_letter" e "interview_prep".
+    Si una sección agota sus reintentos, su valor es un mensaje de error y las demás se conservan.
+    """
+    return get_or_build("parallel_generation", _build_parallel_generation_chain)
+
+def _build_parallel_generation_chain() -> Runnable:
+    return RunnableParallel({
+        section: get_section_chain(section).with_fallbacks(
+            [RunnableLambda(lambda x, text=SECTION_ERROR_TEXT[section]: text)]
+        )
+        for section in SECTION_INSTRUCTIONS
+    })
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+"""
+Dobles locales de la API de Gemini para pruebas y benchmarks sin conexión.
+
+`FakeGeminiEndpoint` imita la cuota de la API: acepta como máximo `rpm` peticiones en
+cualquier ventana de 60 segundos (ventana deslizante) y responde con un error 429
+"Resource exhausted" al superarla, igual que Gemini. Sirve para comprobar el limitador de
+`core.rate_limit` sin gastar cuota real.
+
+`FakeChatModel` y `FakeGenerativeModel` sustituyen a `ChatGoogleGenerativeAI` y
+`genai.GenerativeModel` (ver `install_fake_models`). Sus respuestas son deterministas y
+tienen la forma que espera cada cadena: el paquete con los delimitadores ---CV_END---,
+---CL_END--- y ---IP_END---, JSON válido de `UserProfile` para el parser de CVs y Markdown
+para la estructuración de PDFs. La latencia y el ritmo de tokens son configurables.
+"""
+
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from typing import Callable, Dict, Any, Iterator, List, Optional
+
+CHARS_PER_TOKEN = 4
+PACKAGE_DELIMITERS = ("---CV_END---", "---CL_END---", "---IP_END---")
+FILLER_WORDS = (
+    "liderazgo impacto equipo métricas cliente producto escalabilidad datos estrategia "
+    "resultados entrega calidad colaboración arquitectura crecimiento automatización"
+).split()
+
+class FakeResourceExhausted(Exception):
+    """Error equivalente al 429 / ResourceExhausted de la API de Gemini."""
+
+class FakeGeminiEndpoint:
+    """Endpoint falso con límite de peticiones por minuto y latencia configurable."""
+
+    def __init__(
+        self,
+        rpm: float = 60,
+        latency_seconds: float = 0.05,
+        window_seconds: float = 60.0,
+        respond: Optional[Callable[[str], str]] = None
+    ):
+        self.rpm = rpm
+        self.latency_seconds = latency_seconds
+        self.window_seconds = window_seconds
+        self.respond = respond or (lambda prompt: f"Respuesta a {len(prompt)} caracteres.")
+        self._accepted = deque()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "accepted": 0, "rejected": 0}
+
+    def _admit(self) -> None:
+        """Registra la petición o lanza `FakeResourceExhausted` si la ventana está llena."""
+        now = time.monotonic()
+        with self._lock:
+            self.stats["requests"] += 1
+            while self._accepted and now - self._accepted[0] >= self.window_seconds:
+                self._accepted.popleft()
+            if len(self._accepted) >= self.rpm:
+                self.stats["rejected"] += 1
+                raise FakeResourceExhausted("429 Resource exhausted: se superó la cuota de peticiones por minuto.")
+            self._accepted.append(now)
+            self.stats["accepted"] += 1
+
+    def generate(self, prompt: str) -> str:
+        self._admit()
+        time.sleep(self.latency_seconds)
+        return self.respond(prompt)
+
+    async def agenerate(self, prompt: str) -> str:
+        self._admit()
+        await asyncio.sleep(self.latency_seconds)
+        return self.respond(prompt)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats)
+
+# ----------------------------------------------------------------------------
+# Modelos falsos deterministas
+# ----------------------------------------------------------------------------
+
+class FakeMessage:
+    """Respuesta mínima con la interfaz de un mensaje de LangChain (`content`)."""
+
+    def __init__(self, content: str):
+        self.content = content
+
+class FakeGenerateResponse:
+    """Respuesta mínima con la interfaz de `generate_content` (`text`)."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+def _prompt_text(prompt: Any) -> str:
+    return prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+
+def _embedded_text(prompt: str, marker: str) -> str:
+    """Texto entre el primer `---` tras `marker` y el último `---` del prompt."""
+    start = prompt.find("---", prompt.find(marker)) + 3
+    end = prompt.rfind("---")
+    return prompt[start:end].strip() if 3 <= start < end else ""
+
+def _rng(prompt: str) -> random.Random:
+    return random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+
+def filler_text(prompt: str, tokens: int) -> str:
+    """Texto de relleno determinista de unos `tokens` tokens, derivado del prompt."""
+    rng = _rng(prompt)
+    words, length = [], 0
+    while length < tokens * CHARS_PER_TOKEN:
+        word = rng.choice(FILLER_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words).capitalize() + "."
+
+def fake_profile(cv_text: str) -> Dict[str, Any]:
+    """Perfil con la estructura de `UserProfile` derivado de las líneas del CV."""
+    lines = [line.strip("-*#• ").strip() for line in cv_text.splitlines()]
+    lines = [line for line in lines if line]
+    experiences = []
+    for index in range(0, len(lines[1:]), 5):
+        block = lines[1 + index:1 + index + 5]
+        experiences.append({
+            "role": block[0][:80],
+            "company": f"Empresa {len(experiences) + 1}",
+            "period": "2020 - 2024",
+            "achievements": [{"description": line, "skills": line.split()[:2]} for line in block[1:]]
+        })
+    return {
+        "full_name": lines[0][:80] if lines else "Candidato",
+        "contact": {"email": "candidato@example.com", "linkedin": None, "phone": None},
+        "base_summary": filler_text(cv_text, 40),
+        "experiences": experiences,
+        "skills_inventory": {"Técnicas": sorted({word.lower() for line in lines[:20] for word in line.split()[:1]})}
+    }
+
+def fake_markdown(raw_text: str) -> str:
+    """Markdown sencillo: las líneas cortas pasan a encabezados y el resto a viñetas."""
+    output = []
+    for line in raw_text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        output.append(f"## {line}" if len(line.split()) <= 4 and not line.endswith(".") else f"- {line}")
+    return "\n".join(output)
+
+class _FakeModelBase:
+    """Latencia hasta el primer token más un ritmo de generación en tokens por segundo."""
+
+    def __init__(
+        self,
+        model_name: str,
+        latency_seconds: float = 0.0,
+        tokens_per_second: Optional[float] = None,
+        output_tokens: int = 300
+    ):
+        self.model_name = model_name
+        self.latency_seconds = latency_seconds
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.calls = 0
+
+    def _generation_seconds(self, text: str) -> float:
+        if not self.tokens_per_second:
+            return 0.0
+        return len(text) / CHARS_PER_TOKEN / self.tokens_per_second
+
+    def _respond(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def _generate(self, prompt: Any) -> str:
+        self.calls += 1
+        text = self._respond(_prompt_text(prompt))
+        time.sleep(self.latency_seconds + self._generation_seconds(text))
+        return text
+
+class FakeChatModel(_FakeModelBase):
+    """Sustituto de `ChatGoogleGenerativeAI` con `invoke`, `ainvoke` y `stream`."""
+
+    def __init__(self, model_name: str, temperature: float = 0.0, **kwargs: Any):
+        super().__init__(model_name, **kwargs)
+        self.temperature = temperature
+
+    def _respond(self, prompt: str) -> str:
+        if PACKAGE_DELIMITERS[0] in prompt:
+            sections = [filler_text(f"{delimiter}{prompt}", self.output_tokens) for delimiter in PACKAGE_DELIMITERS]
+            return "\n".join(f"{section}\n{delimiter}" for section, delimiter in zip(sections, PACKAGE_DELIMITERS))
+        if "CV TEXT:" in prompt:
+            return json.dumps(fake_profile(_embedded_text(prompt, "CV TEXT:")), ensure_ascii=False)
+        return filler_text(prompt, self.output_tokens)
+
+    def invoke(self, prompt: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> FakeMessage:
+        return FakeMessage(self._generate(prompt))
+
+    async def ainvoke(self, prompt: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> FakeMessage:
+        self.calls += 1
+        text = self._respond(_prompt_text(prompt))
+        await asyncio.sleep(self.latency_seconds + self._generation_seconds(text))
+        return FakeMessage(text)
+
+    def stream(self, prompt: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Iterator[FakeMessage]:
+        self.calls += 1
+        text = self._respond(_prompt_text(prompt))
+        time.sleep(self.latency_seconds)
+        for chunk in re.findall(r"\S+\s*", text):
+            time.sleep(self._generation_seconds(chunk))
+            yield FakeMessage(chunk)
+
+class FakeGenerativeModel(_FakeModelBase):
+    """Sustituto de `genai.GenerativeModel` con `generate_content`."""
+
+    def _respond(self, prompt: str) -> str:
+        return fake_markdown(_embedded_text(prompt, "TEXTO EN BRUTO A CONVERTIR:"))
+
+    def generate_content(self, prompt: Any, **kwargs: Any) -> FakeGenerateResponse:
+        return FakeGenerateResponse(self._generate(prompt))
+
+def install_fake_models(
+    latency_seconds: float = 0.0,
+    tokens_per_second: Optional[float] = None,
+    output_tokens: int = 300
+) -> List[_FakeModelBase]:
+    """
+    Sustituye los modelos del registro por los falsos. Devuelve la lista (que crece a medida
+    que el registro los construye) para poder contar llamadas. Se deshace con
+    `core.registry.set_model_factories()`.
+    """
+    from core.registry import set_model_factories
+
+    created: List[_FakeModelBase] = []
+    settings = {"latency_seconds": latency_seconds, "tokens_per_second": tokens_per_second, "output_tokens": output_tokens}
+
+    def chat_model(model_name: str, temperature: float) -> FakeChatModel:
+        created.append(FakeChatModel(model_name, temperature, **settings))
+        return created[-1]
+
+    def generative_model(model_name: str) -> FakeGenerativeModel:
+        created.append(FakeGenerativeModel(model_name, **settings))
+        return created[-1]
+
+    set_model_factories(chat_model, generative_model)
+    return created
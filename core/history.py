@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+"""
+Historial indexado de los paquetes de aplicación generados.
+
+Cada paquete que se publica en `outputs/` (investigación, CV, carta y preparación de la
+entrevista, con la empresa, el puesto y la fecha) se registra en SQLite y en un índice de
+texto completo FTS5, de modo que buscar entre miles de aplicaciones pasadas no exige recorrer
+el árbol de carpetas. Los paquetes se registran después de publicar su carpeta de forma
+atómica (ver `core.orchestrator.publish_package_folder`), así que el índice nunca apunta a
+una carpeta a medio escribir.
+"""
+
+import os
+import re
+import time
+import sqlite3
+from typing import Dict, Any, List, Optional
+
+from core.research_store import extract_job_title
+from database.database_manager import DEFAULT_USER_ID
+
+HISTORY_DB_PATH = "database/history.db"
+SEARCH_LIMIT = 20
+SNIPPET_TOKENS = 16
+# Columnas de texto indexadas; el orden es el de la tabla virtual FTS5.
+INDEXED_COLUMNS = ("company_name", "job_title", "job_description", "research", "cv", "cover_letter", "interview_prep")
+SECTION_COLUMNS = ("cv", "cover_letter", "interview_prep")
+
+def build_match_query(query: str) -> str:
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura: cada término va entre comillas
+    (los operadores y la puntuación no se interpretan) y el último admite prefijos.
+    """
+    terms = re.findall(r"\w+", query or "")
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+class ApplicationHistory:
+    """Gestiona el registro y la búsqueda de paquetes generados en SQLite + FTS5."""
+
+    def __init__(self, db_path: str = HISTORY_DB_PATH):
+        self.db_path = db_path
+        self._is_setup = False
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Establece y devuelve una conexión a la base de datos del historial."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._is_setup:
+            conn.execute("PRAGMA journal_mode=WAL;")
+            columns = ", ".join(INDEXED_COLUMNS)
+            new_values = ", ".join(f"new.{column}" for column in INDEXED_COLUMNS)
+            old_values = ", ".join(f"old.{column}" for column in INDEXED_COLUMNS)
+            conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS applications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                company_name TEXT NOT NULL,
+                job_title TEXT,
+                research_type TEXT,
+                folder TEXT NOT NULL UNIQUE,
+                created_at REAL NOT NULL,
+                job_description TEXT,
+                research TEXT,
+                cv TEXT,
+                cover_letter TEXT,
+                interview_prep TEXT,
+                failed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_applications_user ON applications (user_id, created_at);
+
+            -- Índice de contenido externo: el texto vive en `applications` y los triggers lo sincronizan.
+            CREATE VIRTUAL TABLE IF NOT EXISTS applications_fts USING fts5(
+                {columns}, content='applications', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS applications_ai AFTER INSERT ON applications BEGIN
+                INSERT INTO applications_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS applications_ad AFTER DELETE ON applications BEGIN
+                INSERT INTO applications_fts (applications_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS applications_au AFTER UPDATE ON applications BEGIN
+                INSERT INTO applications_fts (applications_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO applications_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END;
+            """)
+            # Los historiales creados antes de marcar los paquetes fallidos no tienen la columna
+            if "failed" not in {row['name'] for row in conn.execute("PRAGMA table_info(applications);")}:
+                conn.execute("ALTER TABLE applications ADD COLUMN failed INTEGER NOT NULL DEFAULT 0;")
+            self._is_setup = True
+        return conn
+
+    def record(
+        self,
+        user_id: int,
+        company_name: str,
+        job_description: str,
+        research_type: str,
+        folder: str,
+        research: str,
+        sections: Dict[str, str],
+        created_at: Optional[float] = None,
+        failed: bool = False
+    ) -> int:
+        """
+        Registra un paquete ya publicado y devuelve su ID. Volver a registrar la misma carpeta la
+        sustituye. `failed` marca los paquetes con alguna sección que no se pudo generar.
+        """
+        with self._get_connection() as conn:
+            conn.execute("DELETE FROM applications WHERE folder = ?;", (folder,))
+            return conn.execute(
+                "INSERT INTO applications (user_id, company_name, job_title, research_type, folder, created_at, "
+                "job_description, research, cv, cover_letter, interview_prep, failed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+                (user_id, company_name, extract_job_title(job_description or ""), research_type, folder,
+                 created_at or time.time(), job_description, research,
+                 sections.get('cv'), sections.get('cover_letter'), sections.get('interview_prep'), int(failed))
+            ).lastrowid
+
+    def update_section(self, folder: str, section: str, content: str) -> bool:
+        """Actualiza una sección regenerada del paquete de `folder`. Devuelve si el paquete estaba indexado."""
+        if section not in SECTION_COLUMNS:
+            raise ValueError(f"Sección desconocida: {section}")
+        with self._get_connection() as conn:
+            return conn.execute(
+                f"UPDATE applications SET {section} = ? WHERE folder = ?;", (content, folder)
+            ).rowcount > 0
+
+    def set_failed(self, folder: str, failed: bool) -> None:
+        """Marca o desmarca el paquete de `folder` como fallido (p. ej. tras regenerar una sección)."""
+        with self._get_connection() as conn:
+            conn.execute("UPDATE applications SET failed = ? WHERE folder = ?;", (int(failed), folder))
+
+    def search(self, query: str, user_id: Optional[int] = None, limit: int = SEARCH_LIMIT) -> List[Dict[str, Any]]:
+        """
+        Busca en todas las columnas indexadas y devuelve los paquetes más relevantes (BM25) con
+        sus metadatos y un fragmento del texto que coincide. Sin términos devuelve los más recientes.
+        """
+        match = build_match_query(query)
+        if not match:
+            return self.recent(user_id, limit)
+        sql = (
+            "SELECT a.id, a.user_id, a.company_name, a.job_title, a.research_type, a.folder, a.created_at, a.failed, "
+            f"snippet(applications_fts, -1, '**', '**', '…', {SNIPPET_TOKENS}) AS snippet "
+            "FROM applications_fts JOIN applications a ON a.id = applications_fts.rowid "
+            "WHERE applications_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        if user_id is not None:
+            sql += " AND a.user_id = ?"
+            params.append(user_id)
+        # `rank` (BM25 por defecto) permite a FTS5 ordenar sin evaluar la función por separado.
+        sql += " ORDER BY applications_fts.rank LIMIT ?;"
+        params.append(limit)
+        try:
+            with self._get_connection() as conn:
+                return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error al buscar en el historial: {e}")
+            return []
+
+    def recent(self, user_id: Optional[int] = None, limit: int = SEARCH_LIMIT) -> List[Dict[str, Any]]:
+        """Paquetes más recientes (sin el contenido completo)."""
+        sql = "SELECT id, user_id, company_name, job_title, research_type, folder, created_at, failed FROM applications"
+        params: List[Any] = []
+        if user_id is not None:
+            sql += " WHERE user_id = ?"
+            params.append(user_id)
+        sql += " ORDER BY created_at DESC LIMIT ?;"
+        params.append(limit)
+        with self._get_connection() as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def get(self, application_id: int) -> Optional[Dict[str, Any]]:
+        """Devuelve el paquete completo (metadatos y contenido) o None."""
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT * FROM applications WHERE id = ?;", (application_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_by_folder(self, folder: str) -> Optional[Dict[str, Any]]:
+        """Devuelve el paquete publicado en `folder` o None."""
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT * FROM applications WHERE folder = ?;", (folder,)).fetchone()
+        return dict(row) if row else None
+
+    def delete(self, application_id: int) -> bool:
+        """Elimina el paquete del índice (la carpeta en disco se conserva)."""
+        with self._get_connection() as conn:
+            return conn.execute("DELETE FROM applications WHERE id = ?;", (application_id,)).rowcount > 0
+
+    def import_output_folders(self, root: str = "outputs", user_id: int = DEFAULT_USER_ID) -> int:
+        """
+        Indexa las carpetas de `root` que aún no están en el historial (p. ej. paquetes generados
+        antes de existir el índice). La empresa se toma del nombre de la carpeta y la fecha, de
+        su fecha de modificación. Devuelve cuántas carpetas se añadieron.
+        """
+        from core.orchestrator import SECTION_FILES, RESEARCH_FILE
+
+        if not os.path.isdir(root):
+            return 0
+        with self._get_connection() as conn:
+            known = {row['folder'] for row in conn.execute("SELECT folder FROM applications;")}
+
+        def read(folder: str, file_name: str) -> Optional[str]:
+            path = os.path.join(folder, file_name)
+            if not os.path.exists(path):
+                return None
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+
+        added = 0
+        for entry in sorted(os.scandir(root), key=lambda e: e.name):
+            if not entry.is_dir() or entry.name.startswith(".") or entry.path in known:
+                continue
+            sections = {section: read(entry.path, file_name) for section, file_name in SECTION_FILES.items()}
+            if not any(sections.values()):
+                continue
+            company_name = re.sub(r"_\d{4}-\d{2}-\d{2}_\d{6}(_\d+)?$", "", entry.name).replace("_", " ")
+            self.record(
+                user_id, company_name, "", None, entry.path, read(entry.path, RESEARCH_FILE), sections,
+                created_at=entry.stat().st_mtime
+            )
+            added += 1
+        return added
+
+# Instancia global compartida por la aplicación
+application_history = ApplicationHistory()
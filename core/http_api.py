@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+"""
+API HTTP local y asíncrona de CareerForge, para usar el pipeline desde otras herramientas.
+
+Se sirve con Tornado (ya instalado como dependencia de Streamlit) sobre un único event loop;
+las llamadas al LLM usan `ainvoke` y la coalescencia y la contrapresión las aplica
+`core.service.GenerationService`.
+
+Endpoints:
+    GET  /health          Estado de la cola y contadores del servicio.
+    POST /profiles        Ingesta de un CV. Cuerpo PDF (`Content-Type: application/pdf`), texto
+                          plano o JSON {"cv_text": ...}. Con `?save=1` el perfil se guarda para
+                          el usuario `?user_id=`.
+    POST /applications    Genera un paquete. JSON {"company_name", "job_description",
+                          "research_type"?, "profile"?, "user_id"?, "generation_mode"?, "use_cache"?};
+                          sin "profile" se usa el perfil guardado del usuario.
+
+Las peticiones que superan la cola reciben 429 con la cabecera Retry-After.
+
+`user_id` lo elige el cliente, así que la API solo escucha en la interfaz local salvo que se
+configure `API_TOKEN`; en ese caso todas las peticiones deben enviar `Authorization: Bearer <token>`.
+
+Uso:
+    python -m core.http_api --port 8765
+    python -m core.http_api --fake --fake-latency 0.5     # sin conexión, con el modelo falso
+"""
+
+import os
+import sys
+import json
+import asyncio
+import copy
+import hmac
+import argparse
+import ipaddress
+import tempfile
+from typing import Dict, Any, List, Optional
+
+import tornado.web
+
+from core.service import GenerationService, ServiceOverloaded, API_MAX_CONCURRENCY, API_MAX_PENDING
+from database.database_manager import get_db_manager, DEFAULT_USER_ID
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8765"))
+API_TOKEN = os.getenv("API_TOKEN", "")
+DEFAULT_RESEARCH_TYPE = "Ninguna"
+QUERY_FLAGS = {"1": True, "true": True, "0": False, "false": False}
+
+class ServiceHandler(tornado.web.RequestHandler):
+    """Base de los handlers: acceso al servicio y respuestas JSON con errores uniformes."""
+
+    def initialize(self, service: GenerationService, api_token: str = ""):
+        self.service = service
+        self.api_token = api_token
+
+    def prepare(self):
+        """Con un token configurado, rechaza las peticiones que no lo envían."""
+        if not self.api_token:
+            return
+        scheme, _, token = self.request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), self.api_token.encode()):
+            self.set_header("WWW-Authenticate", "Bearer")
+            self.write_json({"error": "Falta el token de la API o no es válido."}, 401)
+
+    def write_json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(json.dumps(payload, ensure_ascii=False))
+
+    def read_json(self) -> Dict[str, Any]:
+        try:
+            payload = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise ValueError("El cuerpo de la petición no es JSON válido.")
+        if not isinstance(payload, dict):
+            raise ValueError("Se esperaba un objeto JSON.")
+        return payload
+
+    def user_id(self, payload: Optional[Dict[str, Any]] = None) -> int:
+        raw = (payload or {}).get('user_id', self.get_query_argument("user_id", str(DEFAULT_USER_ID)))
+        try:
+            return int(raw)
+        except (TypeError, ValueError):
+            raise ValueError("'user_id' debe ser un entero.")
+
+    def flag(self, payload: Dict[str, Any], name: str, default: bool) -> bool:
+        """
+        Opción booleana del cuerpo JSON (debe ser true o false) o, si no está, del parámetro
+        `?name=` de la URL (1/0 o true/false).
+        """
+        if name in payload:
+            value = payload[name]
+            if not isinstance(value, bool):
+                raise ValueError(f"'{name}' debe ser un booleano (true o false).")
+            return value
+        raw = self.get_query_argument(name, None)
+        if raw is None:
+            return default
+        if raw.lower() not in QUERY_FLAGS:
+            raise ValueError(f"'{name}' debe ser 1, 0, true o false.")
+        return QUERY_FLAGS[raw.lower()]
+
+    async def respond(self, operation) -> None:
+        """Ejecuta la operación y traduce las excepciones a códigos HTTP."""
+        try:
+            self.write_json(await operation())
+        except ValueError as e:
+            self.write_json({"error": str(e)}, 400)
+        except ServiceOverloaded as e:
+            self.set_header("Retry-After", str(e.retry_after))
+            self.write_json({"error": str(e), "retry_after": e.retry_after}, 429)
+        except Exception as e:
+            print(f"Error en la API al atender {self.request.method} {self.request.path}: {e}")
+            self.write_json({"error": f"Error interno: {e}"}, 500)
+
+class HealthHandler(ServiceHandler):
+    def get(self):
+        self.write_json({"status": "ok", **self.service.snapshot()})
+
+class ProfilesHandler(ServiceHandler):
+    async def post(self):
+        async def operation() -> Dict[str, Any]:
+            content_type = self.request.headers.get("Content-Type", "").split(";")[0].strip()
+            if content_type == "application/pdf":
+                kind, data, options = "pdf", self.request.body, {}
+            elif content_type == "application/json":
+                options = self.read_json()
+                cv_text = (options.get('cv_text') or "").strip()
+                if not cv_text:
+                    raise ValueError("Falta 'cv_text'.")
+                kind, data = "text", cv_text.encode("utf-8")
+            else:
+                kind, data, options = "text", self.request.body, {}
+            if not data:
+                raise ValueError("El CV está vacío.")
+
+            use_cache = self.flag(options, "use_cache", True)
+            saved = self.flag(options, "save", False)
+            ingestion = await self.service.ingest(data, kind, use_cache=use_cache)
+            if not ingestion['profile']:
+                raise ValueError("No se pudo estructurar el CV.")
+            # Las ingestas coalescidas comparten el mismo dict y `save_profile` lo modifica
+            # (escribe los IDs asignados) en otro hilo: cada petición trabaja con su propia copia.
+            profile = copy.deepcopy(ingestion['profile'])
+            if saved:
+                await asyncio.to_thread(get_db_manager().save_profile, profile, self.user_id(options))
+            return {
+                "profile": profile, "cached": ingestion['cached'],
+                "coalesced": ingestion['coalesced'], "saved": saved
+            }
+
+        await self.respond(operation)
+
+class ApplicationsHandler(ServiceHandler):
+    async def post(self):
+        async def operation() -> Dict[str, Any]:
+            from core.orchestrator import GENERATION_MODES
+
+            payload = self.read_json()
+            company_name = (payload.get('company_name') or "").strip()
+            job_description = (payload.get('job_description') or "").strip()
+            if not company_name or not job_description:
+                raise ValueError("Faltan 'company_name' o 'job_description'.")
+            generation_mode = payload.get('generation_mode', "single")
+            if generation_mode not in GENERATION_MODES:
+                raise ValueError(f"'generation_mode' debe ser uno de: {', '.join(GENERATION_MODES)}.")
+            user_id = self.user_id(payload)
+            use_cache = self.flag(payload, "use_cache", True)
+            profile_data = payload.get('profile') or await asyncio.to_thread(get_db_manager().load_profile, user_id)
+            if not profile_data:
+                raise ValueError(f"El usuario {user_id} no tiene un perfil guardado y no se envió 'profile'.")
+
+            return await self.service.generate(
+                profile_data, job_description, company_name,
+                payload.get('research_type') or DEFAULT_RESEARCH_TYPE,
+                user_id=user_id, generation_mode=generation_mode, use_cache=use_cache
+            )
+
+        await self.respond(operation)
+
+def is_loopback(host: str) -> bool:
+    """Indica si la dirección de escucha solo es accesible desde esta máquina."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def make_app(service: Optional[GenerationService] = None, api_token: str = API_TOKEN) -> tornado.web.Application:
+    """Construye la aplicación Tornado con un servicio compartido por todos los handlers."""
+    args = {"service": service or GenerationService(), "api_token": api_token}
+    return tornado.web.Application([
+        (r"/health", HealthHandler, args),
+        (r"/profiles", ProfilesHandler, args),
+        (r"/applications", ApplicationsHandler, args),
+    ])
+
+async def serve(host: str, port: int, service: GenerationService, api_token: str = API_TOKEN) -> None:
+    make_app(service, api_token).listen(port, address=host)
+    print(f"🌐 API de CareerForge escuchando en http://{host}:{port}")
+    await asyncio.Event().wait()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="API HTTP local de CareerForge.")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=API_MAX_CONCURRENCY,
+                        help="Pipelines que se ejecutan a la vez.")
+    parser.add_argument("--max-pending", type=int, default=API_MAX_PENDING,
+                        help="Trabajos distintos admitidos (en curso o en cola) antes de responder 429.")
+    parser.add_argument("--fake", action="store_true",
+                        help="Usa el modelo falso de `core.fakes` (sin conexión) en un directorio de datos temporal.")
+    parser.add_argument("--fake-latency", type=float, default=0.5, help="Latencia en segundos del modelo falso.")
+    args = parser.parse_args(argv)
+
+    if not API_TOKEN and not is_loopback(args.host):
+        # Sin autenticación cualquier cliente de la red podría leer o sobrescribir cualquier perfil.
+        print(f"❌ Para escuchar en {args.host} hay que configurar API_TOKEN; sin él la API solo "
+              "admite direcciones locales (127.0.0.1, ::1, localhost).")
+        return 1
+
+    original_cwd = os.getcwd()
+    workspace = None
+    if args.fake:
+        from core.fakes import install_fake_models
+        install_fake_models(latency_seconds=args.fake_latency)
+        # Los modelos falsos usan los nombres de los reales: las cachés, los almacenes y las
+        # carpetas de salida (rutas relativas) van a un directorio temporal para que el texto
+        # falso nunca se sirva después como respuesta real de Gemini.
+        workspace = tempfile.TemporaryDirectory(prefix="careerforge-fake-")
+        os.chdir(workspace.name)
+        os.makedirs("database")
+        print(f"Modo falso: los datos se guardan en {workspace.name} y se borran al salir.")
+
+    try:
+        get_db_manager()  # Crea el esquema antes de atender peticiones
+        asyncio.run(serve(args.host, args.port, GenerationService(args.max_concurrency, args.max_pending)))
+    except KeyboardInterrupt:
+        print("API detenida.")
+    finally:
+        if workspace is not None:
+            os.chdir(original_cwd)  # Se sale del directorio antes de borrarlo
+            workspace.cleanup()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
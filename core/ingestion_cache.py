@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+"""
+Caché persistente de la ingesta de CVs, direccionada por el contenido del archivo subido.
+
+Para cada archivo (identificado por el hash SHA-256 de sus bytes) se guardan el texto
+extraído, el Markdown y el perfil estructurado. Volver a subir el mismo archivo devuelve
+el perfil al instante, sin extraer el PDF ni llamar al LLM. Además se guardan los fragmentos
+de perfil de cada sección del CV por el hash de su texto: al subir una versión editada del
+CV solo se vuelven a parsear las secciones que cambiaron. Cada entrada lleva la versión
+del pipeline que la produjo (esquema de UserProfile, prompts y conversión a Markdown);
+si la versión actual es otra, la entrada se descarta y se recalcula.
+"""
+
+import time
+import json
+import sqlite3
+import hashlib
+from typing import Dict, Any, List, Optional
+
+INGESTION_CACHE_PATH = "database/ingestion_cache.db"
+
+def hash_upload(data: bytes) -> str:
+    """Hash del contenido del archivo subido (independiente de su nombre)."""
+    return hashlib.sha256(data).hexdigest()
+
+def current_ingestion_version(kind: str) -> str:
+    """Versión del pipeline de ingesta para el tipo de archivo (`pdf` o `text`)."""
+    from core.profile_parser import parser_version
+    if kind == "pdf":
+        from core.pdf_processor import MARKDOWN_PIPELINE_VERSION
+        return f"{parser_version()}-md{MARKDOWN_PIPELINE_VERSION}"
+    return parser_version()
+
+class IngestionCache:
+    """Gestiona el almacenamiento y la consulta de resultados de ingesta en SQLite."""
+
+    def __init__(self, db_path: str = INGESTION_CACHE_PATH):
+        self.db_path = db_path
+        self._is_setup = False
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Establece y devuelve una conexión a la base de datos de la caché."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._is_setup:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingestion_cache (
+                content_hash TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                version TEXT NOT NULL,
+                raw_text TEXT,
+                markdown TEXT,
+                profile_json TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (content_hash, kind)
+            );
+            """)
+            # Fragmentos de perfil por sección del CV (ver `core.profile_parser.parse_cv_sections`)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS section_fragments (
+                section_hash TEXT PRIMARY KEY,
+                section_kind TEXT NOT NULL,
+                version TEXT NOT NULL,
+                fragment_json TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            """)
+            self._is_setup = True
+        return conn
+
+    def get(self, content_hash: str, kind: str, version: str) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve {raw_text, markdown, profile} para el archivo, o None si no está en caché
+        o fue producido por otra versión del pipeline (en ese caso se elimina).
+        """
+        try:
+            with self._get_connection() as conn:
+                row = conn.execute(
+                    "SELECT version, raw_text, markdown, profile_json FROM ingestion_cache "
+                    "WHERE content_hash = ? AND kind = ?;",
+                    (content_hash, kind)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[0] != version:
+                    conn.execute(
+                        "DELETE FROM ingestion_cache WHERE content_hash = ? AND kind = ?;", (content_hash, kind)
+                    )
+                    return None
+                return {"raw_text": row[1], "markdown": row[2], "profile": json.loads(row[3])}
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error al leer la caché de ingesta: {e}")
+            return None
+
+    def set(
+        self,
+        content_hash: str,
+        kind: str,
+        version: str,
+        raw_text: str,
+        markdown: Optional[str],
+        profile: Dict[str, Any]
+    ) -> None:
+        """Guarda el resultado de la ingesta de un archivo."""
+        try:
+            with self._get_connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ingestion_cache "
+                    "(content_hash, kind, version, raw_text, markdown, profile_json, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?);",
+                    (content_hash, kind, version, raw_text, markdown,
+                     json.dumps(profile, ensure_ascii=False), time.time())
+                )
+        except sqlite3.Error as e:
+            print(f"Error al escribir en la caché de ingesta: {e}")
+
+    def get_fragments(self, section_hashes: List[str], version: str) -> Dict[str, Dict[str, Any]]:
+        """Fragmentos ya parseados con la versión actual del parser, por hash de sección."""
+        if not section_hashes:
+            return {}
+        placeholders = ", ".join("?" for _ in section_hashes)
+        try:
+            with self._get_connection() as conn:
+                rows = conn.execute(
+                    f"SELECT section_hash, fragment_json FROM section_fragments "
+                    f"WHERE section_hash IN ({placeholders}) AND version = ?;",
+                    [*section_hashes, version]
+                ).fetchall()
+            return {row[0]: json.loads(row[1]) for row in rows}
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error al leer los fragmentos de la caché de ingesta: {e}")
+            return {}
+
+    def set_fragment(self, section_hash: str, section_kind: str, version: str, fragment: Dict[str, Any]) -> None:
+        """Guarda el fragmento de perfil extraído de una sección del CV."""
+        try:
+            with self._get_connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO section_fragments "
+                    "(section_hash, section_kind, version, fragment_json, created_at) VALUES (?, ?, ?, ?, ?);",
+                    (section_hash, section_kind, version, json.dumps(fragment, ensure_ascii=False), time.time())
+                )
+        except sqlite3.Error as e:
+            print(f"Error al escribir en la caché de ingesta: {e}")
+
+    def clear(self) -> None:
+        """Vacía la caché por completo."""
+        with self._get_connection() as conn:
+            conn.execute("DELETE FROM ingestion_cache;")
+            conn.execute("DELETE FROM section_fragments;")
+
+# Instancia global compartida por la aplicación
+ingestion_cache = IngestionCache()
+
+def ingest_pdf(data: bytes, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Convierte un PDF subido en perfil: extrae el texto, lo pasa a Markdown y lo estructura.
+    Devuelve {raw_text, markdown, profile, cached}; `profile` es None si el parsing falla
+    (los fallos no se cachean).
+    """
+    from core.pdf_processor import convert_pdf_to_markdown_with_text
+    from core.profile_parser import parse_cv_to_profile
+
+    content_hash, version = hash_upload(data), current_ingestion_version("pdf")
+    if use_cache:
+        cached = ingestion_cache.get(content_hash, "pdf", version)
+        if cached is not None:
+            print("Perfil recuperado de la caché de ingesta.")
+            return {**cached, "cached": True}
+
+    raw_text, markdown = convert_pdf_to_markdown_with_text(data, use_cache=use_cache)
+    profile = parse_cv_to_profile(markdown, use_cache=use_cache) if markdown else None
+    if profile:
+        ingestion_cache.set(content_hash, "pdf", version, raw_text, markdown, profile)
+    return {"raw_text": raw_text, "markdown": markdown, "profile": profile, "cached": False}
+
+def ingest_text(cv_text: str, use_cache: bool = True) -> Dict[str, Any]:
+    """Variante de `ingest_pdf` para CVs en texto (.txt, .md), que se estructuran directamente."""
+    from core.profile_parser import parse_cv_to_profile
+
+    content_hash, version = hash_upload(cv_text.encode('utf-8')), current_ingestion_version("text")
+    if use_cache:
+        cached = ingestion_cache.get(content_hash, "text", version)
+        if cached is not None:
+            print("Perfil recuperado de la caché de ingesta.")
+            return {**cached, "cached": True}
+
+    profile = parse_cv_to_profile(cv_text, use_cache=use_cache)
+    if profile:
+        ingestion_cache.set(content_hash, "text", version, cv_text, None, profile)
+    return {"raw_text": cv_text, "markdown": None, "profile": profile, "cached": False}
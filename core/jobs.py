@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cola de trabajos persistente para ejecutar el pipeline en segundo plano.
+
+La interfaz encola cada generación en SQLite y un pool de hilos la ejecuta fuera del
+hilo de la petición de Streamlit. El estado, el progreso y el resultado quedan en el
+registro del trabajo, de modo que la página puede consultarlos, el usuario puede navegar
+sin perder el resultado y un mismo despliegue mantiene muchas generaciones en vuelo.
+
+Estados: queued -> running -> done | error. Cada trabajo en ejecución lleva el ID del worker
+que lo reclamó y un arriendo (lease) que ese worker renueva periódicamente. Solo vuelven a la
+cola los trabajos cuyo arriendo caducó (su proceso se detuvo), no los que otro proceso vivo
+sigue ejecutando, y solo el worker que tiene el arriendo registra el resultado. Cada reclamación
+cuenta como un intento: un trabajo cuyo arriendo caduca tras `JOB_MAX_ATTEMPTS` intentos (por
+ejemplo, porque su ejecución tumba el proceso) se marca como error en lugar de reencolarse.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Callable, Iterator
+
+from database.database_manager import DEFAULT_USER_ID
+
+JOBS_DB_PATH = "database/jobs.db"
+DEFAULT_JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+IDLE_POLL_SECONDS = 1.0
+PROGRESS_INTERVAL_SECONDS = 0.5  # Frecuencia máxima de escritura del progreso en streaming
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 60))
+HEARTBEAT_SECONDS = LEASE_SECONDS / 3
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+
+class JobQueue:
+    """Gestiona los trabajos en SQLite: encolar, reclamar de forma atómica y registrar el resultado."""
+
+    def __init__(self, db_path: str = JOBS_DB_PATH):
+        self.db_path = db_path
+        self._is_setup = False
+        self._setup_lock = threading.Lock()  # Los workers abren conexiones desde varios hilos
+        self._wakeup = threading.Event()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Establece y devuelve una conexión a la base de datos de la cola."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._is_setup:
+            with self._setup_lock:
+                if not self._is_setup:
+                    self._setup(conn)
+        return conn
+
+    def _setup(self, conn: sqlite3.Connection) -> None:
+        """Crea el esquema y migra las bases de datos antiguas. Se llama con `_setup_lock` tomado."""
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.executescript("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            params_json TEXT NOT NULL,
+            progress_json TEXT,
+            result_json TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            worker TEXT,
+            lease_expires_at REAL,
+            attempts INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);
+        CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, id);
+        """)
+        # Las bases de datos creadas antes de los arriendos no tienen estas columnas
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs);")}
+        for column, column_type in (
+            ("worker", "TEXT"), ("lease_expires_at", "REAL"), ("attempts", "INTEGER NOT NULL DEFAULT 0")
+        ):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type};")
+        self._is_setup = True
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        for key in ("params", "progress", "result"):
+            raw = job.pop(f"{key}_json")
+            job[key] = json.loads(raw) if raw else None
+        return job
+
+    def enqueue(self, user_id: int, params: Dict[str, Any]) -> int:
+        """Encola un trabajo con los argumentos del pipeline y devuelve su ID."""
+        with self._connection() as conn:
+            job_id = conn.execute(
+                "INSERT INTO jobs (user_id, status, params_json, created_at) VALUES (?, 'queued', ?, ?);",
+                (user_id, json.dumps(params, ensure_ascii=False), time.time())
+            ).lastrowid
+        self.notify()
+        return job_id
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Devuelve el trabajo (con params, progress y result ya decodificados) o None."""
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?;", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list_jobs(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """Trabajos más recientes del usuario, sin los parámetros ni el resultado completos."""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT id, status, params_json, created_at, finished_at, error FROM jobs "
+                "WHERE user_id = ? ORDER BY id DESC LIMIT ?;",
+                (user_id, limit)
+            ).fetchall()
+        jobs = []
+        for row in rows:
+            params = json.loads(row['params_json'])
+            jobs.append({
+                "id": row['id'], "status": row['status'], "company_name": params.get('company_name'),
+                "created_at": row['created_at'], "finished_at": row['finished_at'], "error": row['error']
+            })
+        return jobs
+
+    def claim_next(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Reclama para `worker` el trabajo en cola más antiguo y lo marca como en ejecución con un
+        arriendo nuevo, contando un intento más. Antes devuelve a la cola los trabajos cuyo
+        arriendo caducó, salvo los que ya agotaron `JOB_MAX_ATTEMPTS`, que se marcan como error.
+        `BEGIN IMMEDIATE` garantiza que dos workers (aunque estén en procesos distintos) no
+        reclamen el mismo.
+        """
+        now = time.time()
+        expired = "status = 'running' AND (lease_expires_at IS NULL OR lease_expires_at < ?)"
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE;")
+            try:
+                abandoned = conn.execute(
+                    "UPDATE jobs SET status = 'error', error = ?, finished_at = ?, lease_expires_at = NULL "
+                    f"WHERE {expired} AND attempts >= ?;",
+                    (f"El trabajo se interrumpió en {JOB_MAX_ATTEMPTS} intentos; no se volverá a ejecutar.",
+                     now, now, JOB_MAX_ATTEMPTS)
+                ).rowcount
+                requeued = conn.execute(
+                    f"UPDATE jobs SET status = 'queued', worker = NULL, lease_expires_at = NULL WHERE {expired};",
+                    (now,)
+                ).rowcount
+                row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1;").fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, worker = ?, lease_expires_at = ?, "
+                        "attempts = attempts + 1 WHERE id = ?;",
+                        (now, worker, now + LEASE_SECONDS, row['id'])
+                    )
+                    row = conn.execute("SELECT * FROM jobs WHERE id = ?;", (row['id'],)).fetchone()
+                conn.execute("COMMIT;")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK;")
+                raise
+        if abandoned:
+            print(f"{abandoned} trabajos interrumpidos agotaron sus {JOB_MAX_ATTEMPTS} intentos y se marcan como error.")
+        if requeued:
+            print(f"{requeued} trabajos interrumpidos (arriendo caducado) vuelven a la cola.")
+        return self._to_dict(row) if row else None
+
+    def renew_leases(self, worker: str) -> int:
+        """Prolonga el arriendo de los trabajos que `worker` tiene en ejecución."""
+        with self._connection() as conn:
+            return conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE worker = ? AND status = 'running';",
+                (time.time() + LEASE_SECONDS, worker)
+            ).rowcount
+
+    def update_progress(self, job_id: int, progress: Dict[str, Any]) -> None:
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress_json = ? WHERE id = ?;", (json.dumps(progress, ensure_ascii=False), job_id)
+            )
+
+    def complete(self, job_id: int, result: Dict[str, Any], worker: str) -> bool:
+        """Registra el resultado si `worker` conserva el arriendo; devuelve False si lo perdió."""
+        with self._connection() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'done', result_json = ?, finished_at = ?, lease_expires_at = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'running';",
+                (json.dumps(result, ensure_ascii=False), time.time(), job_id, worker)
+            ).rowcount > 0
+
+    def fail(self, job_id: int, error: str, worker: str) -> bool:
+        """Registra el error si `worker` conserva el arriendo; devuelve False si lo perdió."""
+        with self._connection() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'error', error = ?, finished_at = ?, lease_expires_at = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'running';",
+                (error, time.time(), job_id, worker)
+            ).rowcount > 0
+
+    def notify(self) -> None:
+        """Despierta a los workers de este proceso que esperan trabajo."""
+        self._wakeup.set()
+
+    def wait_for_work(self, timeout: float) -> None:
+        """Espera a que se encole un trabajo en este proceso o a que pase `timeout`."""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+# Instancia global compartida por la aplicación
+job_queue = JobQueue()
+
+def run_pipeline_job(params: Dict[str, Any], report_progress: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+    """
+    Ejecuta el pipeline con los parámetros del trabajo y devuelve el resultado listo para
+    mostrarse. En modo "stream" el texto de cada sección se publica como progreso a medida
+    que se genera.
+    """
+    from core.relevance import compact_profile
+
+    profile_data = params['profile_data']
+    job_description = params['job_description']
+    pipeline_args = {
+        "profile_data": profile_data,
+        "job_description": job_description,
+        "company_name": params['company_name'],
+        "research_type": params['research_type'],
+        "use_cache": params.get('use_cache', True),
+        "refresh_research": params.get('refresh_research', False),
+        "user_id": params.get('user_id', DEFAULT_USER_ID),
+        "research_context": params.get('research_context')
+    }
+    result = {"job_description": job_description, "compaction": compact_profile(profile_data, job_description)[1]}
+
+    if params.get('generation_mode') == "stream":
+        from core.streaming import stream_full_pipeline
+        progress = {"stage": "research", "sections": {}}
+        partial: Dict[str, List[str]] = {}  # Fragmentos de las secciones aún en curso
+        last_report = 0.0
+        for event in stream_full_pipeline(**pipeline_args):
+            if event['type'] == "research":
+                progress.update(stage="generation", research=event['content'])
+            elif event['type'] == "token":
+                partial.setdefault(event['section'], []).append(event['delta'])
+            elif event['type'] == "section":
+                partial.pop(event['section'], None)
+                progress['sections'][event['section']] = event['content']
+            elif event['type'] == "done":
+                sections = event['sections']
+                result.update(
+                    cv=sections['cv'], cl=sections['cover_letter'], ip=sections['interview_prep'],
+                    rc=event['research_context'], folder=event['output_folder']
+                )
+                return result
+            now = time.monotonic()
+            if event['type'] != "token" or now - last_report >= PROGRESS_INTERVAL_SECONDS:
+                # El texto en curso solo se une al publicar el progreso, no en cada fragmento
+                for section, chunks in partial.items():
+                    progress['sections'][section] = "".join(chunks).strip()
+                report_progress(progress)
+                last_report = now
+        raise RuntimeError("El pipeline terminó sin resultado.")
+
+    from core.orchestrator import run_full_pipeline
+    report_progress({"stage": "generation", "sections": {}})
+    folder, cv_opt, cover_letter, interview_prep, research_context = run_full_pipeline(
+        **pipeline_args, generation_mode=params.get('generation_mode', "parallel")
+    )
+    result.update(cv=cv_opt, cl=cover_letter, ip=interview_prep, rc=research_context, folder=folder)
+    return result
+
+class JobWorkerPool:
+    """Pool de hilos que reclaman y ejecutan trabajos de la cola."""
+
+    def __init__(
+        self,
+        queue: JobQueue = job_queue,
+        workers: int = DEFAULT_JOB_WORKERS,
+        handler: Callable[[Dict[str, Any], Callable[[Dict[str, Any]], None]], Dict[str, Any]] = run_pipeline_job
+    ):
+        self.queue = queue
+        self.workers = max(1, workers)
+        self.handler = handler
+        # Identifica los arriendos de este pool frente a los de otros procesos
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Arranca los hilos de trabajo y el que renueva los arriendos."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"careerforge-job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="careerforge-job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self.queue.notify()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            try:
+                self.queue.renew_leases(self.worker_id)
+            except sqlite3.Error as e:
+                print(f"Error al renovar los arriendos de los trabajos: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim_next(self.worker_id)
+            except sqlite3.Error as e:
+                print(f"Error al reclamar un trabajo: {e}")
+                job = None
+            if job is None:
+                self.queue.wait_for_work(IDLE_POLL_SECONDS)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: Dict[str, Any]) -> None:
+        """Ejecuta un trabajo ya reclamado y registra su resultado o su error."""
+        job_id = job['id']
+        print(f"Ejecutando el trabajo {job_id}...")
+        try:
+            params = {**job['params'], "user_id": job['user_id']}
+            result = self.handler(params, lambda progress: self.queue.update_progress(job_id, progress))
+        except Exception as e:
+            print(f"El trabajo {job_id} falló: {e}")
+            recorded = self.queue.fail(job_id, str(e), self.worker_id)
+        else:
+            recorded = self.queue.complete(job_id, result, self.worker_id)
+            if recorded:
+                print(f"Trabajo {job_id} completado.")
+        if not recorded:
+            print(f"El trabajo {job_id} ya no pertenece a este worker (arriendo caducado); se descarta su resultado.")
+
+_pool_lock = threading.Lock()
+_pool: Optional[JobWorkerPool] = None
+
+def start_job_workers(workers: int = DEFAULT_JOB_WORKERS) -> JobWorkerPool:
+    """Arranca el pool de workers global una sola vez por proceso."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = JobWorkerPool(job_queue, workers)
+            _pool.start()
+        return _pool
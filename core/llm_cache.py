@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+"""
+Caché persistente de respuestas del LLM, direccionada por contenido.
+
+Cada respuesta se guarda en SQLite con una clave derivada del nombre del modelo,
+la temperatura y un hash del prompt ya renderizado. Así, repetir el mismo CV o la
+misma oferta devuelve el resultado en milisegundos en lugar de repetir la llamada a Gemini.
+"""
+
+import time
+import asyncio
+import json
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Any, Optional, Callable, Awaitable, Iterator, TYPE_CHECKING
+
+from core.rate_limit import gemini_limiter
+from core.telemetry import record_llm_call, record_cache_hit
+
+# LangChain solo se necesita para envolver chat models; se importa de forma diferida
+# para que usar la caché desde otros módulos no cargue LangChain.
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable, RunnableConfig
+
+LLM_CACHE_PATH = "database/llm_cache.db"
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60  # 30 días
+EVICTION_INTERVAL = 50  # Escrituras entre cada pasada de desalojo
+
+# Configuración de LangChain para saltarse la caché en una llamada concreta:
+#     chain.invoke(inputs, config=NO_CACHE_CONFIG)
+NO_CACHE_CONFIG: Dict[str, Any] = {"configurable": {"use_cache": False}}
+
+def make_cache_key(model_name: str, temperature: Optional[float], prompt: str) -> str:
+    """
+    Calcula la clave de caché a partir del modelo, la temperatura y el prompt renderizado.
+    Una temperatura None representa la configuración por defecto del modelo.
+    """
+    prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    temperature_key = None if temperature is None else round(float(temperature), 4)
+    raw_key = json.dumps([model_name, temperature_key, prompt_hash])
+    return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+class LLMCache:
+    """
+    Gestiona el almacenamiento, la consulta y el desalojo (por TTL y tamaño máximo)
+    de las respuestas del LLM en SQLite, y lleva la cuenta de aciertos y fallos.
+    """
+
+    def __init__(
+        self,
+        db_path: str = LLM_CACHE_PATH,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS
+    ):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._is_setup = False
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Establece y devuelve una conexión a la base de datos de la caché."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._is_setup:
+            conn.executescript("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access);
+            """)
+            self._is_setup = True
+        return conn
+
+    def get(self, cache_key: str) -> Optional[str]:
+        """Devuelve la respuesta almacenada o None si no existe o ha caducado."""
+        now = time.time()
+        try:
+            with self._get_connection() as conn:
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE cache_key = ?;", (cache_key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    conn.execute("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?;", (now, cache_key))
+                    with self._lock:
+                        self.hits += 1
+                    return row[0]
+        except sqlite3.Error as e:
+            print(f"Error al leer la caché del LLM: {e}")
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, cache_key: str, model_name: str, response: str) -> None:
+        """Guarda una respuesta y, cada cierto número de escrituras, desaloja entradas antiguas."""
+        now = time.time()
+        try:
+            with self._get_connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (cache_key, model_name, response, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?);",
+                    (cache_key, model_name, response, now, now)
+                )
+        except sqlite3.Error as e:
+            print(f"Error al escribir en la caché del LLM: {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % EVICTION_INTERVAL == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Elimina las entradas caducadas y las menos usadas si se supera `max_entries`."""
+        try:
+            with self._get_connection() as conn:
+                removed = conn.execute(
+                    "DELETE FROM llm_cache WHERE created_at < ?;", (time.time() - self.ttl_seconds,)
+                ).rowcount
+                removed += conn.execute(
+                    "DELETE FROM llm_cache WHERE cache_key IN ("
+                    "SELECT cache_key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?);",
+                    (self.max_entries,)
+                ).rowcount
+                return removed
+        except sqlite3.Error as e:
+            print(f"Error al desalojar la caché del LLM: {e}")
+            return 0
+
+    def clear(self) -> None:
+        """Vacía la caché por completo y reinicia los contadores."""
+        with self._get_connection() as conn:
+            conn.execute("DELETE FROM llm_cache;")
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Devuelve los contadores de aciertos/fallos y el número de entradas almacenadas."""
+        with self._get_connection() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM llm_cache;").fetchone()[0]
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": entries
+            }
+
+    def cached_call(
+        self,
+        model_name: str,
+        temperature: Optional[float],
+        prompt: str,
+        generate: Callable[[str], str],
+        use_cache: bool = True
+    ) -> str:
+        """
+        Devuelve la respuesta cacheada para el prompt o llama a `generate` y la almacena.
+        Las llamadas reales pasan por el limitador de cuota compartido (`core.rate_limit`).
+        """
+        if not use_cache:
+            response = gemini_limiter.call(generate, prompt)
+            record_llm_call(prompt, response)
+            return response
+        cache_key = make_cache_key(model_name, temperature, prompt)
+        cached = self.get(cache_key)
+        if cached is not None:
+            record_cache_hit()
+            return cached
+        response = gemini_limiter.call(generate, prompt)
+        record_llm_call(prompt, response)
+        self.set(cache_key, model_name, response)
+        return response
+
+    async def acached_call(
+        self,
+        model_name: str,
+        temperature: Optional[float],
+        prompt: str,
+        agenerate: Callable[[str], Awaitable[str]],
+        use_cache: bool = True
+    ) -> str:
+        """
+        Variante asíncrona de `cached_call`. La lectura y la escritura en SQLite (con su espera
+        por bloqueo y la purga periódica) se hacen en un hilo para no detener el event loop.
+        """
+        if not use_cache:
+            response = await gemini_limiter.acall(agenerate, prompt)
+            record_llm_call(prompt, response)
+            return response
+        cache_key = make_cache_key(model_name, temperature, prompt)
+        cached = await asyncio.to_thread(self.get, cache_key)
+        if cached is not None:
+            record_cache_hit()
+            return cached
+        response = await gemini_limiter.acall(agenerate, prompt)
+        record_llm_call(prompt, response)
+        await asyncio.to_thread(self.set, cache_key, model_name, response)
+        return response
+
+# Instancia global compartida por todas las cadenas
+llm_cache = LLMCache()
+
+def _message_text(message: Any) -> str:
+    """Extrae el texto de la respuesta de un chat model de LangChain."""
+    content = getattr(message, "content", message)
+    return content if isinstance(content, str) else str(content)
+
+def _use_cache(config: Optional["RunnableConfig"]) -> bool:
+    return (config or {}).get("configurable", {}).get("use_cache", True)
+
+def cached_chat_model(llm: "Runnable", model_name: str, temperature: float) -> "Runnable":
+    """
+    Envuelve un chat model para que sus respuestas pasen por la caché.
+    El Runnable resultante recibe un PromptValue y devuelve el texto de la respuesta,
+    por lo que se puede encadenar con StrOutputParser o PydanticOutputParser.
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    def invoke(prompt_value: Any, config: "RunnableConfig") -> str:
+        return llm_cache.cached_call(
+            model_name, temperature, prompt_value.to_string(),
+            lambda _: _message_text(llm.invoke(prompt_value, config)),
+            use_cache=_use_cache(config)
+        )
+
+    async def ainvoke(prompt_value: Any, config: "RunnableConfig") -> str:
+        async def agenerate(_: str) -> str:
+            return _message_text(await llm.ainvoke(prompt_value, config))
+        return await llm_cache.acached_call(
+            model_name, temperature, prompt_value.to_string(), agenerate,
+            use_cache=_use_cache(config)
+        )
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"cached_{model_name}")
+
+def stream_cached_chat_model(
+    llm: "Runnable",
+    model_name: str,
+    temperature: float,
+    prompt_value: Any,
+    use_cache: bool = True
+) -> Iterator[str]:
+    """
+    Transmite la respuesta del chat model fragmento a fragmento. Si la respuesta ya está
+    en caché se emite de una vez; si no, se guarda completa al terminar el stream.
+    """
+    prompt = prompt_value.to_string()
+    cache_key = make_cache_key(model_name, temperature, prompt)
+    if use_cache:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            record_cache_hit()
+            yield cached
+            return
+    chunks = []
+    for chunk in gemini_limiter.stream(lambda: llm.stream(prompt_value), prompt):
+        text = _message_text(chunk)
+        chunks.append(text)
+        yield text
+    record_llm_call(prompt, "".join(chunks))
+    if use_cache:
+        llm_cache.set(cache_key, model_name, "".join(chunks))
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+"""
+Detección de ofertas casi duplicadas para reutilizar paquetes anteriores.
+
+Los reclutadores vuelven a publicar la misma oferta con pequeños cambios. Para cada paquete
+generado se guarda la huella MinHash de la descripción de la oferta (sobre shingles de
+palabras) junto con la versión del perfil con que se generó. Al preparar una aplicación
+nueva, un índice LSH por bandas en SQLite encuentra en milisegundos las ofertas anteriores
+del mismo usuario y del mismo perfil cuya similitud de Jaccard estimada supera el umbral,
+de modo que se puede ofrecer el paquete anterior o una regeneración que reutiliza su
+investigación en lugar de repetir todo el pipeline.
+"""
+
+import re
+import json
+import time
+import array
+import random
+import sqlite3
+import hashlib
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+from unidecode import unidecode
+
+NEAR_DUPLICATES_DB_PATH = "database/near_duplicates.db"
+SHINGLE_WORDS = 5
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16  # 16 bandas de 8 filas: los candidatos empiezan a aparecer hacia una similitud de 0.7
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SIMILARITY_THRESHOLD = 0.8
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Coeficientes fijos de las permutaciones: las firmas guardadas deben seguir siendo comparables.
+_rng = random.Random(20240601)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)
+]
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> set:
+    """Conjunto de secuencias de `size` palabras normalizadas (sin acentos, en minúsculas)."""
+    words = re.findall(r"\w+", unidecode(text or "").lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+@lru_cache(maxsize=64)
+def minhash_signature(text: str) -> Tuple[int, ...]:
+    """Firma MinHash de la oferta. Se cachea porque la interfaz la recalcula en cada rerun."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "big")
+        for shingle in shingles(text)
+    ]
+    if not hashes:
+        return tuple([_MAX_HASH] * NUM_PERMUTATIONS)
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    )
+
+def estimate_similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Similitud de Jaccard estimada: fracción de posiciones en que coinciden las firmas."""
+    return sum(x == y for x, y in zip(first, second)) / NUM_PERMUTATIONS
+
+def _band_keys(signature: Tuple[int, ...]) -> List[Tuple[int, int]]:
+    """Una clave (banda, cubo) por banda; dos firmas son candidatas si comparten alguna."""
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = array.array("I", signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]).tobytes()
+        keys.append((band, int.from_bytes(hashlib.blake2b(rows, digest_size=7).digest(), "big")))
+    return keys
+
+def _profile_content(profile_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Proyección del perfil con solo los campos que guarda la base de datos, sin IDs ni claves de
+    la interfaz, para que el mismo perfil dé la misma huella recién parseado, tras
+    `save_profile` (que escribe los IDs de vuelta) y tras `load_profile`.
+    """
+    contact = profile_data.get('contact') or {}
+    return {
+        "full_name": profile_data.get('full_name') or "",
+        "base_summary": profile_data.get('base_summary') or "",
+        "contact": {field: contact.get(field) or "" for field in ("email", "linkedin", "phone")},
+        "experiences": [
+            {
+                "role": exp.get('role') or "",
+                "company": exp.get('company') or "",
+                "period": exp.get('period') or "",
+                "achievements": [ach.get('description') or "" for ach in exp.get('achievements') or []]
+            }
+            for exp in profile_data.get('experiences') or []
+        ]
+    }
+
+def profile_version(profile_data: Dict[str, Any]) -> str:
+    """Huella del contenido del perfil: un paquete solo se reutiliza si el perfil no cambió."""
+    raw = json.dumps(_profile_content(profile_data or {}), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+class NearDuplicateIndex:
+    """Guarda las firmas de las ofertas y sus bandas LSH en SQLite."""
+
+    def __init__(self, db_path: str = NEAR_DUPLICATES_DB_PATH, threshold: float = SIMILARITY_THRESHOLD):
+        self.db_path = db_path
+        self.threshold = threshold
+        self._is_setup = False
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Establece y devuelve una conexión a la base de datos del índice."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._is_setup:
+            conn.executescript("""
+            CREATE TABLE IF NOT EXISTS job_fingerprints (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                profile_version TEXT NOT NULL,
+                folder TEXT NOT NULL UNIQUE,
+                company_name TEXT,
+                research_type TEXT,
+                signature BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_lsh_buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                fingerprint_id INTEGER NOT NULL REFERENCES job_fingerprints (id) ON DELETE CASCADE
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_lsh_buckets ON job_lsh_buckets (band, bucket);
+            CREATE INDEX IF NOT EXISTS idx_job_lsh_fingerprint ON job_lsh_buckets (fingerprint_id);
+            """)
+            self._is_setup = True
+        conn.execute("PRAGMA foreign_keys = ON;")
+        return conn
+
+    def add(
+        self,
+        user_id: int,
+        profile_version: str,
+        job_description: str,
+        folder: str,
+        company_name: Optional[str] = None,
+        research_type: Optional[str] = None
+    ) -> int:
+        """Registra la oferta del paquete publicado en `folder` y devuelve el ID de su huella."""
+        signature = minhash_signature(job_description)
+        with self._get_connection() as conn:
+            conn.execute("DELETE FROM job_fingerprints WHERE folder = ?;", (folder,))
+            fingerprint_id = conn.execute(
+                "INSERT INTO job_fingerprints (user_id, profile_version, folder, company_name, research_type, "
+                "signature, created_at) VALUES (?, ?, ?, ?, ?, ?, ?);",
+                (user_id, profile_version, folder, company_name, research_type,
+                 array.array("I", signature).tobytes(), time.time())
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO job_lsh_buckets (band, bucket, fingerprint_id) VALUES (?, ?, ?);",
+                [(band, bucket, fingerprint_id) for band, bucket in _band_keys(signature)]
+            )
+        return fingerprint_id
+
+    def find(
+        self,
+        job_description: str,
+        user_id: int,
+        profile_version: str,
+        limit: int = 3
+    ) -> List[Dict[str, Any]]:
+        """
+        Ofertas anteriores del usuario, generadas con la misma versión del perfil, cuya similitud
+        estimada con `job_description` alcanza el umbral. Devuelve {folder, company_name,
+        research_type, created_at, similarity}, de la más parecida a la menos.
+        """
+        signature = minhash_signature(job_description)
+        keys = _band_keys(signature)
+        placeholders = " OR ".join("(b.band = ? AND b.bucket = ?)" for _ in keys)
+        try:
+            with self._get_connection() as conn:
+                rows = conn.execute(
+                    "SELECT DISTINCT f.* FROM job_lsh_buckets b JOIN job_fingerprints f ON f.id = b.fingerprint_id "
+                    f"WHERE ({placeholders}) AND f.user_id = ? AND f.profile_version = ?;",
+                    [value for key in keys for value in key] + [user_id, profile_version]
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error al consultar el índice de ofertas: {e}")
+            return []
+
+        matches = []
+        for row in rows:
+            similarity = estimate_similarity(signature, tuple(array.array("I", row['signature'])))
+            if similarity >= self.threshold:
+                matches.append({
+                    "folder": row['folder'], "company_name": row['company_name'],
+                    "research_type": row['research_type'], "created_at": row['created_at'],
+                    "similarity": round(similarity, 3)
+                })
+        matches.sort(key=lambda match: (match['similarity'], match['created_at']), reverse=True)
+        return matches[:limit]
+
+    def remove(self, folder: str) -> None:
+        with self._get_connection() as conn:
+            conn.execute("DELETE FROM job_fingerprints WHERE folder = ?;", (folder,))
+
+# Instancia global compartida por la aplicación
+near_duplicate_index = NearDuplicateIndex()
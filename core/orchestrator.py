@@ -1,91 +1,424 @@
 import os
 import json
+import uuid
+import shutil
+import sqlite3
+import asyncio
 from datetime import datetime
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Optional
 from unidecode import unidecode
 
-from core.chains import get_research_chain, get_generation_chain
+from core.chains import (
+    NO_RESEARCH_TYPE, SECTION_PARSE_ERRORS, get_research_chain, get_generation_chain, get_parallel_generation_chain,
+    get_section_chain, is_failed_section
+)
+from core.llm_cache import NO_CACHE_CONFIG
+from core.relevance import compact_profile
+from core.research_store import research_store, extract_job_title, research_subject
+from core.telemetry import span, record_cache_hit
+from core.history import application_history
+from core.near_duplicates import near_duplicate_index, profile_version
+from core.prefetch import research_prefetcher
+from database.database_manager import DEFAULT_USER_ID
 
-def create_output_folder(company_name: str) -> str:
-    """Crea una carpeta de salida única y segura para la aplicación."""
+GENERATION_MODES = ("single", "parallel")
+SECTION_FILES = {
+    "cv": "CV_Optimizado.md",
+    "cover_letter": "Carta_Presentacion.md",
+    "interview_prep": "Preparacion_Entrevista.md"
+}
+RESEARCH_FILE = "Investigacion.md"
+DEBUG_RAW_FILE = "debug_raw_output.txt"
+OUTPUTS_DIR = "outputs"
+STAGING_DIR = os.path.join(OUTPUTS_DIR, ".staging")
+
+def create_staging_folder() -> str:
+    """
+    Crea una carpeta temporal donde se escribe el paquete antes de publicarlo. Vive dentro de
+    `outputs/` para que la publicación sea un `rename` en el mismo sistema de archivos.
+    """
+    staging_folder = os.path.join(STAGING_DIR, uuid.uuid4().hex)
+    os.makedirs(staging_folder)
+    return staging_folder
+
+def discard_staging_folder(staging_folder: str) -> None:
+    shutil.rmtree(staging_folder, ignore_errors=True)
+
+def publish_package_folder(staging_folder: str, company_name: str) -> str:
+    """
+    Mueve de forma atómica la carpeta temporal a su nombre definitivo (empresa y fecha) y
+    devuelve la ruta. Quien lee `outputs/` o el historial ve el paquete completo o no lo ve.
+    """
     safe_company_name = unidecode(company_name).replace(" ", "_").replace("/", "_")
     date_str = datetime.now().strftime('%Y-%m-%d_%H%M%S')
     folder_name = f"{safe_company_name}_{date_str}"
-    
-    output_path = os.path.join("outputs", folder_name)
-    os.makedirs(output_path, exist_ok=True)
-    return output_path
 
-def run_full_pipeline(
-    profile_data: Dict[str, Any],
-    job_description: str,
+    output_path = os.path.join(OUTPUTS_DIR, folder_name)
+    # En modo lote varias aplicaciones a la misma empresa pueden caer en el mismo segundo:
+    # se añade un sufijo incremental para no sobrescribir un paquete ya generado.
+    suffix = 1
+    while True:
+        try:
+            if not os.path.exists(output_path):
+                os.rename(staging_folder, output_path)
+                return output_path
+        except OSError:
+            if not os.path.exists(output_path):
+                raise
+        suffix += 1
+        output_path = os.path.join(OUTPUTS_DIR, f"{folder_name}_{suffix}")
+
+def write_package_file(output_folder: str, file_name: str, content: str) -> None:
+    """Escribe un documento del paquete de forma atómica (archivo temporal y `os.replace`)."""
+    path = os.path.join(output_folder, file_name)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding='utf-8') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+def record_application(
+    user_id: int,
     company_name: str,
-    research_type: str
-) -> Tuple[str, str, str, str, str]:
+    job_description: str,
+    research_type: str,
+    output_folder: str,
+    research_context: str,
+    sections: Dict[str, str],
+    profile_data: Optional[Dict[str, Any]] = None
+) -> None:
     """
-    Ejecuta el pipeline completo: investigar, generar y guardar los resultados.
+    Registra el paquete publicado en el historial y, si se indica el perfil, la huella de la
+    oferta en el índice de casi duplicados. Un fallo de los índices no pierde el paquete.
+    Los paquetes con alguna sección fallida se marcan en el historial y no se indexan como
+    casi duplicados, para no ofrecerlos como reutilizables.
     """
-    job_title = job_description.split('\n')[0].strip()
+    failed = any(is_failed_section(content) for content in sections.values())
+    try:
+        application_history.record(
+            user_id, company_name, job_description, research_type, output_folder, research_context, sections,
+            failed=failed
+        )
+        if failed:
+            print("El paquete tiene secciones fallidas: no se ofrecerá para reutilizarlo.")
+        elif profile_data is not None:
+            near_duplicate_index.add(
+                user_id, profile_version(profile_data), job_description, output_folder, company_name, research_type
+            )
+    except sqlite3.Error as e:
+        print(f"Error al registrar el paquete en el historial: {e}")
 
-    # Módulo 1: Investigación
-    print(f"Ejecutando investigación: {research_type}...")
-    research_chain = get_research_chain(research_type)
-    research_context = research_chain.invoke({
+def build_research_input(company_name: str, job_description: str) -> Dict[str, str]:
+    """Construye la entrada de la cadena de investigación."""
+    return {
         "company_name": company_name,
-        "job_title": job_title,
+        "job_title": extract_job_title(job_description),
         "job_description": job_description
-    })
-    print("Investigación completada.")
-
-    # Módulo 2: Generación
-    print("Generando el paquete de aplicación...")
-    generation_chain = get_generation_chain()
-    profile_text = json.dumps(profile_data, indent=2, ensure_ascii=False)
-    
-    full_package_str = generation_chain.invoke({
+    }
+
+def build_generation_input(
+    profile_data: Dict[str, Any],
+    job_description: str,
+    research_context: str,
+    compact: bool = True
+) -> Dict[str, str]:
+    """
+    Construye la entrada de la cadena de generación. Con `compact` el perfil se reduce a los
+    logros más relevantes para la oferta y se serializa como JSON compacto (ver `core.relevance`).
+    """
+    if compact:
+        profile_text, _ = compact_profile(profile_data, job_description)
+    else:
+        profile_text = json.dumps(profile_data, indent=2, ensure_ascii=False)
+    return {
         "profile_text": profile_text,
         "job_description": job_description,
         "research_context": research_context
-    })
-    print("Paquete de aplicación generado.")
+    }
 
-    # Módulo 3: Procesamiento y Guardado (LÓGICA MEJORADA)
-    print("Procesando y guardando archivos...")
-    output_folder = create_output_folder(company_name)
-    
-    try:
-        # Dividir el string una sola vez usando todos los delimitadores posibles
-        parts = full_package_str.split('---CV_END---')
-        cv_opt = parts[0].strip()
-        
-        rest_parts = parts[1].split('---CL_END---')
-        cover_letter = rest_parts[0].strip()
+def get_research(
+    company_name: str,
+    job_description: str,
+    research_type: str,
+    use_cache: bool = True,
+    refresh: bool = False,
+    wait_for_prefetch: bool = True
+) -> str:
+    """
+    Devuelve la investigación para la empresa, el puesto y el tipo indicados. Si hay una
+    vigente en el almacén de investigaciones se reutiliza sin llamar al LLM, y si hay una
+    precarga en curso (ver `core.prefetch`) se espera su resultado; con `refresh`
+    (o `use_cache=False`) se genera de nuevo y se sustituye la guardada.
+    """
+    subject = research_subject(job_description, research_type)
+    stored = research_type != NO_RESEARCH_TYPE
+    if stored and use_cache and not refresh:
+        content = research_store.get(company_name, subject, research_type)
+        if content is None and wait_for_prefetch:
+            content = research_prefetcher.result(company_name, job_description, research_type)
+        if content is not None:
+            print("Investigación recuperada del almacén (sin llamar a la IA).")
+            record_cache_hit()
+            return content
+    content = get_research_chain(research_type).invoke(
+        build_research_input(company_name, job_description),
+        # El almacén ya es la caché de investigaciones: al regenerar para él (actualización o
+        # entrada caducada) no se debe devolver la misma respuesta de la caché del LLM.
+        config=NO_CACHE_CONFIG if stored or not use_cache else None
+    )
+    if stored:
+        research_store.set(company_name, subject, research_type, content)
+    return content
+
+async def aget_research(
+    company_name: str,
+    job_description: str,
+    research_type: str,
+    use_cache: bool = True,
+    refresh: bool = False
+) -> str:
+    """Variante asíncrona de `get_research`."""
+    subject = research_subject(job_description, research_type)
+    stored = research_type != NO_RESEARCH_TYPE
+    if stored and use_cache and not refresh:
+        content = await asyncio.to_thread(research_store.get, company_name, subject, research_type)
+        if content is None and research_prefetcher.in_flight(company_name, job_description, research_type):
+            content = await asyncio.to_thread(research_prefetcher.result, company_name, job_description, research_type)
+        if content is not None:
+            record_cache_hit()
+            return content
+    content = await get_research_chain(research_type).ainvoke(
+        build_research_input(company_name, job_description),
+        # El almacén ya es la caché de investigaciones: al regenerar para él (actualización o
+        # entrada caducada) no se debe devolver la misma respuesta de la caché del LLM.
+        config=NO_CACHE_CONFIG if stored or not use_cache else None
+    )
+    if stored:
+        await asyncio.to_thread(research_store.set, company_name, subject, research_type, content)
+    return content
+
+def parse_generated_package(full_package_str: str) -> Tuple[str, str, str]:
+    """
+    Divide la salida del LLM en CV, carta y preparación de entrevista usando los delimitadores.
+    Lanza ValueError o IndexError si la salida no respeta el formato esperado.
+    """
+    parts = full_package_str.split('---CV_END---')
+    cv_opt = parts[0].strip()
+
+    rest_parts = parts[1].split('---CL_END---')
+    cover_letter = rest_parts[0].strip()
 
-        rest_parts = rest_parts[1].split('---IP_END---')
-        interview_prep = rest_parts[0].strip()
+    rest_parts = rest_parts[1].split('---IP_END---')
+    interview_prep = rest_parts[0].strip()
 
-        # Asegurarse de que no queden vacíos
-        if not cv_opt and not cover_letter and not interview_prep:
-            raise ValueError("Todas las secciones parseadas están vacías.")
+    # Asegurarse de que no queden vacíos
+    if not cv_opt and not cover_letter and not interview_prep:
+        raise ValueError("Todas las secciones parseadas están vacías.")
 
+    return cv_opt, cover_letter, interview_prep
+
+def split_generated_package(full_package_str: str) -> Tuple[str, str, str, bool]:
+    """
+    Versión tolerante de `parse_generated_package`: si los delimitadores fallan, devuelve
+    mensajes de error en cada sección. El último valor indica si el parseo fue correcto.
+    """
+    try:
+        cv_opt, cover_letter, interview_prep = parse_generated_package(full_package_str)
+        return cv_opt, cover_letter, interview_prep, True
     except (ValueError, IndexError) as e:
         print(f"Advertencia: No se pudo parsear la salida del LLM con los delimitadores. Error: {e}. Se guardará la salida cruda.")
-        cv_opt = "Error: No se pudo parsear la sección del CV."
-        cover_letter = "Error: No se pudo parsear la sección de la Carta de Presentación."
-        interview_prep = "Error: No se pudo parsear la sección de Preparación de Entrevista."
-        with open(os.path.join(output_folder, "debug_raw_output.txt"), "w", encoding='utf-8') as f:
-            f.write(full_package_str)
-
-    # Guardar cada documento en su propio archivo
-    with open(os.path.join(output_folder, "Investigacion.md"), "w", encoding='utf-8') as f:
-        f.write(research_context)
-    with open(os.path.join(output_folder, "CV_Optimizado.md"), "w", encoding='utf-8') as f:
-        f.write(cv_opt)
-    with open(os.path.join(output_folder, "Carta_Presentacion.md"), "w", encoding='utf-8') as f:
-        f.write(cover_letter)
-    with open(os.path.join(output_folder, "Preparacion_Entrevista.md"), "w", encoding='utf-8') as f:
-        f.write(interview_prep)
-        
+        return (
+            SECTION_PARSE_ERRORS["cv"], SECTION_PARSE_ERRORS["cover_letter"], SECTION_PARSE_ERRORS["interview_prep"],
+            False
+        )
+
+def save_application_package(
+    company_name: str,
+    research_context: str,
+    cv_opt: str,
+    cover_letter: str,
+    interview_prep: str,
+    raw_output: Optional[str] = None
+) -> str:
+    """
+    Guarda cada documento del paquete en su propio archivo dentro de una carpeta de salida nueva.
+    Si se indica `raw_output`, se guarda también como archivo de depuración.
+    Los archivos se escriben en una carpeta temporal que se publica completa al final.
+    Devuelve la ruta de la carpeta.
+    """
+    staging_folder = create_staging_folder()
+    try:
+        if raw_output is not None:
+            write_package_file(staging_folder, DEBUG_RAW_FILE, raw_output)
+
+        # Guardar cada documento en su propio archivo
+        write_package_file(staging_folder, RESEARCH_FILE, research_context)
+        write_package_file(staging_folder, SECTION_FILES["cv"], cv_opt)
+        write_package_file(staging_folder, SECTION_FILES["cover_letter"], cover_letter)
+        write_package_file(staging_folder, SECTION_FILES["interview_prep"], interview_prep)
+        output_folder = publish_package_folder(staging_folder, company_name)
+    except BaseException:
+        discard_staging_folder(staging_folder)
+        raise
+
     print(f"Archivos guardados con éxito en: {output_folder}")
-        
+    return output_folder
+
+def _generate_sections(
+    generation_input: Dict[str, str],
+    generation_mode: str,
+    config: Optional[Dict[str, Any]]
+) -> Tuple[str, str, str, Optional[str]]:
+    """Genera las tres secciones con el modo indicado. Devuelve (cv, carta, preparación, salida_cruda_si_falló)."""
+    if generation_mode == "parallel":
+        sections = get_parallel_generation_chain().invoke(generation_input, config=config)
+        return sections['cv'], sections['cover_letter'], sections['interview_prep'], None
+    full_package_str = get_generation_chain().invoke(generation_input, config=config)
+    with span("parse_output"):
+        cv_opt, cover_letter, interview_prep, parsed = split_generated_package(full_package_str)
+    return cv_opt, cover_letter, interview_prep, None if parsed else full_package_str
+
+async def _agenerate_sections(
+    generation_input: Dict[str, str],
+    generation_mode: str,
+    config: Optional[Dict[str, Any]]
+) -> Tuple[str, str, str, Optional[str]]:
+    """Variante asíncrona de `_generate_sections`."""
+    if generation_mode == "parallel":
+        sections = await get_parallel_generation_chain().ainvoke(generation_input, config=config)
+        return sections['cv'], sections['cover_letter'], sections['interview_prep'], None
+    full_package_str = await get_generation_chain().ainvoke(generation_input, config=config)
+    with span("parse_output"):
+        cv_opt, cover_letter, interview_prep, parsed = split_generated_package(full_package_str)
+    return cv_opt, cover_letter, interview_prep, None if parsed else full_package_str
+
+def regenerate_section(
+    section: str,
+    profile_data: Dict[str, Any],
+    job_description: str,
+    research_context: str,
+    output_folder: Optional[str] = None,
+    use_cache: bool = True
+) -> str:
+    """
+    Vuelve a generar una única sección del paquete ("cv", "cover_letter" o "interview_prep")
+    sin repetir las otras dos. Si se indica `output_folder`, sobrescribe su archivo.
+    """
+    with span("generation", mode="section", section=section):
+        content = get_section_chain(section).invoke(
+            build_generation_input(profile_data, job_description, research_context),
+            config=None if use_cache else NO_CACHE_CONFIG
+        )
+    if output_folder:
+        with span("write_files"):
+            write_package_file(output_folder, SECTION_FILES[section], content)
+            try:
+                if application_history.update_section(output_folder, section, content):
+                    # Regenerar una sección fallida puede dejar el paquete completo
+                    application = application_history.get_by_folder(output_folder)
+                    application_history.set_failed(
+                        output_folder, any(is_failed_section(application[column] or "") for column in SECTION_FILES)
+                    )
+            except sqlite3.Error as e:
+                print(f"Error al actualizar el historial: {e}")
+    return content
+
+def run_full_pipeline(
+    profile_data: Dict[str, Any],
+    job_description: str,
+    company_name: str,
+    research_type: str,
+    use_cache: bool = True,
+    generation_mode: str = "single",
+    refresh_research: bool = False,
+    user_id: int = DEFAULT_USER_ID,
+    research_context: Optional[str] = None
+) -> Tuple[str, str, str, str, str]:
+    """
+    Ejecuta el pipeline completo: investigar, generar, guardar los resultados y registrarlos
+    en el historial de `user_id`.
+    Con `use_cache=False` se ignora la caché de respuestas del LLM.
+    La investigación se reutiliza del almacén si está vigente, salvo con `refresh_research`.
+    Con `research_context` (p. ej. la de un paquete anterior de una oferta casi idéntica)
+    no se investiga y solo se regeneran las secciones.
+    Con `generation_mode="parallel"` cada sección se genera con su propia cadena, de forma concurrente.
+    Cada etapa queda registrada como un span en `core.telemetry`.
+    """
+    config = None if use_cache else NO_CACHE_CONFIG
+
+    with span("pipeline", mode=generation_mode, research_type=research_type):
+        # Módulo 1: Investigación
+        print(f"Ejecutando investigación: {research_type}...")
+        with span("research", research_type=research_type, reused=research_context is not None):
+            if research_context is None:
+                research_context = get_research(
+                    company_name, job_description, research_type, use_cache, refresh_research
+                )
+            else:
+                record_cache_hit()
+        print("Investigación completada.")
+
+        # Módulo 2: Generación
+        print(f"Generando el paquete de aplicación (modo {generation_mode})...")
+        with span("generation", mode=generation_mode):
+            cv_opt, cover_letter, interview_prep, raw_output = _generate_sections(
+                build_generation_input(profile_data, job_description, research_context),
+                generation_mode, config
+            )
+        print("Paquete de aplicación generado.")
+
+        # Módulo 3: Guardado
+        print("Guardando archivos...")
+        with span("write_files"):
+            output_folder = save_application_package(
+                company_name, research_context, cv_opt, cover_letter, interview_prep, raw_output
+            )
+            record_application(
+                user_id, company_name, job_description, research_type, output_folder, research_context,
+                {"cv": cv_opt, "cover_letter": cover_letter, "interview_prep": interview_prep}, profile_data
+            )
+
+    return output_folder, cv_opt, cover_letter, interview_prep, research_context
+
+async def arun_full_pipeline(
+    profile_data: Dict[str, Any],
+    job_description: str,
+    company_name: str,
+    research_type: str,
+    use_cache: bool = True,
+    generation_mode: str = "single",
+    refresh_research: bool = False,
+    user_id: int = DEFAULT_USER_ID,
+    research_context: Optional[str] = None
+) -> Tuple[str, str, str, str, str]:
+    """
+    Variante asíncrona de `run_full_pipeline` basada en `ainvoke`, pensada para
+    ejecutar muchas aplicaciones concurrentemente sin bloquear el event loop.
+    """
+    config = None if use_cache else NO_CACHE_CONFIG
+    with span("pipeline", mode=generation_mode, research_type=research_type):
+        with span("research", research_type=research_type, reused=research_context is not None):
+            if research_context is None:
+                research_context = await aget_research(
+                    company_name, job_description, research_type, use_cache, refresh_research
+                )
+            else:
+                record_cache_hit()
+
+        with span("generation", mode=generation_mode):
+            cv_opt, cover_letter, interview_prep, raw_output = await _agenerate_sections(
+                build_generation_input(profile_data, job_description, research_context),
+                generation_mode, config
+            )
+
+        # La escritura de archivos es bloqueante: se delega a un hilo para no frenar el event loop.
+        with span("write_files"):
+            output_folder = await asyncio.to_thread(
+                save_application_package, company_name, research_context, cv_opt, cover_letter, interview_prep,
+                raw_output
+            )
+            await asyncio.to_thread(
+                record_application, user_id, company_name, job_description, research_type, output_folder,
+                research_context, {"cv": cv_opt, "cover_letter": cover_letter, "interview_prep": interview_prep},
+                profile_data
+            )
     return output_folder, cv_opt, cover_letter, interview_prep, research_context
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+Conversión local de PDF a Markdown a partir de la maquetación.
+
+PyMuPDF expone, para cada línea, el tamaño de letra, si es negrita y su posición
+(`page.get_text("dict")`). Con eso se reconstruyen los encabezados, las viñetas y los
+títulos en negrita que antes añadía Gemini, sin ninguna llamada de red. Una heurística
+de confianza decide si la maquetación es lo bastante limpia; si no lo es, el llamador
+recurre al LLM con el texto plano.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+
+BULLET_CHARS = "•●▪■□◦‣∙·○-–—*➢➤►✓"
+BOLD_FLAG = 16  # Bit de negrita en `span["flags"]`
+BOLD_FONT_HINTS = ("bold", "black", "heavy", "semibold", "demi")
+HEADING_SIZE_RATIO = 1.15  # Tamaño mínimo de un encabezado respecto al cuerpo del texto
+SHORT_LINE_WORDS = 8  # Las líneas en negrita más largas se consideran texto normal
+LAYOUT_MIN_CONFIDENCE = 0.6
+
+def _is_bold(span: Dict[str, Any]) -> bool:
+    return bool(span.get("flags", 0) & BOLD_FLAG) or any(
+        hint in span.get("font", "").lower() for hint in BOLD_FONT_HINTS
+    )
+
+def _overlap(a0: float, a1: float, b0: float, b1: float) -> float:
+    return max(0.0, min(a1, b1) - max(a0, b0))
+
+def read_page_lines(page: Any) -> Dict[str, Any]:
+    """Lee una página de PyMuPDF y devuelve su maquetación compacta (ver `page_layout`)."""
+    return page_layout(page.get_text("dict"))
+
+def page_layout(page_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce el resultado de `page.get_text("dict")` a lo que necesita la conversión:
+    una lista de líneas {text, size, bold, x0, block} y cuántos caracteres de la página
+    están en bloques situados uno al lado del otro (señal de maquetación en columnas).
+    """
+    lines: List[Dict[str, Any]] = []
+    text_blocks = [block for block in page_dict.get("blocks", []) if block.get("type", 0) == 0]
+    for block_index, block in enumerate(text_blocks):
+        for line in block.get("lines", []):
+            spans = [span for span in line.get("spans", []) if span.get("text")]
+            text = "".join(span["text"] for span in spans).strip()
+            if not text:
+                continue
+            visible = [span for span in spans if span["text"].strip()]
+            lines.append({
+                "text": text,
+                "size": round(max(span.get("size", 0) for span in visible) * 2) / 2,
+                "bold": all(_is_bold(span) for span in visible),
+                "x0": line.get("bbox", (0, 0, 0, 0))[0],
+                "block": block_index
+            })
+
+    side_by_side = set()
+    for i, a in enumerate(text_blocks):
+        ax0, ay0, ax1, ay1 = a.get("bbox", (0, 0, 0, 0))
+        for j in range(i + 1, len(text_blocks)):
+            bx0, by0, bx1, by1 = text_blocks[j].get("bbox", (0, 0, 0, 0))
+            vertical = _overlap(ay0, ay1, by0, by1)
+            if not _overlap(ax0, ax1, bx0, bx1) and vertical > 0.5 * min(ay1 - ay0, by1 - by0):
+                side_by_side.update((i, j))
+    chars_by_block = Counter()
+    for line in lines:
+        chars_by_block[line["block"]] += len(line["text"])
+    return {
+        "lines": lines,
+        "chars": sum(chars_by_block.values()),
+        "side_by_side_chars": sum(chars_by_block[i] for i in side_by_side)
+    }
+
+def layout_pages_to_text(pages: List[Dict[str, Any]]) -> List[str]:
+    """Texto plano de cada página, para cuando hay que recurrir al LLM."""
+    return ["\n".join(line["text"] for line in page["lines"]) for page in pages]
+
+def _body_size(pages: List[Dict[str, Any]]) -> float:
+    """Tamaño de letra con más caracteres: el del cuerpo del texto."""
+    weights = Counter()
+    for page in pages:
+        for line in page["lines"]:
+            weights[line["size"]] += len(line["text"])
+    return weights.most_common(1)[0][0] if weights else 0.0
+
+def _heading_levels(pages: List[Dict[str, Any]], body_size: float) -> Dict[float, int]:
+    """
+    Asigna un nivel de encabezado a cada tamaño de letra mayor que el cuerpo. El tamaño más
+    grande, si solo aparece un par de veces en la primera página, es el nombre (`#`).
+    """
+    counts = Counter(
+        line["size"] for page in pages for line in page["lines"]
+        if line["size"] >= body_size * HEADING_SIZE_RATIO
+    )
+    sizes = sorted(counts, reverse=True)
+    if not sizes:
+        return {}
+    first_page_sizes = {line["size"] for line in pages[0]["lines"]}
+    has_title = counts[sizes[0]] <= 2 and sizes[0] in first_page_sizes
+    levels = {}
+    for rank, size in enumerate(sizes):
+        level = rank + 1 if has_title else rank + 2
+        levels[size] = min(level, 3)
+    return levels
+
+def _is_upper_heading(text: str) -> bool:
+    letters = [c for c in text if c.isalpha()]
+    return len(letters) >= 3 and all(c.isupper() for c in letters) and len(text.split()) <= SHORT_LINE_WORDS
+
+def _strip_bullet(text: str) -> Tuple[bool, str]:
+    if text[0] in BULLET_CHARS and (len(text) == 1 or text[1].isspace() or text[0] not in "-*"):
+        return True, text[1:].strip()
+    return False, text
+
+def _join(previous: str, text: str) -> str:
+    # Une una línea partida por la maquetación, deshaciendo el guion de fin de línea.
+    if previous.endswith("-") and not previous.endswith(" -"):
+        return previous[:-1] + text
+    return f"{previous} {text}"
+
+def convert_layout_to_markdown(pages: List[Dict[str, Any]]) -> Tuple[str, float]:
+    """
+    Construye el Markdown del documento a partir de su maquetación y estima la confianza
+    (0-1) de que la estructura sea correcta. Devuelve (markdown, confianza).
+    """
+    body_size = _body_size(pages)
+    levels = _heading_levels(pages, body_size)
+    output: List[str] = []
+    headings = short_fragments = total_lines = replacement_chars = 0
+    pending_bullet = False  # Viñeta sola en su línea: el texto llega en la siguiente
+    last_block = None
+
+    for page in pages:
+        last_block = None
+        for line in page["lines"]:
+            text = line["text"]
+            total_lines += 1
+            replacement_chars += text.count("�")
+            new_block = line["block"] != last_block
+            last_block = line["block"]
+
+            is_bullet, content = _strip_bullet(text)
+            if is_bullet and not content:
+                pending_bullet = True
+                continue
+            if pending_bullet:
+                is_bullet, content, pending_bullet = True, text, False
+
+            level = levels.get(line["size"])
+            if level is None and line["bold"] and body_size and _is_upper_heading(text):
+                level = 2
+            elif level is None and new_block and _is_upper_heading(text) and len(text.split()) <= 4:
+                level = 2
+
+            if level is not None and not is_bullet:
+                headings += 1
+                output.extend(["", f"{'#' * level} {text}", ""])
+            elif is_bullet:
+                if output and output[-1] and not output[-1].startswith("- "):
+                    output.append("")
+                output.append(f"- {content}")
+            elif line["bold"] and len(text.split()) <= SHORT_LINE_WORDS * 2:
+                if output and output[-1]:
+                    output.append("")
+                output.append(f"**{text}**")
+            elif not new_block and output and output[-1] and not output[-1].startswith(("#", "**")):
+                output[-1] = _join(output[-1], text)
+            else:
+                if len(text.split()) <= 2:
+                    short_fragments += 1
+                if output and output[-1] and not output[-1].startswith("- "):
+                    output.append("")
+                output.append(text)
+
+    markdown = re.sub(r"\n{3,}", "\n\n", "\n".join(output)).strip() + "\n"
+
+    total_chars = sum(page["chars"] for page in pages)
+    if not total_chars:
+        return "", 0.0
+    confidence = 1.0
+    if not headings:
+        confidence -= 0.4
+    confidence -= min(0.5, sum(page["side_by_side_chars"] for page in pages) / total_chars)
+    if total_lines and short_fragments / total_lines > 0.3:
+        confidence -= 0.3
+    if replacement_chars / total_chars > 0.01:
+        confidence -= 0.5
+    return markdown, round(max(0.0, confidence), 2)
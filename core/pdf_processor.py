@@ -1,30 +1,200 @@
-import fitz  # PyMuPDF
-import google.generativeai as genai
-from typing import IO
+import os
+import re
+import mmap
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Iterator, List, Optional, Sequence, Tuple, Union
 
-def extract_text_from_pdf_buffer(pdf_buffer: IO[bytes]) -> str:
+from core.llm_cache import llm_cache
+from core.pdf_layout import LAYOUT_MIN_CONFIDENCE, convert_layout_to_markdown, layout_pages_to_text, read_page_lines
+from core.registry import get_generative_model
+
+MARKDOWN_MODEL_NAME = 'gemini-1.5-pro-latest'
+# Súbela al cambiar la conversión a Markdown (prompts o heurísticas de maquetación):
+# invalida los resultados guardados en la caché de ingesta.
+MARKDOWN_PIPELINE_VERSION = 1
+
+# Límites de entrada: los PDF más grandes se rechazan y las páginas de más se ignoran.
+MAX_PDF_BYTES = 50 * 1024 * 1024
+MAX_PDF_PAGES = 500
+# Por debajo de este número de páginas, arrancar procesos cuesta más de lo que ahorra.
+PARALLEL_MIN_PAGES = 32
+PAGES_PER_WORKER_MIN = 16
+
+# Los textos más largos se estructuran por fragmentos de este tamaño, en paralelo.
+MARKDOWN_CHUNK_CHARS = 12000
+MARKDOWN_MAX_CONCURRENCY = 4
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*)$")
+
+PDFSource = Union[str, os.PathLike, IO[bytes], bytes]
+
+@contextmanager
+def _pdf_bytes(source: PDFSource, max_bytes: int) -> Iterator[memoryview]:
     """
-    Extrae texto de un búfer de bytes de PDF (proporcionado por st.file_uploader).
+    Expone el contenido del PDF como `memoryview`: las rutas se proyectan en memoria con `mmap`
+    y los búferes (p. ej. el de st.file_uploader) se leen con `getbuffer()`, sin copia en este
+    proceso. Solo los objetos que no exponen un búfer se leen con `read()`.
+    Lanza ValueError si el archivo supera `max_bytes`.
     """
+    if isinstance(source, (str, os.PathLike)):
+        size = os.path.getsize(source)
+        if size > max_bytes:
+            raise ValueError(f"El PDF ocupa {size} bytes y el máximo es {max_bytes}.")
+        with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                view.release()
+        return
+
+    if isinstance(source, (bytes, bytearray)):
+        view = memoryview(source)
+    elif hasattr(source, "getbuffer"):
+        view = source.getbuffer()
+    else:
+        view = memoryview(source.read())
     try:
-        # PyMuPDF puede abrir directamente desde un stream de bytes
-        document = fitz.open(stream=pdf_buffer.read(), filetype="pdf")
-        full_text = ""
-        for page in document:
-            full_text += page.get_text("text") + "\n"
-        return full_text
+        if view.nbytes > max_bytes:
+            raise ValueError(f"El PDF ocupa {view.nbytes} bytes y el máximo es {max_bytes}.")
+        yield view
+    finally:
+        view.release()
+
+def _as_bytes(data: memoryview) -> bytes:
+    """Los bytes del PDF: si la vista ya cubre un objeto `bytes` completo se reutiliza; si no, se copian."""
+    if isinstance(data.obj, bytes) and data.nbytes == len(data.obj):
+        return data.obj
+    return bytes(data)
+
+def _open_document(data: memoryview):
+    """
+    Abre el PDF desde memoria. Las versiones de PyMuPDF que no aceptan `memoryview` reciben
+    bytes, que son una copia salvo que la vista ya cubra un objeto `bytes`.
+    """
+    import fitz  # PyMuPDF, importado solo cuando realmente se procesa un PDF
+
+    try:
+        return fitz.open(stream=data, filetype="pdf")
+    except TypeError:
+        return fitz.open(stream=_as_bytes(data), filetype="pdf")
+
+def _read_page_text(page: Any) -> str:
+    return page.get_text("text")
+
+def _extract_page_range(
+    source: Union[str, bytes, memoryview],
+    start: int,
+    stop: int,
+    read_page: Callable[[Any], Any] = _read_page_text
+) -> List[Any]:
+    """Lee las páginas [start, stop) con `read_page`. Se ejecuta en los procesos del pool."""
+    if isinstance(source, str):
+        with _pdf_bytes(source, os.path.getsize(source)) as data:
+            return _extract_page_range(data, start, stop, read_page)
+    with _open_document(memoryview(source)) as document:
+        return [read_page(document[number]) for number in range(start, stop)]
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Pool de procesos que no usa "fork" (el predeterminado en Linux): los hijos heredarían los
+    locks de los hilos del servidor de Streamlit (workers de trabajos, precalentamiento,
+    precargas, pool de SQLite) y podrían quedarse bloqueados. Se usa "forkserver", que bifurca
+    desde un proceso limpio de un solo hilo con PyMuPDF ya importado, y "spawn" donde no existe.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["fitz", "core.pdf_processor"])
+    else:
+        context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+def _page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """Reparte las páginas en `workers` rangos contiguos de tamaño similar."""
+    size = -(-page_count // workers)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+def extract_pdf_pages(
+    source: PDFSource,
+    max_pages: int = MAX_PDF_PAGES,
+    max_bytes: int = MAX_PDF_BYTES,
+    workers: Optional[int] = None,
+    read_page: Callable[[Any], Any] = _read_page_text
+) -> List[Any]:
+    """
+    Extrae el texto de cada página de un PDF dado como ruta, búfer o bytes
+    (o lo que devuelva `read_page`, que debe ser una función de módulo para poder usarse en el pool).
+
+    Los PDF grandes se reparten por rangos de páginas entre varios procesos (`workers`,
+    por defecto uno por núcleo). Solo se leen las primeras `max_pages` páginas;
+    lanza ValueError si el archivo supera `max_bytes`.
+    """
+    with _pdf_bytes(source, max_bytes) as data:
+        with _open_document(data) as document:
+            page_count = document.page_count
+            if page_count > max_pages:
+                print(f"Advertencia: El PDF tiene {page_count} páginas; solo se procesarán las primeras {max_pages}.")
+                page_count = max_pages
+
+            workers = min(workers or os.cpu_count() or 1, max(1, page_count // PAGES_PER_WORKER_MIN))
+            if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+                return [read_page(document[number]) for number in range(page_count)]
+
+        # Cada proceso vuelve a abrir el documento: las rutas se proyectan de nuevo con mmap
+        # y los búferes se envían una vez por proceso (los que no son `bytes` se copian antes).
+        payload = os.fspath(source) if isinstance(source, (str, os.PathLike)) else _as_bytes(data)
+        ranges = _page_ranges(page_count, workers)
+        with _process_pool(workers) as pool:
+            chunks = pool.map(
+                _extract_page_range, [payload] * len(ranges), *zip(*ranges), [read_page] * len(ranges)
+            )
+            return [text for chunk in chunks for text in chunk]
+
+def extract_pdf_text(
+    source: PDFSource,
+    max_pages: int = MAX_PDF_PAGES,
+    max_bytes: int = MAX_PDF_BYTES,
+    workers: Optional[int] = None
+) -> str:
+    """
+    Extrae el texto completo de un PDF. El texto de cada página se recoge en una lista y se
+    une una sola vez al final, de modo que el coste es lineal en el tamaño del documento.
+    """
+    pages = extract_pdf_pages(source, max_pages, max_bytes, workers)
+    return "\n".join(pages) + "\n" if pages else ""
+
+def _extract_file_text(path: str) -> str:
+    # Dentro del pool cada archivo se procesa en serie: el paralelismo ya está entre archivos.
+    try:
+        return extract_pdf_text(path, workers=1)
     except Exception as e:
-        print(f"Error al procesar el búfer del PDF: {e}")
+        print(f"Error al procesar el PDF {path}: {e}")
         return ""
 
-def structure_text_as_markdown(raw_text: str) -> str:
+def extract_texts_from_pdfs(paths: Sequence[str], workers: Optional[int] = None) -> List[str]:
     """
-    Utiliza el modelo Gemini para convertir un bloque de texto en bruto a formato Markdown.
+    Extrae el texto de muchos PDF (p. ej. una carpeta de CVs) repartiendo los archivos entre
+    varios procesos. Devuelve los textos en el mismo orden; los archivos que fallan dan "".
     """
-    print("🤖 Contactando a la IA para estructurar el documento...")
-    model = genai.GenerativeModel('gemini-1.5-pro-latest')
-    
-    prompt = f"""
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers <= 1:
+        return [_extract_file_text(path) for path in paths]
+    with _process_pool(workers) as pool:
+        return list(pool.map(_extract_file_text, paths))
+
+def extract_text_from_pdf_buffer(pdf_buffer: PDFSource) -> str:
+    """
+    Extrae texto de un búfer de bytes de PDF (proporcionado por st.file_uploader) o de una ruta.
+    """
+    try:
+        return extract_pdf_text(pdf_buffer)
+    except Exception as e:
+        print(f"Error al procesar el búfer del PDF: {e}")
+        return ""
+
+def _markdown_prompt(raw_text: str) -> str:
+    return f"""
     Eres un asistente experto en formateo de documentos. Convierte el siguiente texto,
     extraído de un CV, a un formato Markdown limpio y profesional.
     Identifica secciones (Experiencia, Educación, etc.) como encabezados (`##`),
@@ -36,21 +206,190 @@ def structure_text_as_markdown(raw_text: str) -> str:
     {raw_text}
     ---
     """
-    
+
+def _chunk_markdown_prompt(raw_text: str, index: int, total: int) -> str:
+    title_rule = (
+        "Si el fragmento empieza con el nombre de la persona, úsalo como único encabezado `#`."
+        if index == 0 else
+        "No uses encabezados `#`: este fragmento continúa un documento ya empezado."
+    )
+    return f"""
+    Eres un asistente experto en formateo de documentos. Convierte el siguiente texto,
+    el fragmento {index + 1} de {total} de un CV, a un formato Markdown limpio y profesional.
+    Identifica secciones (Experiencia, Educación, etc.) como encabezados (`##`) y sus
+    apartados como `###`, usa viñetas (`-`) para listas, y negritas (`**`) para cargos y empresas.
+    {title_rule}
+    Si el fragmento empieza a mitad de una sección, continúala sin inventar un encabezado.
+    Devuelve solo el Markdown del fragmento, sin comentarios.
+    Elimina cualquier artefacto de la extracción.
+
+    TEXTO EN BRUTO A CONVERTIR:
+    ---
+    {raw_text}
+    ---
+    """
+
+def _generate_markdown(prompt: str, use_cache: bool) -> str:
+    model = get_generative_model(MARKDOWN_MODEL_NAME)
+    return llm_cache.cached_call(
+        MARKDOWN_MODEL_NAME, None, prompt,
+        lambda p: model.generate_content(p).text,
+        use_cache=use_cache
+    )
+
+def structure_text_as_markdown(raw_text: str, use_cache: bool = True, chunked: Optional[bool] = None) -> str:
+    """
+    Utiliza el modelo Gemini para convertir un bloque de texto en bruto a formato Markdown.
+    Los textos largos (o con `chunked=True`) se dividen en fragmentos que se estructuran
+    de forma concurrente; ver `structure_chunks_as_markdown`.
+    Las respuestas se guardan en la caché del LLM salvo que `use_cache` sea False.
+    """
+    if chunked or (chunked is None and len(raw_text) > MARKDOWN_CHUNK_CHARS):
+        return structure_chunks_as_markdown(split_text_into_chunks(raw_text), use_cache=use_cache)
+
+    print("🤖 Contactando a la IA para estructurar el documento...")
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return _generate_markdown(_markdown_prompt(raw_text), use_cache)
     except Exception as e:
         print(f"Error al comunicarse con la API de Gemini: {e}")
         return "# Error en la conversión\n\nNo se pudo formatear el texto."
 
-def convert_pdf_to_markdown(pdf_file: IO[bytes]) -> str:
+def _pack_blocks(blocks: List[str], max_chars: int, separator: str) -> List[str]:
+    """Agrupa bloques consecutivos en fragmentos de como máximo `max_chars` caracteres."""
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for block in blocks:
+        if current and size + len(block) > max_chars:
+            chunks.append(separator.join(current))
+            current, size = [], 0
+        current.append(block)
+        size += len(block) + len(separator)
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+def split_text_into_chunks(raw_text: str, max_chars: int = MARKDOWN_CHUNK_CHARS) -> List[str]:
+    """
+    Divide el texto en fragmentos de como máximo `max_chars` caracteres cortando por párrafos
+    (líneas en blanco) y, si un párrafo no cabe, por líneas.
+    """
+    blocks: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", raw_text):
+        if not paragraph.strip():
+            continue
+        if len(paragraph) <= max_chars:
+            blocks.append(paragraph)
+        else:
+            blocks.extend(_pack_blocks(paragraph.splitlines(), max_chars, "\n"))
+    return _pack_blocks(blocks, max_chars, "\n\n")
+
+def split_pages_into_chunks(pages: List[str], max_chars: int = MARKDOWN_CHUNK_CHARS) -> List[str]:
+    """Agrupa páginas consecutivas en fragmentos; las páginas demasiado largas se dividen por párrafos."""
+    blocks: List[str] = []
+    for page in pages:
+        if not page.strip():
+            continue
+        blocks.extend([page] if len(page) <= max_chars else split_text_into_chunks(page, max_chars))
+    return _pack_blocks(blocks, max_chars, "\n")
+
+def _strip_code_fence(markdown: str) -> str:
+    """Quita el bloque ```markdown con el que el modelo a veces envuelve su respuesta."""
+    match = re.fullmatch(r"\s*```(?:markdown|md)?\s*\n(.*?)\n?```\s*", markdown, flags=re.DOTALL)
+    return match.group(1) if match else markdown
+
+def stitch_markdown_chunks(chunks: List[str]) -> str:
     """
-    Orquesta el proceso completo de conversión de un PDF en memoria a Markdown.
+    Une el Markdown de varios fragmentos con niveles de encabezado coherentes: solo el primer
+    fragmento puede tener un título `#`, las secciones de los demás se desplazan para que su
+    nivel más alto sea `##`, y se elimina el encabezado repetido cuando un fragmento continúa
+    la misma sección que el anterior.
     """
-    raw_text = extract_text_from_pdf_buffer(pdf_file)
+    stitched: List[str] = []
+    last_heading: Optional[Tuple[int, str]] = None
+    for index, chunk in enumerate(chunks):
+        lines = _strip_code_fence(chunk).strip().splitlines()
+        levels = [len(m.group(1)) for m in map(HEADING_PATTERN.match, lines) if m]
+        top_level = 1 if index == 0 else 2
+        if not levels or (index == 0 and min(levels) <= 2):
+            shift = 0
+        else:
+            shift = 2 - min(levels)
+
+        output: List[str] = []
+        for line in lines:
+            match = HEADING_PATTERN.match(line)
+            if not match:
+                output.append(line)
+                continue
+            level = min(6, max(top_level, len(match.group(1)) + shift))
+            heading = (level, match.group(2).strip().lower())
+            if not output and heading == last_heading:
+                continue  # Continuación de la sección del fragmento anterior
+            output.append(f"{'#' * level} {match.group(2).strip()}")
+            last_heading = heading
+        stitched.append("\n".join(output).strip())
+    return "\n\n".join(chunk for chunk in stitched if chunk) + "\n"
+
+def structure_chunks_as_markdown(chunks: List[str], use_cache: bool = True) -> str:
+    """
+    Estructura cada fragmento con su propia llamada al modelo, de forma concurrente, y une los
+    resultados. La latencia depende del fragmento más largo y no del documento completo, y cada
+    fragmento se cachea por separado. Si un fragmento falla se conserva su texto en bruto.
+    """
+    if len(chunks) <= 1:
+        return structure_text_as_markdown(chunks[0] if chunks else "", use_cache=use_cache, chunked=False)
+
+    print(f"🤖 Contactando a la IA para estructurar el documento en {len(chunks)} fragmentos...")
+
+    def structure(index: int) -> str:
+        try:
+            return _generate_markdown(_chunk_markdown_prompt(chunks[index], index, len(chunks)), use_cache)
+        except Exception as e:
+            print(f"Error al estructurar el fragmento {index + 1}: {e}")
+            return chunks[index]
+
+    with ThreadPoolExecutor(max_workers=min(MARKDOWN_MAX_CONCURRENCY, len(chunks))) as pool:
+        return stitch_markdown_chunks(list(pool.map(structure, range(len(chunks)))))
+
+def convert_pdf_to_markdown_with_text(
+    pdf_file: PDFSource,
+    use_cache: bool = True,
+    use_layout: bool = True
+) -> Tuple[str, str]:
+    """
+    Igual que `convert_pdf_to_markdown`, pero devuelve también el texto extraído: (texto, markdown).
+    """
+    try:
+        if use_layout:
+            layout = extract_pdf_pages(pdf_file, read_page=read_page_lines)
+            pages = layout_pages_to_text(layout)
+        else:
+            pages = extract_pdf_pages(pdf_file)
+    except Exception as e:
+        print(f"Error al procesar el búfer del PDF: {e}")
+        return "", ""
+    raw_text = "\n".join(pages) + "\n" if pages else ""
     if not raw_text.strip():
-        return ""
-    
-    markdown_text = structure_text_as_markdown(raw_text)
-    return markdown_text
+        return raw_text, ""
+
+    if use_layout:
+        markdown, confidence = convert_layout_to_markdown(layout)
+        if confidence >= LAYOUT_MIN_CONFIDENCE:
+            print(f"Markdown generado localmente a partir de la maquetación (confianza {confidence:.2f}).")
+            return raw_text, markdown
+        print(f"Maquetación poco fiable (confianza {confidence:.2f}); se recurre a la IA.")
+
+    if len(raw_text) > MARKDOWN_CHUNK_CHARS:
+        return raw_text, structure_chunks_as_markdown(split_pages_into_chunks(pages), use_cache=use_cache)
+    return raw_text, structure_text_as_markdown(raw_text, use_cache=use_cache, chunked=False)
+
+def convert_pdf_to_markdown(pdf_file: PDFSource, use_cache: bool = True, use_layout: bool = True) -> str:
+    """
+    Orquesta el proceso completo de conversión de un PDF (en memoria o en disco) a Markdown.
+
+    Con `use_layout` el Markdown se construye localmente a partir de la maquetación (tamaños
+    de letra, negritas y viñetas) y solo se llama al LLM si la confianza queda por debajo de
+    LAYOUT_MIN_CONFIDENCE. Los documentos largos se estructuran por fragmentos de páginas.
+    """
+    return convert_pdf_to_markdown_with_text(pdf_file, use_cache, use_layout)[1]
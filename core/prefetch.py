@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+"""
+Precarga especulativa de la investigación mientras el usuario rellena el formulario.
+
+La investigación depende solo de la empresa, el puesto y el tipo de investigación, que se
+conocen antes de pulsar "Forjar". En cuanto están completos, la interfaz pide una precarga:
+la investigación se genera en un hilo de fondo y se guarda en el almacén de investigaciones.
+Cuando el pipeline llega a su etapa de investigación, la encuentra en el almacén o, si la
+precarga aún está en curso, espera a que termine en lugar de repetir la llamada al LLM.
+
+Cada sesión (`owner`) tiene como mucho una precarga activa: si sus datos cambian, la
+anterior se cancela, y las sesiones que dejan de pedir precargas (p. ej. se cerró la pestaña)
+caducan pasado `OWNER_TTL_SECONDS`. Una precarga espera unos instantes antes de llamar al modelo, de modo
+que los cambios rápidos del formulario no gastan llamadas.
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+
+from core.research_store import normalize_key_part, research_subject
+from core.telemetry import span
+
+PREFETCH_MAX_WORKERS = int(os.getenv("RESEARCH_PREFETCH_WORKERS", "2"))
+PREFETCH_DELAY_SECONDS = 0.8
+PREFETCH_WAIT_SECONDS = 180
+OWNER_TTL_SECONDS = 30 * 60  # Las sesiones que no vuelven a pedir precarga en este tiempo se olvidan
+
+PrefetchKey = Tuple[str, str, str]
+
+class ResearchPrefetcher:
+    """Lanza, comparte y cancela las precargas de investigación, por (empresa, puesto, tipo)."""
+
+    def __init__(
+        self,
+        max_workers: int = PREFETCH_MAX_WORKERS,
+        delay_seconds: float = PREFETCH_DELAY_SECONDS,
+        owner_ttl_seconds: float = OWNER_TTL_SECONDS
+    ):
+        self.max_workers = max_workers
+        self.delay_seconds = delay_seconds
+        self.owner_ttl_seconds = owner_ttl_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.RLock()
+        self._futures: Dict[PrefetchKey, Future] = {}
+        self._cancel_events: Dict[PrefetchKey, threading.Event] = {}
+        self._owners: Dict[str, PrefetchKey] = {}
+        self._owner_seen: Dict[str, float] = {}
+        self.stats = {"started": 0, "cancelled": 0, "completed": 0, "reused": 0, "expired": 0}
+
+    @staticmethod
+    def key(company_name: str, job_description: str, research_type: str) -> PrefetchKey:
+        """Misma clave que el almacén de investigaciones."""
+        return normalize_key_part(company_name), normalize_key_part(research_subject(job_description, research_type)), research_type
+
+    def prefetch(self, owner: str, company_name: str, job_description: str, research_type: str) -> Optional[Future]:
+        """
+        Asegura que haya una precarga en curso para los datos de `owner` y la devuelve. Si la
+        precarga anterior de `owner` era para otros datos, se cancela. Sin empresa u oferta no
+        se precarga nada (el tipo "Ninguna" lo filtra quien llama).
+        """
+        if not company_name or not job_description:
+            self.release(owner)
+            return None
+        key = self.key(company_name, job_description, research_type)
+        with self._lock:
+            self._expire_owners()
+            if self._owners.get(owner, key) != key:
+                self.release(owner)
+            self._owners[owner] = key
+            self._owner_seen[owner] = time.monotonic()
+            future = self._futures.get(key)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="research-prefetch")
+                cancelled = threading.Event()
+                future = self._executor.submit(self._run, company_name, job_description, research_type, cancelled)
+                self._futures[key], self._cancel_events[key] = future, cancelled
+                self.stats['started'] += 1
+                future.add_done_callback(lambda done, key=key: self._forget(key, done))
+            return future
+
+    def release(self, owner: str) -> None:
+        """Olvida la precarga de `owner` y la cancela si ninguna otra sesión la necesita."""
+        with self._lock:
+            key = self._owners.pop(owner, None)
+            self._owner_seen.pop(owner, None)
+            if key is None or key in self._owners.values():
+                return
+            future = self._futures.get(key)
+            if future is not None and not future.done():
+                # En cola se cancela sin más; en curso, se descarta antes de llamar al modelo.
+                self._cancel_events[key].set()
+                future.cancel()
+                self.stats['cancelled'] += 1
+
+    def _expire_owners(self) -> None:
+        """Libera las sesiones que no han pedido precarga en `owner_ttl_seconds` (se llama con el lock)."""
+        deadline = time.monotonic() - self.owner_ttl_seconds
+        for owner in [owner for owner, seen in self._owner_seen.items() if seen < deadline]:
+            self.release(owner)
+            self.stats['expired'] += 1
+
+    def _forget(self, key: PrefetchKey, future: Future) -> None:
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+                del self._cancel_events[key]
+
+    def _run(self, company_name: str, job_description: str, research_type: str, cancelled: threading.Event) -> Optional[str]:
+        if cancelled.wait(self.delay_seconds):
+            return None
+        from core.orchestrator import get_research
+
+        with span("research_prefetch", research_type=research_type):
+            content = get_research(company_name, job_description, research_type, wait_for_prefetch=False)
+        with self._lock:
+            self.stats['completed'] += 1
+        return content
+
+    def in_flight(self, company_name: str, job_description: str, research_type: str) -> bool:
+        """Indica si hay una precarga en curso para esos datos."""
+        with self._lock:
+            return self.key(company_name, job_description, research_type) in self._futures
+
+    def result(
+        self,
+        company_name: str,
+        job_description: str,
+        research_type: str,
+        timeout: float = PREFETCH_WAIT_SECONDS
+    ) -> Optional[str]:
+        """
+        Espera la precarga en curso para esos datos y devuelve su investigación, o None si no
+        hay ninguna, se canceló o falló (el llamador genera entonces la suya).
+        """
+        with self._lock:
+            future = self._futures.get(self.key(company_name, job_description, research_type))
+        if future is None:
+            return None
+        try:
+            content = future.result(timeout)
+        except (CancelledError, Exception) as e:
+            print(f"La precarga de la investigación no se pudo reutilizar: {e or type(e).__name__}")
+            return None
+        if content is not None:
+            with self._lock:
+                self.stats['reused'] += 1
+        return content
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"in_flight": len(self._futures), "owners": len(self._owners), **self.stats}
+
+# Instancia global compartida por la aplicación
+research_prefetcher = ResearchPrefetcher()
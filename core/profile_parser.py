@@ -3,13 +3,29 @@
 """
 Módulo responsable de convertir el texto no estructurado de un CV
 en un objeto de perfil de usuario estructurado y validado usando Pydantic y LangChain.
+
+El CV se divide en secciones (encabezado, resumen, cada puesto de la experiencia,
+habilidades...) que se parsean por separado y se guardan por el hash de su texto. Al subir
+una versión editada del CV solo se parsean las secciones que cambiaron, y sus fragmentos se
+combinan con los ya guardados en un único UserProfile.
 """
 
+import re
+import json
+import hashlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import Any, List, Dict, Optional
+from unidecode import unidecode
+
+from core.ingestion_cache import ingestion_cache
+from core.llm_cache import cached_chat_model, NO_CACHE_CONFIG
+from core.registry import get_chat_model, get_or_build
+from core.telemetry import span, record_cache_hit
 
 # ----------------------------------------------------------------------------
 # 1. DEFINICIÓN DE LOS MODELOS DE DATOS (EL ESQUEMA)
@@ -43,20 +59,26 @@ class UserProfile(BaseModel):
     experiences: Optional[List[Experience]] = Field(default=None, description="Lista de experiencias laborales (opcional).")
     skills_inventory: Optional[Dict[str, List[str]]] = Field(default=None, description="Diccionario de habilidades (opcional).")
 
+# Esquemas reducidos para parsear una sola sección: con los mismos nombres de campo que
+# UserProfile, de modo que los fragmentos se combinan directamente.
 
-# ----------------------------------------------------------------------------
-# 2. LÓGICA DE LA CADENA DE IA
-# Funciones que ensamblan y ejecutan la cadena de LangChain para el parsing.
-# ----------------------------------------------------------------------------
+class ProfileHeader(BaseModel):
+    """Fragmento del encabezado o del resumen del CV."""
+    full_name: Optional[str] = Field(default=None, description="Nombre completo del usuario (opcional).")
+    contact: Optional[Contact] = Field(default=None, description="Información de contacto (opcional).")
+    base_summary: Optional[str] = Field(default=None, description="Resumen profesional (opcional).")
 
-def get_cv_parser_chain() -> any:
-    """
-    Construye y devuelve una cadena de LangChain que toma texto y devuelve un objeto UserProfile.
-    """
-    parser = PydanticOutputParser(pydantic_object=UserProfile)
+class ExperienceFragment(BaseModel):
+    """Fragmento con uno o varios puestos de la experiencia laboral."""
+    experiences: Optional[List[Experience]] = Field(default=None, description="Lista de experiencias laborales (opcional).")
 
-    prompt = PromptTemplate(
-        template="""
+class SkillsFragment(BaseModel):
+    """Fragmento de la sección de habilidades."""
+    skills_inventory: Optional[Dict[str, List[str]]] = Field(default=None, description="Diccionario de habilidades (opcional).")
+
+
+CV_PARSER_MODEL_NAME = "gemini-1.5-pro-latest"
+CV_PARSER_TEMPLATE = """
         Analiza el siguiente texto de un CV y extráelo a la estructura JSON solicitada.
         Eres un experto en reclutamiento, por lo que debes ser muy preciso.
         Si no encuentras información para un campo específico, omítelo o establece su valor en null. No inventes información.
@@ -67,21 +89,242 @@ def get_cv_parser_chain() -> any:
         ---
         {cv_text}
         ---
-        """,
+        """
+CV_SECTION_PARSER_TEMPLATE = """
+        Analiza la siguiente sección de un CV ("{section_title}") y extráela a la estructura JSON solicitada.
+        Eres un experto en reclutamiento, por lo que debes ser muy preciso.
+        Extrae solo la información que aparece en esta sección: el resto del CV se procesa por separado.
+        Si no encuentras información para un campo específico, omítelo o establece su valor en null. No inventes información.
+
+        {format_instructions}
+
+        CV TEXT:
+        ---
+        {cv_text}
+        ---
+        """
+
+# Esquema con que se parsea cada tipo de sección
+SECTION_SCHEMAS = {
+    "header": ProfileHeader,
+    "summary": ProfileHeader,
+    "experience": ExperienceFragment,
+    "skills": SkillsFragment,
+    "other": UserProfile,
+}
+
+def parser_version() -> str:
+    """
+    Huella de los esquemas, de los prompts y del modelo del parser. Cambia en cuanto cambia
+    cualquiera de ellos, de modo que los perfiles y fragmentos cacheados con otra versión se descartan.
+    """
+    schemas = [
+        model.model_json_schema() if hasattr(model, "model_json_schema") else model.schema()
+        for model in (UserProfile, ProfileHeader, ExperienceFragment, SkillsFragment)
+    ]
+    raw = json.dumps(
+        [schemas, CV_PARSER_TEMPLATE, CV_SECTION_PARSER_TEMPLATE, CV_PARSER_MODEL_NAME],
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+# ----------------------------------------------------------------------------
+# 2. LÓGICA DE LA CADENA DE IA
+# Funciones que ensamblan y ejecutan la cadena de LangChain para el parsing.
+# ----------------------------------------------------------------------------
+
+def get_cv_parser_chain() -> any:
+    """
+    Devuelve la cadena de LangChain que toma texto y devuelve un objeto UserProfile.
+    El parser y sus instrucciones de formato se construyen una sola vez por proceso.
+    """
+    return get_or_build("cv_parser", _build_cv_parser_chain)
+
+def _build_cv_parser_chain() -> any:
+    """Construye la cadena de parsing del CV."""
+    parser = PydanticOutputParser(pydantic_object=UserProfile)
+
+    prompt = PromptTemplate(
+        template=CV_PARSER_TEMPLATE,
         input_variables=["cv_text"],
         partial_variables={"format_instructions": parser.get_format_instructions()},
     )
 
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro-latest", temperature=0.0)
+    llm = cached_chat_model(get_chat_model(CV_PARSER_MODEL_NAME, 0.0), CV_PARSER_MODEL_NAME, 0.0)
+
+    return prompt | llm | parser
+
+def get_section_parser_chain(section_kind: str) -> any:
+    """Devuelve la cadena que parsea una sola sección del tipo `section_kind` a su fragmento."""
+    return get_or_build(f"cv_section_parser_{section_kind}", lambda: _build_section_parser_chain(section_kind))
+
+def _build_section_parser_chain(section_kind: str) -> any:
+    """Construye la cadena de parsing de una sección con el esquema reducido de su tipo."""
+    parser = PydanticOutputParser(pydantic_object=SECTION_SCHEMAS[section_kind])
+
+    prompt = PromptTemplate(
+        template=CV_SECTION_PARSER_TEMPLATE,
+        input_variables=["cv_text", "section_title"],
+        partial_variables={"format_instructions": parser.get_format_instructions()},
+    )
+
+    llm = cached_chat_model(get_chat_model(CV_PARSER_MODEL_NAME, 0.0), CV_PARSER_MODEL_NAME, 0.0)
 
     return prompt | llm | parser
 
-def parse_cv_to_profile(cv_text: str) -> Optional[Dict]:
+# ----------------------------------------------------------------------------
+# 3. PARSING INCREMENTAL POR SECCIONES
+# El CV se divide en secciones; cada una se identifica por el hash de su texto normalizado
+# y solo se envían al modelo las que no se parsearon antes con la misma versión del parser.
+# ----------------------------------------------------------------------------
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*)$")
+# Palabras clave de los títulos de sección, comparadas sin acentos y en minúsculas
+SECTION_KEYWORDS = {
+    "experience": ("experiencia", "experience", "trayectoria", "employment", "historial laboral", "work history"),
+    "skills": ("habilidades", "skills", "competencias", "conocimientos", "tecnologias", "herramientas"),
+    "summary": ("perfil", "resumen", "summary", "profile", "sobre mi", "about", "objetivo"),
+    "other": ("educacion", "education", "formacion", "idiomas", "languages", "certificac", "proyectos",
+              "projects", "cursos", "publicaciones", "premios", "voluntariado", "intereses"),
+}
+MAX_PLAIN_HEADING_WORDS = 4
+MIN_PARSED_SECTIONS = 2  # Con menos secciones reconocidas se parsea el CV completo
+SECTION_PARSER_MAX_CONCURRENCY = 4
+
+def _title_kind(title: str) -> Optional[str]:
+    """Tipo de sección según su título, o None si no es un título conocido."""
+    normalized = unidecode(title).lower().strip(" *:#")
+    for kind, keywords in SECTION_KEYWORDS.items():
+        if normalized.startswith(keywords):
+            return kind
+    return None
+
+def _section_heading(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Reconoce un encabezado de sección: un `##` de Markdown (o un `#` con título conocido) o,
+    en CVs en texto plano, una línea corta cuyo título es conocido (p. ej. "EXPERIENCIA").
+    """
+    stripped = line.strip()
+    match = HEADING_PATTERN.match(stripped)
+    if match:
+        level, title = len(match.group(1)), match.group(2).strip(" *")
+        kind = _title_kind(title)
+        if level == 2 or (level == 1 and kind):
+            return {"level": level, "title": title, "kind": kind or "other"}
+        return {"level": level, "title": title, "kind": None}
+    title = stripped.strip("*:").strip()
+    if title and len(title.split()) <= MAX_PLAIN_HEADING_WORDS and not title.endswith("."):
+        kind = _title_kind(title)
+        if kind:
+            return {"level": 2, "title": title, "kind": kind}
+    return None
+
+def split_cv_sections(cv_text: str) -> List[Dict[str, str]]:
+    """
+    Divide el CV en unidades de parsing {kind, title, text}, en el orden del documento: el
+    encabezado (nombre y contacto), cada sección y, dentro de la experiencia, cada puesto con
+    su propio subtítulo (`###`), de modo que añadir un puesto no invalida los demás.
+    """
+    current: Dict[str, Any] = {"kind": "header", "title": "Encabezado", "heading": None, "lines": []}
+    sections = [current]
+    for line in cv_text.splitlines():
+        heading = _section_heading(line)
+        if heading and heading['kind']:
+            current = {"kind": heading['kind'], "title": heading['title'], "heading": line, "lines": []}
+            sections.append(current)
+        elif heading and heading['level'] >= 3 and current['kind'] == "experience":
+            # Un subtítulo dentro de la experiencia abre un puesto nuevo de la misma sección
+            current = {"kind": "experience", "title": current['title'], "heading": None, "lines": [line]}
+            sections.append(current)
+        else:
+            current['lines'].append(line)
+
+    units = []
+    for section in sections:
+        body = "\n".join(section['lines']).strip()
+        if body:
+            text = f"{section['heading'].strip()}\n{body}" if section['heading'] else body
+            units.append({"kind": section['kind'], "title": section['title'], "text": text})
+    return units
+
+def section_hash(unit: Dict[str, str]) -> str:
+    """Hash del tipo y del texto normalizado de la sección (sin espacios ni líneas vacías de más)."""
+    normalized = "\n".join(" ".join(line.split()) for line in unit['text'].splitlines() if line.strip())
+    return hashlib.sha256(f"{unit['kind']}\n{normalized}".encode('utf-8')).hexdigest()
+
+def merge_profile_fragments(fragments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combina los fragmentos en un perfil con la estructura de UserProfile: el nombre, el resumen
+    y cada dato de contacto se toman del primer fragmento que los trae; las experiencias se
+    concatenan en el orden del CV y las habilidades se unen por categoría sin duplicados.
+    """
+    profile: Dict[str, Any] = {"full_name": None, "contact": None, "base_summary": None}
+    experiences: List[Dict[str, Any]] = []
+    skills: Dict[str, List[str]] = {}
+    for fragment in fragments:
+        for field in ("full_name", "base_summary"):
+            if not profile[field] and fragment.get(field):
+                profile[field] = fragment[field]
+        if fragment.get('contact'):
+            contact = profile['contact'] or {}
+            for key, value in fragment['contact'].items():
+                if value and not contact.get(key):
+                    contact[key] = value
+            profile['contact'] = contact
+        experiences.extend(fragment.get('experiences') or [])
+        for category, items in (fragment.get('skills_inventory') or {}).items():
+            merged = skills.setdefault(category, [])
+            merged.extend(item for item in items if item not in merged)
+    return UserProfile(**profile, experiences=experiences or None, skills_inventory=skills or None).dict()
+
+def _parse_section(unit: Dict[str, str], use_cache: bool) -> Dict[str, Any]:
+    fragment = get_section_parser_chain(unit['kind']).invoke(
+        {"cv_text": unit['text'], "section_title": unit['title']},
+        config=None if use_cache else NO_CACHE_CONFIG
+    )
+    return fragment.dict()
+
+def parse_cv_sections(cv_text: str, use_cache: bool = True) -> Optional[Dict]:
+    """
+    Parsea el CV sección por sección, reutilizando los fragmentos guardados de las secciones
+    que no cambiaron. Las secciones nuevas se parsean en paralelo. Devuelve None si el CV no
+    tiene secciones reconocibles (hay que parsearlo completo).
+    """
+    units = split_cv_sections(cv_text)
+    if sum(unit['kind'] != "header" for unit in units) < MIN_PARSED_SECTIONS:
+        return None
+
+    version = parser_version()
+    hashes = [section_hash(unit) for unit in units]
+    fragments = ingestion_cache.get_fragments(hashes, version) if use_cache else {}
+    pending = [index for index, unit_hash in enumerate(hashes) if unit_hash not in fragments]
+    for _ in range(len(units) - len(pending)):
+        record_cache_hit()
+    print(f"Parseando {len(pending)} de {len(units)} secciones del CV (el resto se reutiliza).")
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(SECTION_PARSER_MAX_CONCURRENCY, len(pending))) as pool:
+            # Cada tarea se ejecuta en una copia del contexto para que sus llamadas cuenten en el span en curso
+            futures = {
+                index: pool.submit(contextvars.copy_context().run, _parse_section, units[index], use_cache)
+                for index in pending
+            }
+            for index, future in futures.items():
+                fragments[hashes[index]] = future.result()
+                ingestion_cache.set_fragment(hashes[index], units[index]['kind'], version, fragments[hashes[index]])
+
+    return merge_profile_fragments([fragments[unit_hash] for unit_hash in hashes])
+
+def parse_cv_to_profile(cv_text: str, use_cache: bool = True, incremental: bool = True) -> Optional[Dict]:
     """
     Función de interfaz pública que toma el texto de un CV y devuelve un diccionario estructurado.
 
     Args:
         cv_text: El contenido de texto en bruto de un CV.
+        use_cache: Si es False, ignora la caché de respuestas del LLM y los fragmentos guardados,
+            y fuerza nuevas llamadas.
+        incremental: Si es True, parsea el CV por secciones y solo envía al modelo las que
+            cambiaron; si el CV no tiene secciones reconocibles o falla, se parsea completo.
 
     Returns:
         Un diccionario con la estructura de UserProfile, o None si ocurre un error.
@@ -91,8 +334,18 @@ def parse_cv_to_profile(cv_text: str) -> Optional[Dict]:
         return None
         
     try:
-        parser_chain = get_cv_parser_chain()
-        parsed_profile = parser_chain.invoke({"cv_text": cv_text})
+        with span("parse_cv", cv_chars=len(cv_text), incremental=incremental):
+            if incremental:
+                try:
+                    profile = parse_cv_sections(cv_text, use_cache)
+                    if profile is not None:
+                        return profile
+                except Exception as e:
+                    print(f"Error al parsear el CV por secciones, se parsea completo: {e}")
+            parsed_profile = get_cv_parser_chain().invoke(
+                {"cv_text": cv_text},
+                config=None if use_cache else NO_CACHE_CONFIG
+            )
         return parsed_profile.dict()
     except Exception as e:
         # Captura cualquier error durante el parsing y lo reporta, evitando que la app falle.
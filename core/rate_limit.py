@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+
+"""
+Control de cuota compartido por todas las llamadas a Gemini.
+
+Todas las llamadas al modelo pasan por `llm_cache` y, desde ahí, por el limitador global
+`gemini_limiter`, que combina:
+
+- Dos cubos de tokens: peticiones por minuto (RPM) y tokens por minuto (TPM).
+- Un límite de concurrencia AIMD: crece de uno en uno mientras las llamadas tienen éxito
+  y se reduce a la mitad cada vez que la API responde 429 / ResourceExhausted.
+- Reintentos con espera exponencial y jitter para los errores de cuota.
+
+Los límites se configuran con GEMINI_RPM, GEMINI_TPM y GEMINI_MAX_CONCURRENCY.
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple, TypeVar
+
+from core.telemetry import record_retry
+
+T = TypeVar("T")
+
+DEFAULT_RPM = float(os.getenv("GEMINI_RPM", 60))
+DEFAULT_TPM = float(os.getenv("GEMINI_TPM", 1_000_000))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 16))
+DEFAULT_MAX_ATTEMPTS = 5
+OUTPUT_TOKEN_RESERVE = 1024  # Tokens de salida que se reservan por llamada antes de conocer la respuesta
+CHARS_PER_TOKEN = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+RATE_LIMIT_MARKERS = ("429", "resource exhausted", "resourceexhausted", "rate limit", "quota", "too many requests")
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Indica si la excepción corresponde a un error de cuota (429) de la API."""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in RATE_LIMIT_MARKERS)
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def backoff_delay(attempt: int) -> float:
+    """Espera exponencial con jitter completo para el reintento número `attempt` (desde 0)."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+class TokenBucket:
+    """Cubo de tokens que se rellena de forma continua a `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Descuenta `amount` tokens y devuelve cuántos segundos hay que esperar hasta que estén
+        disponibles (0 si ya lo están). Las peticiones mayores que la capacidad se limitan a ella.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def adjust(self, delta: float) -> None:
+        """Corrige la reserva cuando se conoce el consumo real (positivo: se consumió más)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+class AIMDConcurrencyLimit:
+    """Límite de concurrencia con aumento aditivo y disminución multiplicativa."""
+
+    def __init__(self, initial: float = 4, minimum: float = 1, maximum: float = DEFAULT_MAX_CONCURRENCY):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self._condition = threading.Condition()
+        # Esperas asíncronas: (event loop, future) que `release` despierta desde cualquier hilo
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self) -> None:
+        """Variante de `acquire` que espera sin bloquear el event loop ni sondear."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = (loop, loop.create_future())
+                self._async_waiters.append(waiter)
+            try:
+                await waiter[1]
+            except asyncio.CancelledError:
+                with self._condition:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+                raise
+
+    def release(self, throttled: bool = False, completed: bool = True) -> None:
+        """
+        Libera un hueco. Un 429 (`throttled`) reduce el límite a la mitad y una llamada
+        completada lo aumenta; una cancelada (`completed=False`) no lo cambia.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            elif completed:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+            waiters, self._async_waiters = self._async_waiters, deque()
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:  # El event loop ya se cerró
+                pass
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+class RateLimiter:
+    """Combina los cubos RPM/TPM, el límite AIMD y los reintentos con backoff."""
+
+    def __init__(
+        self,
+        rpm: float = DEFAULT_RPM,
+        tpm: float = DEFAULT_TPM,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        burst: Optional[float] = None
+    ):
+        # `burst` limita cuántas peticiones pueden salir de golpe (por defecto, un minuto entero).
+        self.requests = TokenBucket(rpm, burst)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AIMDConcurrencyLimit(initial=min(4, max_concurrency), maximum=max_concurrency)
+        self.max_attempts = max_attempts
+        self._stats_lock = threading.Lock()
+        self.stats = {"calls": 0, "throttled": 0, "retries": 0, "waited_seconds": 0.0}
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _reserve(self, prompt: str) -> float:
+        estimated = estimate_tokens(prompt) + OUTPUT_TOKEN_RESERVE
+        wait = max(self.requests.reserve(1), self.tokens.reserve(estimated))
+        if wait:
+            self._count("waited_seconds", wait)
+        return wait
+
+    def _settle(self, prompt: str, response: Any) -> None:
+        if isinstance(response, str):
+            actual = estimate_tokens(prompt) + estimate_tokens(response)
+            self.tokens.adjust(actual - estimate_tokens(prompt) - OUTPUT_TOKEN_RESERVE)
+
+    @contextmanager
+    def slot(self, prompt: str) -> Iterator[None]:
+        """Espera cuota y un hueco de concurrencia para una llamada (p. ej. un stream)."""
+        time.sleep(self._reserve(prompt))
+        self.concurrency.acquire()
+        throttled = False
+        try:
+            yield
+        except Exception as e:
+            throttled = is_rate_limit_error(e)
+            raise
+        finally:
+            self.concurrency.release(throttled)
+
+    def call(self, generate: Callable[[str], T], prompt: str) -> T:
+        """Ejecuta `generate(prompt)` respetando la cuota y reintentando los errores 429."""
+        for attempt in range(self.max_attempts):
+            self._count("calls")
+            try:
+                with self.slot(prompt):
+                    response = generate(prompt)
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                self._count("throttled")
+                if attempt == self.max_attempts - 1:
+                    raise
+                self._count("retries")
+                record_retry()
+                time.sleep(backoff_delay(attempt))
+                continue
+            self._settle(prompt, response)
+            return response
+        raise RuntimeError("Se agotaron los reintentos.")  # Inalcanzable: el último intento relanza
+
+    async def acall(self, agenerate: Callable[[str], Awaitable[T]], prompt: str) -> T:
+        """Variante asíncrona de `call`: espera sin bloquear el event loop."""
+        for attempt in range(self.max_attempts):
+            self._count("calls")
+            await asyncio.sleep(self._reserve(prompt))
+            await self.concurrency.acquire_async()
+            error: Optional[Exception] = None
+            completed = False
+            try:
+                response = await agenerate(prompt)
+                completed = True
+            except Exception as e:
+                error = e
+                completed = True
+            finally:
+                # Se libera siempre (también si la tarea se cancela) y antes de la espera del
+                # backoff, para no retener el hueco mientras tanto.
+                self.concurrency.release(throttled=error is not None and is_rate_limit_error(error), completed=completed)
+            if error is not None:
+                if not is_rate_limit_error(error):
+                    raise error
+                self._count("throttled")
+                if attempt == self.max_attempts - 1:
+                    raise error
+                self._count("retries")
+                record_retry()
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            self._settle(prompt, response)
+            return response
+        raise RuntimeError("Se agotaron los reintentos.")
+
+    def stream(self, produce: Callable[[], Iterator[T]], prompt: str) -> Iterator[T]:
+        """
+        Transmite `produce()` dentro de un hueco de cuota. Los 429 se reintentan con backoff
+        mientras no se haya emitido ningún fragmento; después ya no, porque repetir el stream
+        duplicaría el texto que el consumidor ya recibió.
+        """
+        for attempt in range(self.max_attempts):
+            self._count("calls")
+            emitted = False
+            try:
+                with self.slot(prompt):
+                    for item in produce():
+                        emitted = True
+                        yield item
+                return
+            except Exception as e:
+                if emitted or not is_rate_limit_error(e):
+                    raise
+                self._count("throttled")
+                if attempt == self.max_attempts - 1:
+                    raise
+                self._count("retries")
+                record_retry()
+                time.sleep(backoff_delay(attempt))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado actual del limitador (para métricas y depuración)."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update(concurrency_limit=round(self.concurrency.limit, 2), in_flight=self.concurrency.in_flight)
+        return stats
+
+# Instancia global compartida por todas las llamadas a Gemini
+gemini_limiter = RateLimiter()
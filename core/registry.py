@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+Registro de proceso para clientes LLM y cadenas de LangChain.
+
+Construir un `ChatGoogleGenerativeAI`, un `PromptTemplate` o las instrucciones de formato de
+un `PydanticOutputParser` tiene un coste fijo, y cada cliente nuevo abre su propio canal
+HTTP/gRPC con su handshake TLS. El registro construye cada objeto una sola vez y lo
+reutiliza en todo el proceso, de modo que todas las llamadas comparten el mismo pool de conexiones.
+
+Las fábricas de modelos se pueden sustituir con `set_model_factories` (p. ej. por los modelos
+falsos de `core.fakes` en los benchmarks sin conexión).
+"""
+
+import threading
+from typing import Dict, Any, Callable, Hashable, Optional
+
+_lock = threading.RLock()
+_chat_models: Dict[Hashable, Any] = {}
+_generative_models: Dict[str, Any] = {}
+_chains: Dict[Hashable, Any] = {}
+
+def _default_chat_model(model_name: str, temperature: float) -> Any:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model_name, temperature=temperature)
+
+def _default_generative_model(model_name: str) -> Any:
+    import google.generativeai as genai
+    return genai.GenerativeModel(model_name)
+
+_chat_model_factory: Callable[[str, float], Any] = _default_chat_model
+_generative_model_factory: Callable[[str], Any] = _default_generative_model
+
+def set_model_factories(
+    chat_model: Optional[Callable[[str, float], Any]] = None,
+    generative_model: Optional[Callable[[str], Any]] = None
+) -> None:
+    """
+    Sustituye las fábricas de `ChatGoogleGenerativeAI` y `genai.GenerativeModel`. Sin argumentos
+    restaura las de Gemini. Vacía el registro para que las cadenas se reconstruyan con los nuevos modelos.
+    """
+    global _chat_model_factory, _generative_model_factory
+    with _lock:
+        _chat_model_factory = chat_model or _default_chat_model
+        _generative_model_factory = generative_model or _default_generative_model
+        clear_registry()
+
+def get_chat_model(model_name: str, temperature: float) -> Any:
+    """Devuelve el cliente `ChatGoogleGenerativeAI` compartido para el modelo y la temperatura dados."""
+    key = (model_name, temperature)
+    with _lock:
+        if key not in _chat_models:
+            _chat_models[key] = _chat_model_factory(model_name, temperature)
+        return _chat_models[key]
+
+def get_generative_model(model_name: str) -> Any:
+    """Devuelve el `genai.GenerativeModel` compartido para el modelo dado."""
+    with _lock:
+        if model_name not in _generative_models:
+            _generative_models[model_name] = _generative_model_factory(model_name)
+        return _generative_models[model_name]
+
+def get_or_build(key: Hashable, builder: Callable[[], Any]) -> Any:
+    """Devuelve el objeto registrado con `key` o lo construye con `builder` la primera vez."""
+    with _lock:
+        if key not in _chains:
+            _chains[key] = builder()
+        return _chains[key]
+
+def clear_registry() -> None:
+    """Descarta todos los clientes y cadenas registrados (p. ej. tras cambiar la clave de API)."""
+    with _lock:
+        _chat_models.clear()
+        _generative_models.clear()
+        _chains.clear()
+
+def warm_up(research_types: Optional[list] = None) -> Dict[str, int]:
+    """
+    Construye por adelantado todas las cadenas y clientes que usa la aplicación,
+    para que la primera petición del usuario no pague el coste de inicialización.
+    Devuelve cuántos objetos de cada tipo quedaron registrados.
+    """
+    from core.chains import (
+        RESEARCH_TYPES, SECTION_INSTRUCTIONS, get_research_chain,
+        get_generation_chain, get_section_chain, get_parallel_generation_chain
+    )
+    from core.profile_parser import get_cv_parser_chain
+    from core.pdf_processor import MARKDOWN_MODEL_NAME
+
+    for research_type in research_types or RESEARCH_TYPES:
+        get_research_chain(research_type)
+    get_generation_chain()
+    for section in SECTION_INSTRUCTIONS:
+        get_section_chain(section)
+    get_parallel_generation_chain()
+    get_cv_parser_chain()
+    get_generative_model(MARKDOWN_MODEL_NAME)
+
+    with _lock:
+        return {
+            "chat_models": len(_chat_models),
+            "generative_models": len(_generative_models),
+            "chains": len(_chains)
+        }
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compactación del perfil según su relevancia para la oferta.
+
+Antes de generar, cada logro del perfil se puntúa contra la descripción de la oferta
+con BM25 y solo se conservan los más relevantes que caben en un presupuesto de tokens.
+El perfil resultante se serializa como JSON compacto (sin IDs internos, campos vacíos
+ni sangría), de modo que las carreras largas no inflan el prompt ni el tiempo hasta
+el primer token.
+"""
+
+import re
+import json
+import math
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+
+from unidecode import unidecode
+
+PROFILE_TOKEN_BUDGET = 1500
+CHARS_PER_TOKEN = 4  # Aproximación habitual para estimar tokens sin tokenizador
+BM25_K1 = 1.5
+BM25_B = 0.75
+INTERNAL_KEYS = ("id", "user_id", "experience_id", "_key")
+
+STOPWORDS = frozenset("""
+a al algo ante como con contra cual de del desde donde durante e el en entre era es esta este
+esto estos ha han hasta la las le les lo los mas me mi muy no nos o os para pero por que se sea
+ser si sin sobre son su sus tambien te tu un una uno unos y ya
+an and are as at be by for from has have in is it its of on or that the their this to was we
+will with you your
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Normaliza (minúsculas, sin acentos) y separa en términos, sin palabras vacías."""
+    return [
+        term for term in re.findall(r"[a-z0-9+#]+", unidecode(text or "").lower())
+        if len(term) > 1 and term not in STOPWORDS
+    ]
+
+def estimate_tokens(text: str) -> int:
+    """Estimación rápida de tokens de un texto."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _bm25_scores(documents: List[List[str]], query: List[str]) -> List[float]:
+    """Puntúa cada documento (lista de términos) contra los términos de la consulta con BM25."""
+    if not documents:
+        return []
+    average_length = sum(map(len, documents)) / len(documents) or 1.0
+    document_frequency = Counter(term for document in documents for term in set(document))
+    query_terms = set(query)
+    idf = {
+        term: math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+        for term in query_terms
+    }
+    scores = []
+    for document in documents:
+        frequencies = Counter(document)
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * len(document) / average_length)
+        scores.append(sum(
+            idf[term] * frequencies[term] * (BM25_K1 + 1) / (frequencies[term] + length_norm)
+            for term in query_terms if term in frequencies
+        ))
+    return scores
+
+def _clean(value: Any) -> Any:
+    """Quita IDs internos y campos vacíos para que el JSON sea lo más corto posible."""
+    if isinstance(value, dict):
+        cleaned = {k: _clean(v) for k, v in value.items() if k not in INTERNAL_KEYS}
+        return {k: v for k, v in cleaned.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [item for item in (_clean(v) for v in value) if item not in (None, "", [], {})]
+    return value
+
+def compact_json(value: Any) -> str:
+    """Serializa sin espacios ni sangría."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+def compact_profile(
+    profile_data: Dict[str, Any],
+    job_description: str,
+    token_budget: int = PROFILE_TOKEN_BUDGET
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Devuelve el perfil como JSON compacto con los logros más relevantes para la oferta
+    y un informe con los tokens del perfil completo, del compactado y los ahorrados.
+
+    Los datos personales, el resumen, las habilidades y la cabecera de cada experiencia
+    (cargo, empresa y periodo) se conservan siempre; los logros se añaden por orden de
+    relevancia mientras quepan en `token_budget`. Las experiencias sin ningún logro
+    relevante se descartan si el presupuesto no alcanza ni para sus cabeceras.
+    """
+    profile = _clean(profile_data)
+    experiences = profile.pop('experiences', [])
+    full_tokens = estimate_tokens(json.dumps(profile_data, indent=2, ensure_ascii=False))
+
+    # Cada logro es un documento; el cargo y la empresa de su experiencia suman contexto.
+    candidates = []
+    for exp_index, exp in enumerate(experiences):
+        header = f"{exp.get('role', '')} {exp.get('company', '')}"
+        for ach_index, ach in enumerate(exp.get('achievements', [])):
+            text = f"{header} {ach.get('description', '')} {' '.join(ach.get('skills', []))}"
+            candidates.append((exp_index, ach_index, tokenize(text)))
+    scores = _bm25_scores([terms for _, _, terms in candidates], tokenize(job_description))
+    ranked = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+
+    headers = [{k: v for k, v in exp.items() if k != 'achievements'} for exp in experiences]
+    used = estimate_tokens(compact_json({**profile, "experiences": headers}))
+    kept: Dict[int, List[int]] = {}
+    for i in ranked:
+        exp_index, ach_index, _ = candidates[i]
+        cost = estimate_tokens(compact_json(experiences[exp_index]['achievements'][ach_index])) + 1
+        if used + cost > token_budget:
+            continue
+        kept.setdefault(exp_index, []).append(ach_index)
+        used += cost
+
+    # Si ni las cabeceras caben, se descartan las experiencias sin logros relevantes
+    # empezando por el final de la lista (normalmente las más antiguas).
+    dropped = set()
+    for exp_index in reversed(range(len(headers))):
+        if used <= token_budget:
+            break
+        if exp_index not in kept:
+            dropped.add(exp_index)
+            used -= estimate_tokens(compact_json(headers[exp_index]))
+
+    compact_experiences = []
+    for exp_index, header in enumerate(headers):
+        if exp_index in dropped:
+            continue
+        achievements = [experiences[exp_index]['achievements'][i] for i in sorted(kept.get(exp_index, []))]
+        compact_experiences.append({**header, "achievements": achievements} if achievements else header)
+    if compact_experiences:
+        profile['experiences'] = compact_experiences
+
+    profile_text = compact_json(profile)
+    compact_tokens = estimate_tokens(profile_text)
+    report = {
+        "original_tokens": full_tokens,
+        "compact_tokens": compact_tokens,
+        "saved_tokens": max(0, full_tokens - compact_tokens),
+        "achievements_kept": sum(len(v) for v in kept.values()),
+        "achievements_total": len(candidates)
+    }
+    return profile_text, report
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+Almacén persistente de investigaciones de empresa y salario.
+
+El resultado de la cadena de investigación depende solo de la empresa, el puesto y el tipo
+de investigación, así que se guarda en SQLite con esa clave (normalizada con `unidecode`;
+el puesto lo da `research_subject`)
+y se reutiliza durante un tiempo configurable. Aplicar a varios puestos de la misma
+empresa en un mismo día ya no repite la llamada al LLM.
+
+El TTL por defecto se puede cambiar con la variable de entorno RESEARCH_TTL_HOURS.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+from typing import Dict, Any, Optional
+
+from unidecode import unidecode
+
+RESEARCH_STORE_PATH = "database/research_store.db"
+DEFAULT_RESEARCH_TTL_SECONDS = float(os.getenv("RESEARCH_TTL_HOURS", 7 * 24)) * 60 * 60
+# Tipos cuyo prompt lee la oferta completa (la estimación salarial infiere de ella la seniority
+# y la ubicación): dos ofertas con el mismo título no comparten investigación.
+DESCRIPTION_DEPENDENT_TYPES = ("Estimación Salarial",)
+
+def extract_job_title(job_description: str) -> str:
+    """Toma la primera línea de la oferta como título del puesto."""
+    return job_description.split('\n')[0].strip()
+
+def normalize_key_part(text: str) -> str:
+    """Normaliza un nombre para la clave: sin acentos, en minúsculas y con espacios simples."""
+    return re.sub(r"\s+", " ", unidecode(text or "")).strip().lower()
+
+def research_subject(job_description: str, research_type: str) -> str:
+    """
+    Puesto al que se refiere la investigación, para la clave del almacén: el título y, en los
+    tipos de `DESCRIPTION_DEPENDENT_TYPES`, también una huella de la descripción completa.
+    """
+    job_title = extract_job_title(job_description)
+    if research_type not in DESCRIPTION_DEPENDENT_TYPES:
+        return job_title
+    digest = hashlib.sha256(normalize_key_part(job_description).encode("utf-8")).hexdigest()[:16]
+    return f"{job_title} #{digest}"
+
+class ResearchStore:
+    """Gestiona el almacenamiento, la consulta y la caducidad de las investigaciones en SQLite."""
+
+    def __init__(self, db_path: str = RESEARCH_STORE_PATH, ttl_seconds: float = DEFAULT_RESEARCH_TTL_SECONDS):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._is_setup = False
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Establece y devuelve una conexión a la base de datos del almacén."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._is_setup:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS research (
+                company_key TEXT NOT NULL,
+                job_title_key TEXT NOT NULL,
+                research_type TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (company_key, job_title_key, research_type)
+            );
+            """)
+            self._is_setup = True
+        return conn
+
+    @staticmethod
+    def _key(company_name: str, subject: str, research_type: str) -> tuple:
+        return normalize_key_part(company_name), normalize_key_part(subject), research_type
+
+    def lookup(self, company_name: str, subject: str, research_type: str) -> Optional[Dict[str, Any]]:
+        """Devuelve {content, created_at} si hay una investigación vigente, o None."""
+        try:
+            with self._get_connection() as conn:
+                row = conn.execute(
+                    "SELECT content, created_at FROM research "
+                    "WHERE company_key = ? AND job_title_key = ? AND research_type = ?;",
+                    self._key(company_name, subject, research_type)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error al leer el almacén de investigaciones: {e}")
+            return None
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return {"content": row[0], "created_at": row[1]}
+
+    def get(self, company_name: str, subject: str, research_type: str) -> Optional[str]:
+        """Devuelve el texto de la investigación vigente, o None."""
+        entry = self.lookup(company_name, subject, research_type)
+        return entry['content'] if entry else None
+
+    def set(self, company_name: str, subject: str, research_type: str, content: str) -> None:
+        """Guarda (o sustituye) la investigación."""
+        try:
+            with self._get_connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO research "
+                    "(company_key, job_title_key, research_type, content, created_at) VALUES (?, ?, ?, ?, ?);",
+                    (*self._key(company_name, subject, research_type), content, time.time())
+                )
+        except sqlite3.Error as e:
+            print(f"Error al escribir en el almacén de investigaciones: {e}")
+
+    def invalidate(self, company_name: str, subject: str, research_type: str) -> None:
+        """Descarta la investigación guardada para forzar una nueva en la próxima aplicación."""
+        with self._get_connection() as conn:
+            conn.execute(
+                "DELETE FROM research WHERE company_key = ? AND job_title_key = ? AND research_type = ?;",
+                self._key(company_name, subject, research_type)
+            )
+
+    def purge_expired(self) -> int:
+        """Elimina las investigaciones caducadas y devuelve cuántas se borraron."""
+        with self._get_connection() as conn:
+            return conn.execute(
+                "DELETE FROM research WHERE created_at < ?;", (time.time() - self.ttl_seconds,)
+            ).rowcount
+
+# Instancia global compartida por la aplicación
+research_store = ResearchStore()
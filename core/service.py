@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+Servicio asíncrono de generación para la API HTTP (ver `core.http_api`).
+
+Envuelve `arun_full_pipeline` y la ingesta de CVs con dos protecciones:
+
+- Coalescencia (single-flight): las peticiones idénticas que llegan mientras otra igual está
+  en curso (mismo usuario, misma versión del perfil, misma oferta, empresa y tipo de
+  investigación) no lanzan otro pipeline: esperan y comparten el resultado de la primera.
+- Contrapresión: como mucho `max_concurrency` pipelines se ejecutan a la vez y, cuando hay
+  `max_pending` trabajos distintos admitidos (en ejecución o esperando turno), las peticiones
+  nuevas se rechazan con `ServiceOverloaded` en lugar de acumularse sin límite.
+
+No depende del servidor HTTP: se puede usar y probar directamente desde asyncio.
+"""
+
+import os
+import math
+import time
+import asyncio
+import hashlib
+import json
+from typing import Dict, Any, Awaitable, Callable, Optional, Tuple
+
+from core.near_duplicates import profile_version
+from database.database_manager import DEFAULT_USER_ID
+
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "4"))
+API_MAX_PENDING = int(os.getenv("API_MAX_PENDING", "32"))
+DEFAULT_TASK_SECONDS = 30.0  # Duración supuesta de un trabajo hasta medir el primero
+
+class ServiceOverloaded(Exception):
+    """La cola del servicio está llena: el cliente debe reintentar pasados `retry_after` segundos."""
+
+    def __init__(self, pending: int, retry_after: int):
+        super().__init__(f"El servicio tiene {pending} trabajos pendientes; reintenta en {retry_after} s.")
+        self.pending = pending
+        self.retry_after = retry_after
+
+class SingleFlight:
+    """Comparte una única ejecución en curso entre todas las llamadas con la misma clave."""
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._in_flight
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Devuelve (resultado, compartido). Si ya hay una ejecución con `key`, espera la suya;
+        si no, la lanza con `factory`. La ejecución está protegida: si el cliente que la lanzó
+        se desconecta, sigue adelante para los demás.
+        """
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Marca el error como recuperado aunque ya nadie espere el resultado
+
+def request_key(kind: str, *parts: Any) -> str:
+    """Clave de coalescencia: hash del tipo de operación y de sus argumentos."""
+    raw = json.dumps([kind, *parts], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class GenerationService:
+    """Ejecuta generaciones e ingestas con coalescencia de peticiones idénticas y cola acotada."""
+
+    def __init__(self, max_concurrency: int = API_MAX_CONCURRENCY, max_pending: int = API_MAX_PENDING):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_pending = max(1, max_pending)
+        self._flights = SingleFlight()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self._running = 0
+        self._task_seconds = DEFAULT_TASK_SECONDS
+        self.stats = {"requests": 0, "coalesced": 0, "rejected": 0, "completed": 0, "failed": 0}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Se crea dentro del event loop que atiende las peticiones
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado de la cola y contadores, para el endpoint de salud."""
+        return {
+            "running": self._running,
+            "pending": self._pending,
+            "max_concurrency": self.max_concurrency,
+            "max_pending": self.max_pending,
+            **self.stats
+        }
+
+    async def _submit(self, key: str, operation: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Admite la operación (o la une a una idéntica en curso) y devuelve (resultado, compartido)."""
+        self.stats['requests'] += 1
+        if key not in self._flights:
+            if self._pending >= self.max_pending:
+                self.stats['rejected'] += 1
+                retry_after = math.ceil(self._task_seconds * self._pending / self.max_concurrency)
+                raise ServiceOverloaded(self._pending, max(1, retry_after))
+            # Se cuenta antes de lanzar la tarea, para que dos peticiones seguidas no superen el límite
+            self._pending += 1
+        result, shared = await self._flights.run(key, lambda: self._execute(operation))
+        if shared:
+            self.stats['coalesced'] += 1
+        return result, shared
+
+    async def _execute(self, operation: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            async with self._get_semaphore():
+                self._running += 1
+                started = time.monotonic()
+                try:
+                    result = await operation()
+                finally:
+                    self._running -= 1
+            # Media móvil de la duración, para estimar el Retry-After
+            self._task_seconds = 0.8 * self._task_seconds + 0.2 * (time.monotonic() - started)
+            self.stats['completed'] += 1
+            return result
+        except BaseException:
+            self.stats['failed'] += 1
+            raise
+        finally:
+            self._pending -= 1
+
+    async def generate(
+        self,
+        profile_data: Dict[str, Any],
+        job_description: str,
+        company_name: str,
+        research_type: str,
+        user_id: int = DEFAULT_USER_ID,
+        generation_mode: str = "single",
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Forja un paquete de aplicación con `arun_full_pipeline`. Devuelve la carpeta, las
+        secciones, la investigación y si el resultado se compartió con otra petición idéntica.
+        """
+        from core.orchestrator import arun_full_pipeline
+
+        key = request_key(
+            "generate", user_id, profile_version(profile_data), job_description.strip(), company_name.strip(),
+            research_type, generation_mode, use_cache
+        )
+
+        async def operation() -> Dict[str, Any]:
+            folder, cv_opt, cover_letter, interview_prep, research_context = await arun_full_pipeline(
+                profile_data, job_description, company_name, research_type,
+                use_cache=use_cache, generation_mode=generation_mode, user_id=user_id
+            )
+            return {
+                "folder": folder, "cv": cv_opt, "cover_letter": cover_letter,
+                "interview_prep": interview_prep, "research": research_context
+            }
+
+        result, shared = await self._submit(key, operation)
+        return {**result, "coalesced": shared}
+
+    async def ingest(self, data: bytes, kind: str, use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Convierte un CV (`kind` "pdf" o "text") en perfil con la caché de ingesta. La ingesta es
+        síncrona y se ejecuta en un hilo; las subidas idénticas simultáneas se procesan una vez.
+        """
+        from core.ingestion_cache import hash_upload, ingest_pdf, ingest_text
+
+        if kind not in ("pdf", "text"):
+            raise ValueError(f"Tipo de CV desconocido: {kind}")
+
+        async def operation() -> Dict[str, Any]:
+            if kind == "pdf":
+                return await asyncio.to_thread(ingest_pdf, data, use_cache)
+            return await asyncio.to_thread(ingest_text, data.decode("utf-8"), use_cache)
+
+        ingestion, shared = await self._submit(request_key("ingest", kind, hash_upload(data), use_cache), operation)
+        return {**ingestion, "coalesced": shared}
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+"""
+Variante en streaming del pipeline de generación.
+
+El texto del LLM se procesa a medida que llega: un parser incremental detecta los
+delimitadores de sección y, en cuanto una sección termina, se guarda en su archivo
+y se notifica a la interfaz para que la muestre sin esperar al resto del paquete.
+"""
+
+from typing import Dict, Any, List, Optional, Tuple, Iterator
+
+from core.chains import stream_generation, SECTION_PARSE_ERRORS
+from core.orchestrator import (
+    SECTION_FILES, RESEARCH_FILE, DEBUG_RAW_FILE,
+    create_staging_folder, discard_staging_folder, publish_package_folder, record_application,
+    write_package_file, build_generation_input, get_research
+)
+from database.database_manager import DEFAULT_USER_ID
+from core.telemetry import span, record_cache_hit
+
+SECTION_DELIMITERS = [
+    ("cv", "---CV_END---"),
+    ("cover_letter", "---CL_END---"),
+    ("interview_prep", "---IP_END---")
+]
+
+class IncrementalSectionParser:
+    """
+    Separa el paquete generado en secciones a medida que llegan los fragmentos del LLM.
+
+    Solo se examina el texto nuevo de cada fragmento (más una cola del tamaño del
+    delimitador, por si este llega partido entre dos fragmentos). Los fragmentos de la
+    sección en curso se guardan en una lista y se unen una sola vez, cuando la sección se
+    completa, de modo que el coste total es lineal en la longitud de la respuesta.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []  # Fragmentos de la sección en curso
+        self._tail = ""  # Final del texto de la sección en curso, por si el delimitador llega partido
+        self._index = 0
+        self.delta = ""  # Texto que el último fragmento añadió a la sección en curso
+        self.raw_chunks: List[str] = []
+
+    @property
+    def current_section(self) -> str:
+        """Nombre de la sección que se está recibiendo, o None si ya se completaron todas."""
+        return SECTION_DELIMITERS[self._index][0] if self._index < len(SECTION_DELIMITERS) else None
+
+    @property
+    def raw_text(self) -> str:
+        """Texto completo recibido hasta el momento."""
+        return "".join(self.raw_chunks)
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """
+        Añade un fragmento y devuelve las secciones que quedaron completas con él. El texto que
+        el fragmento aporta a la sección que sigue en curso queda en `delta`.
+        """
+        self.raw_chunks.append(chunk)
+        self.delta = ""
+        completed = []
+        text = chunk
+        while self._index < len(SECTION_DELIMITERS):
+            name, delimiter = SECTION_DELIMITERS[self._index]
+            position = (self._tail + text).find(delimiter)
+            if position == -1:
+                self._chunks.append(text)
+                # El delimitador podría estar partido: se conserva su longitud menos uno.
+                keep = len(delimiter) - 1
+                self._tail = (self._tail + text)[-keep:] if keep else ""
+                self.delta = text
+                break
+            # El delimitador puede empezar en la cola, es decir, en fragmentos anteriores.
+            pending = "".join(self._chunks) + text
+            start = len(pending) - len(text) - len(self._tail) + position
+            completed.append((name, pending[:start].strip()))
+            text = pending[start + len(delimiter):]
+            self._chunks, self._tail = [], ""
+            self._index += 1
+        return completed
+
+    def finish(self) -> Tuple[List[Tuple[str, str]], bool]:
+        """
+        Cierra el stream. Si solo falta el último delimitador se acepta el texto restante
+        como última sección; las secciones que no llegaron se marcan con un error.
+        Devuelve las secciones pendientes y si el parseo fue correcto.
+        """
+        pending = []
+        parsed = True
+        remaining = SECTION_DELIMITERS[self._index:]
+        if remaining:
+            last_name = SECTION_DELIMITERS[-1][0]
+            last_text = "".join(self._chunks).strip()
+            if len(remaining) == 1 and remaining[0][0] == last_name and last_text:
+                pending.append((last_name, last_text))
+            else:
+                parsed = False
+                pending.extend((name, SECTION_PARSE_ERRORS[name]) for name, _ in remaining)
+            self._index = len(SECTION_DELIMITERS)
+        return pending, parsed
+
+def stream_full_pipeline(
+    profile_data: Dict[str, Any],
+    job_description: str,
+    company_name: str,
+    research_type: str,
+    use_cache: bool = True,
+    refresh_research: bool = False,
+    user_id: int = DEFAULT_USER_ID,
+    research_context: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Ejecuta el pipeline emitiendo eventos a medida que avanza:
+
+    - {"type": "research", "content"} al terminar la investigación.
+    - {"type": "token", "section", "delta"} con el texto nuevo de la sección en curso (el
+      consumidor lo acumula; así el coste no crece con la longitud de la sección).
+    - {"type": "section", "section", "content", "path"} cuando una sección se completa
+      y ya se ha guardado en su archivo.
+    - {"type": "done", "output_folder", "sections", "research_context"} al final.
+
+    Con `research_context` se reutiliza esa investigación en lugar de generarla.
+    Los archivos se escriben en una carpeta temporal que se publica (y se registra en el
+    historial de `user_id`) al terminar; si el stream se interrumpe, se descarta.
+    Las etapas se registran como spans en `core.telemetry`; el span de generación incluye
+    también la escritura de cada sección, que se intercala con el stream.
+    """
+    staging_folder = create_staging_folder()
+    try:
+        with span("pipeline", mode="stream", research_type=research_type):
+            yield from _stream_stages(
+                profile_data, job_description, company_name, research_type, use_cache, refresh_research,
+                user_id, staging_folder, research_context
+            )
+    except BaseException:
+        discard_staging_folder(staging_folder)
+        raise
+
+def _stream_stages(
+    profile_data: Dict[str, Any],
+    job_description: str,
+    company_name: str,
+    research_type: str,
+    use_cache: bool,
+    refresh_research: bool,
+    user_id: int,
+    staging_folder: str,
+    research_context: Optional[str]
+) -> Iterator[Dict[str, Any]]:
+    print(f"Ejecutando investigación: {research_type}...")
+    with span("research", research_type=research_type, reused=research_context is not None):
+        if research_context is None:
+            research_context = get_research(company_name, job_description, research_type, use_cache, refresh_research)
+        else:
+            record_cache_hit()
+    write_package_file(staging_folder, RESEARCH_FILE, research_context)
+    yield {"type": "research", "content": research_context}
+
+    print("Generando el paquete de aplicación en streaming...")
+    parser = IncrementalSectionParser()
+    sections: Dict[str, str] = {}
+
+    def flush(completed: List[Tuple[str, str]]) -> Iterator[Dict[str, Any]]:
+        for name, content in completed:
+            sections[name] = content
+            write_package_file(staging_folder, SECTION_FILES[name], content)
+            yield {"type": "section", "section": name, "content": content, "path": SECTION_FILES[name]}
+
+    generation_input = build_generation_input(profile_data, job_description, research_context)
+    with span("generation", mode="stream"):
+        for chunk in stream_generation(generation_input, use_cache=use_cache):
+            yield from flush(parser.feed(chunk))
+            if parser.current_section and parser.delta:
+                yield {"type": "token", "section": parser.current_section, "delta": parser.delta}
+
+        pending, parsed = parser.finish()
+        yield from flush(pending)
+    if not parsed:
+        print("Advertencia: No se pudo parsear la salida del LLM con los delimitadores. Se guardará la salida cruda.")
+        write_package_file(staging_folder, DEBUG_RAW_FILE, parser.raw_text)
+
+    with span("write_files"):
+        output_folder = publish_package_folder(staging_folder, company_name)
+        record_application(
+            user_id, company_name, job_description, research_type, output_folder, research_context, sections,
+            profile_data
+        )
+    print(f"Archivos guardados con éxito en: {output_folder}")
+    yield {
+        "type": "done",
+        "output_folder": output_folder,
+        "sections": sections,
+        "research_context": research_context
+    }
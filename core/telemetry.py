@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+"""
+Instrumentación por etapas del pipeline.
+
+Cada etapa (investigación, generación, parseo de la salida, parseo del CV y escritura de
+archivos) se envuelve en un `span` que mide su tiempo real y acumula lo que ocurre dentro:
+tokens de entrada y salida de las llamadas reales al modelo, aciertos de caché y reintentos
+por cuota. Las llamadas anidadas se atribuyen al span en curso y a todos sus padres, de modo
+que el span "pipeline" suma las de sus etapas.
+
+Cada span terminado se añade como una línea a un log JSONL y a la tabla `spans` de SQLite,
+que alimenta el panel de p50/p95 por etapa de la interfaz. Los tokens son estimados (unos
+4 caracteres por token). Con la variable de entorno PIPELINE_METRICS=0 no se registra nada.
+"""
+
+import os
+import json
+import math
+import time
+import uuid
+import sqlite3
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterator
+
+METRICS_DB_PATH = "database/metrics.db"
+METRICS_LOG_PATH = "logs/pipeline_spans.jsonl"
+METRICS_ENABLED = os.getenv("PIPELINE_METRICS", "1") != "0"
+CHARS_PER_TOKEN = 4
+STATS_WINDOW = 500  # Spans más recientes por etapa que se usan para los percentiles
+COUNTERS = ("input_tokens", "output_tokens", "llm_calls", "cache_hits", "retries")
+
+_current_span: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("current_span", default=None)
+_counters_lock = threading.Lock()
+
+def _estimate_tokens(text: str) -> int:
+    return len(text or "") // CHARS_PER_TOKEN
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+class MetricsStore:
+    """Guarda los spans terminados en un log JSONL y en SQLite, y calcula estadísticas por etapa."""
+
+    def __init__(self, db_path: str = METRICS_DB_PATH, log_path: Optional[str] = METRICS_LOG_PATH):
+        self.db_path = db_path
+        self.log_path = log_path
+        self._is_setup = False
+        self._log_lock = threading.Lock()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Establece y devuelve una conexión a la base de datos de métricas."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._is_setup:
+            conn.executescript("""
+            CREATE TABLE IF NOT EXISTS spans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                trace_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                parent TEXT,
+                started_at REAL NOT NULL,
+                wall_ms REAL NOT NULL,
+                input_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                llm_calls INTEGER NOT NULL,
+                cache_hits INTEGER NOT NULL,
+                cache_hit INTEGER NOT NULL,
+                retries INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                attrs_json TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_spans_stage ON spans (stage, id);
+            CREATE INDEX IF NOT EXISTS idx_spans_trace ON spans (trace_id);
+            """)
+            self._is_setup = True
+        return conn
+
+    def record(self, span: Dict[str, Any]) -> None:
+        """Registra un span terminado. Un fallo al registrar nunca interrumpe el pipeline."""
+        if self.log_path:
+            try:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                line = json.dumps(span, ensure_ascii=False)
+                with self._log_lock, open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"Error al escribir el log de métricas: {e}")
+        try:
+            with self._get_connection() as conn:
+                conn.execute(
+                    "INSERT INTO spans (trace_id, stage, parent, started_at, wall_ms, input_tokens, output_tokens, "
+                    "llm_calls, cache_hits, cache_hit, retries, status, attrs_json) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+                    (span['trace_id'], span['stage'], span['parent'], span['started_at'], span['wall_ms'],
+                     span['input_tokens'], span['output_tokens'], span['llm_calls'], span['cache_hits'],
+                     int(span['cache_hit']), span['retries'], span['status'],
+                     json.dumps(span['attrs'], ensure_ascii=False) if span['attrs'] else None)
+                )
+        except sqlite3.Error as e:
+            print(f"Error al escribir en la tabla de métricas: {e}")
+
+    def stage_stats(self, window: int = STATS_WINDOW) -> List[Dict[str, Any]]:
+        """
+        Estadísticas de los `window` spans más recientes de cada etapa: número de ejecuciones,
+        p50/p95 del tiempo, tokens medios, tasa de aciertos de caché, reintentos y errores.
+        """
+        try:
+            with self._get_connection() as conn:
+                stages = [row['stage'] for row in conn.execute("SELECT DISTINCT stage FROM spans ORDER BY stage;")]
+                stats = []
+                for stage in stages:
+                    rows = conn.execute(
+                        "SELECT wall_ms, input_tokens, output_tokens, cache_hit, retries, status FROM spans "
+                        "WHERE stage = ? ORDER BY id DESC LIMIT ?;",
+                        (stage, window)
+                    ).fetchall()
+                    times = sorted(row['wall_ms'] for row in rows)
+                    stats.append({
+                        "stage": stage,
+                        "count": len(rows),
+                        "p50_ms": round(percentile(times, 0.5), 1),
+                        "p95_ms": round(percentile(times, 0.95), 1),
+                        "avg_input_tokens": round(sum(row['input_tokens'] for row in rows) / len(rows)),
+                        "avg_output_tokens": round(sum(row['output_tokens'] for row in rows) / len(rows)),
+                        "cache_hit_rate": round(sum(row['cache_hit'] for row in rows) / len(rows), 2),
+                        "retries": sum(row['retries'] for row in rows),
+                        "errors": sum(row['status'] != "ok" for row in rows)
+                    })
+                return stats
+        except sqlite3.Error as e:
+            print(f"Error al leer la tabla de métricas: {e}")
+            return []
+
+    def trace_spans(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Spans de una ejecución concreta, en orden de inicio."""
+        with self._get_connection() as conn:
+            rows = conn.execute("SELECT * FROM spans WHERE trace_id = ? ORDER BY started_at;", (trace_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def clear(self) -> None:
+        """Vacía la tabla de métricas (el log JSONL se conserva)."""
+        with self._get_connection() as conn:
+            conn.execute("DELETE FROM spans;")
+
+# Instancia global compartida por la aplicación
+metrics_store = MetricsStore()
+
+@contextmanager
+def span(stage: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Mide la etapa `stage` y registra el span al salir. Si no hay un span en curso, este
+    abre una traza nueva. Los atributos adicionales se guardan junto al span.
+    """
+    parent = _current_span.get()
+    record: Dict[str, Any] = {
+        "trace_id": parent['trace_id'] if parent else uuid.uuid4().hex[:12],
+        "stage": stage,
+        "parent": parent['stage'] if parent else None,
+        "started_at": time.time(),
+        **{counter: 0 for counter in COUNTERS},
+        "attrs": attrs,
+        "_parent": parent
+    }
+    token = _current_span.set(record)
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield record
+    except GeneratorExit:
+        status = "cancelled"
+        raise
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        _current_span.reset(token)
+        record.pop("_parent")
+        record.update(
+            wall_ms=round((time.perf_counter() - started) * 1000, 2),
+            cache_hit=record['cache_hits'] > 0 and record['llm_calls'] == 0,
+            status=status
+        )
+        if METRICS_ENABLED:
+            metrics_store.record(record)
+
+def _add(counter: str, amount: int) -> None:
+    """Suma `amount` al contador en el span en curso y en todos sus padres."""
+    current = _current_span.get()
+    with _counters_lock:
+        while current is not None:
+            current[counter] += amount
+            current = current.get('_parent')
+
+def record_llm_call(prompt: str, response: Any) -> None:
+    """Registra una llamada real al modelo con sus tokens estimados."""
+    _add("llm_calls", 1)
+    _add("input_tokens", _estimate_tokens(prompt))
+    _add("output_tokens", _estimate_tokens(response if isinstance(response, str) else ""))
+
+def record_cache_hit() -> None:
+    """Registra una respuesta servida desde una caché o un almacén sin llamar al modelo."""
+    _add("cache_hits", 1)
+
+def record_retry() -> None:
+    """Registra un reintento por error de cuota."""
+    _add("retries", 1)
@@ -5,26 +5,110 @@ Módulo responsable de todas las interacciones con la base de datos SQLite.
 Esta versión implementa programación defensiva y transacciones para máxima robustez.
 """
 
+import queue
 import sqlite3
-from typing import Dict, Any, Optional
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Iterator, List, Tuple
 
 DB_PATH = "database/careerforge.db"
+DEFAULT_USER_ID = 1  # Usuario de la instalación local de un solo usuario
+DEFAULT_POOL_SIZE = 8
 
-class DatabaseManager:
+# Ajustes aplicados una vez a cada conexión del pool:
+# WAL permite lecturas concurrentes con una escritura, y `synchronous=NORMAL` es seguro en WAL
+# con muchos menos fsync que el modo por defecto.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA foreign_keys=ON;",
+    "PRAGMA temp_store=MEMORY;",
+    "PRAGMA cache_size=-16000;",  # ~16 MB de caché de páginas
+)
+
+class ConnectionPool:
     """
-    Gestiona la conexión, configuración y operaciones CRUD con la base de datos SQLite.
+    Pool de conexiones SQLite seguro para hilos.
+
+    Las conexiones se crean bajo demanda hasta `size` y se reutilizan; si todas están
+    ocupadas, el hilo espera a que se libere una. Cada sesión concurrente de Streamlit
+    obtiene así su propia conexión ya configurada, sin pagar el coste de abrirla.
     """
 
-    def __init__(self, db_path: str = DB_PATH):
+    def __init__(self, db_path: str, size: int = DEFAULT_POOL_SIZE):
         self.db_path = db_path
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
 
-    def _get_connection(self) -> sqlite3.Connection:
-        """Establece y devuelve una conexión a la base de datos."""
-        conn = sqlite3.connect(self.db_path)
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
         # Permite acceder a las columnas por su nombre, como un diccionario.
         conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
         return conn
 
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Presta una conexión del pool durante el bloque `with` y la devuelve al terminar."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if len(self._all) < self.size:
+                    conn = self._connect()
+                    self._all.append(conn)
+            if conn is None:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close_all(self) -> None:
+        """Cierra todas las conexiones. El pool volverá a crearlas en el próximo uso."""
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+            self._idle = queue.LifoQueue()
+
+class DatabaseManager:
+    """
+    Gestiona la conexión, configuración y operaciones CRUD con la base de datos SQLite.
+    Todas las operaciones de perfil reciben el `user_id` del usuario afectado.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, pool_size: int = DEFAULT_POOL_SIZE):
+        self.db_path = db_path
+        self._pool = ConnectionPool(db_path, pool_size)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Ejecuta un bloque dentro de una transacción de escritura: confirma si termina bien y
+        revierte si falla. `BEGIN IMMEDIATE` reserva el bloqueo de escritura desde el inicio,
+        de modo que dos guardados concurrentes se esperan en lugar de fallar a mitad.
+        """
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE;")
+            try:
+                yield cursor
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+
+    def close(self) -> None:
+        """Cierra las conexiones del pool (se reabrirán en el próximo uso)."""
+        self._pool.close_all()
+
     def setup_database(self) -> None:
         """Crea las tablas de la base de datos si no existen."""
         # El esquema permite valores NULL en la mayoría de los campos para ser flexible.
@@ -51,82 +135,266 @@ class DatabaseManager:
             description TEXT,
             FOREIGN KEY (experience_id) REFERENCES experiences (id) ON DELETE CASCADE
         );
+        -- Identidades autenticadas (p. ej. el email de `st.user`) y el usuario que tienen asignado.
+        CREATE TABLE IF NOT EXISTS user_identities (
+            identity TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL UNIQUE
+        );
+        -- Índices para las búsquedas por usuario y por experiencia (y sus ORDER BY id).
+        CREATE INDEX IF NOT EXISTS idx_experiences_user_id ON experiences (user_id, id);
+        CREATE INDEX IF NOT EXISTS idx_achievements_experience_id ON achievements (experience_id, id);
         """
         try:
-            with self._get_connection() as conn:
+            with self._pool.connection() as conn:
                 conn.executescript(schema)
         except sqlite3.Error as e:
             print(f"Error al configurar la base de datos: {e}")
             raise
 
-    def save_profile(self, profile_data: Dict[str, Any]) -> None:
+    def save_profile(self, profile_data: Dict[str, Any], user_id: int = DEFAULT_USER_ID) -> Dict[str, int]:
         """
-        Guarda o actualiza un perfil de usuario completo de forma segura y transaccional.
+        Guarda el perfil del usuario `user_id` de forma incremental, segura y transaccional.
+
+        El perfil recibido se compara con el almacenado y solo se emiten los UPDATE, INSERT y
+        DELETE necesarios. Las experiencias y logros se identifican por su clave `id`: los que
+        no la tienen (o tienen una desconocida) se insertan, y los almacenados que ya no aparecen
+        se eliminan. Los IDs asignados se escriben de vuelta en `profile_data`, de modo que los
+        siguientes guardados de la misma sesión también sean incrementales.
         Maneja datos incompletos sin fallar.
+
+        Returns:
+            Un diccionario con el número de filas insertadas, actualizadas y eliminadas.
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            # Iniciar una transacción para asegurar la integridad de los datos (todo o nada).
-            cursor.execute("BEGIN TRANSACTION;")
-            try:
-                # Limpiar datos antiguos para el usuario (ID=1 para esta app de un solo usuario)
-                cursor.execute("DELETE FROM user WHERE id = 1;")
-                
-                # --- Guardado Defensivo de Datos de Usuario ---
-                # Usamos `get()` con un valor por defecto para evitar errores si las claves no existen.
-                contact_info = profile_data.get('contact') or {}
-                user_tuple = (
-                    1, # ID de usuario hardcodeado
-                    profile_data.get('full_name'),
-                    contact_info.get('email'),
-                    contact_info.get('linkedin'),
-                    contact_info.get('phone'),
-                    profile_data.get('base_summary')
-                )
-                cursor.execute(
-                    "INSERT INTO user (id, full_name, email, linkedin, phone, base_summary) VALUES (?, ?, ?, ?, ?, ?);",
-                    user_tuple
-                )
+        changes = {"inserted": 0, "updated": 0, "deleted": 0}
+        try:
+            with self._transaction() as cursor:
+                self._save_user_row(cursor, user_id, profile_data, changes)
+                stored_experiences = self._fetch_stored_state(cursor, user_id)
+                stored_count = len(stored_experiences)
 
-                # --- Guardado Defensivo de Experiencias y Logros ---
-                # Usamos `get('experiences', [])` para iterar sobre una lista vacía si la clave no existe.
-                for exp in profile_data.get('experiences', []):
-                    cursor.execute(
-                        "INSERT INTO experiences (user_id, role, company, period) VALUES (1, ?, ?, ?);",
-                        (exp.get('role'), exp.get('company'), exp.get('period'))
-                    )
-                    experience_id = cursor.lastrowid
-                    
-                    # El mismo patrón defensivo para los logros dentro de cada experiencia.
-                    for ach in exp.get('achievements', []):
+                # --- Experiencias ---
+                # Usamos `or []` para iterar sobre una lista vacía si la clave no existe o es None.
+                experiences = profile_data.get('experiences') or []
+                new_experiences = []
+                new_achievements = []  # Pares (experiencia, logro) pendientes de insertar
+                for exp in experiences:
+                    stored = stored_experiences.pop(exp.get('id'), None)
+                    if stored is None:
+                        new_experiences.append(exp)
+                        continue
+                    stored_fields, stored_achievements = stored
+                    fields = (exp.get('role'), exp.get('company'), exp.get('period'))
+                    if fields != stored_fields:
                         cursor.execute(
-                            "INSERT INTO achievements (experience_id, description) VALUES (?, ?);",
-                            (experience_id, ach.get('description'))
+                            "UPDATE experiences SET role = ?, company = ?, period = ? WHERE id = ?;",
+                            (*fields, exp['id'])
                         )
-                
-                # Si todo ha ido bien, confirma todos los cambios en la base de datos.
-                conn.commit()
-                print("Perfil guardado con éxito en la base de datos.")
+                        changes['updated'] += 1
+                    new_achievements.extend(
+                        (exp, ach) for ach in self._diff_achievements(cursor, exp, stored_achievements, changes)
+                    )
 
-            except sqlite3.Error as e:
-                # Si ocurre cualquier error, deshace todos los cambios desde el "BEGIN TRANSACTION".
-                print(f"Error durante la transacción. Se revirtieron los cambios: {e}")
-                conn.rollback()
-                raise
+                # Las experiencias almacenadas que ya no aparecen se eliminan junto con sus logros.
+                # Si no queda ninguna (p. ej. un perfil nuevo importado de un CV) basta con dos
+                # DELETE en bloque; si no, se borra por clave primaria sin recorrer la tabla de logros.
+                if stored_experiences and len(stored_experiences) == stored_count:
+                    cursor.execute(
+                        "DELETE FROM achievements WHERE experience_id IN (SELECT id FROM experiences WHERE user_id = ?);",
+                        (user_id,)
+                    )
+                    cursor.execute("DELETE FROM experiences WHERE user_id = ?;", (user_id,))
+                    changes['deleted'] += stored_count
+                elif stored_experiences:
+                    cursor.executemany(
+                        "DELETE FROM achievements WHERE id = ?;",
+                        [(ach_id,) for _, achievements in stored_experiences.values() for ach_id in achievements]
+                    )
+                    cursor.executemany(
+                        "DELETE FROM experiences WHERE id = ?;",
+                        [(experience_id,) for experience_id in stored_experiences]
+                    )
+                    changes['deleted'] += len(stored_experiences)
+
+                # Los IDs nuevos se asignan aquí, dentro de la transacción, para poder insertar
+                # en bloque con `executemany` y devolverlos al perfil de la sesión.
+                next_experience_id = self._next_id(cursor, "experiences")
+                experience_rows = []
+                for exp in new_experiences:
+                    exp['id'] = next_experience_id
+                    experience_rows.append((exp['id'], user_id, exp.get('role'), exp.get('company'), exp.get('period')))
+                    next_experience_id += 1
+                cursor.executemany(
+                    "INSERT INTO experiences (id, user_id, role, company, period) VALUES (?, ?, ?, ?, ?);",
+                    experience_rows
+                )
+                changes['inserted'] += len(experience_rows)
+
+                # Todos los logros nuevos (de experiencias nuevas o existentes) se insertan de una vez.
+                for exp in new_experiences:
+                    new_achievements.extend((exp, ach) for ach in exp.get('achievements') or [])
+                next_achievement_id = self._next_id(cursor, "achievements")
+                achievement_rows = []
+                for exp, ach in new_achievements:
+                    ach['id'] = next_achievement_id
+                    achievement_rows.append((ach['id'], exp['id'], ach.get('description')))
+                    next_achievement_id += 1
+                cursor.executemany(
+                    "INSERT INTO achievements (id, experience_id, description) VALUES (?, ?, ?);",
+                    achievement_rows
+                )
+                changes['inserted'] += len(achievement_rows)
+
+            print(f"Perfil guardado con éxito en la base de datos ({changes['inserted']} inserciones, "
+                  f"{changes['updated']} actualizaciones, {changes['deleted']} eliminaciones).")
+            return changes
+        except sqlite3.Error as e:
+            # Si ocurre cualquier error, la transacción ya se ha revertido por completo.
+            print(f"Error durante la transacción. Se revirtieron los cambios: {e}")
+            raise
+
+    @staticmethod
+    def _save_user_row(
+        cursor: sqlite3.Cursor,
+        user_id: int,
+        profile_data: Dict[str, Any],
+        changes: Dict[str, int]
+    ) -> None:
+        """Inserta o actualiza la fila del usuario solo si cambió."""
+        # Usamos `get()` con un valor por defecto para evitar errores si las claves no existen.
+        contact_info = profile_data.get('contact') or {}
+        user_fields = (
+            profile_data.get('full_name'),
+            contact_info.get('email'),
+            contact_info.get('linkedin'),
+            contact_info.get('phone'),
+            profile_data.get('base_summary')
+        )
+        cursor.execute("SELECT full_name, email, linkedin, phone, base_summary FROM user WHERE id = ?;", (user_id,))
+        stored = cursor.fetchone()
+        if stored is None:
+            cursor.execute(
+                "INSERT INTO user (id, full_name, email, linkedin, phone, base_summary) VALUES (?, ?, ?, ?, ?, ?);",
+                (user_id, *user_fields)
+            )
+            changes['inserted'] += 1
+        elif tuple(stored) != user_fields:
+            cursor.execute(
+                "UPDATE user SET full_name = ?, email = ?, linkedin = ?, phone = ?, base_summary = ? WHERE id = ?;",
+                (*user_fields, user_id)
+            )
+            changes['updated'] += 1
+
+    @staticmethod
+    def _diff_achievements(
+        cursor: sqlite3.Cursor,
+        experience: Dict[str, Any],
+        stored_achievements: Dict[int, Optional[str]],
+        changes: Dict[str, int]
+    ) -> List[Dict[str, Any]]:
+        """
+        Aplica a los logros de una experiencia existente el mismo diff que a las experiencias:
+        actualiza los modificados y elimina los que ya no aparecen.
+        `stored_achievements` relaciona cada ID almacenado con su descripción.
+        Devuelve los logros nuevos, que el llamador inserta en bloque.
+        """
+        stored_by_id = dict(stored_achievements)
+        updates = []
+        new_achievements = []
+        for ach in experience.get('achievements') or []:
+            ach_id = ach.get('id')
+            if ach_id not in stored_by_id:
+                new_achievements.append(ach)
+            elif ach.get('description') != stored_by_id.pop(ach_id):
+                updates.append((ach.get('description'), ach_id))
+
+        if updates:
+            cursor.executemany("UPDATE achievements SET description = ? WHERE id = ?;", updates)
+        if stored_by_id:
+            cursor.executemany("DELETE FROM achievements WHERE id = ?;", [(ach_id,) for ach_id in stored_by_id])
+        changes['updated'] += len(updates)
+        changes['deleted'] += len(stored_by_id)
+        return new_achievements
 
-    def load_profile(self) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _fetch_stored_state(cursor: sqlite3.Cursor, user_id: int) -> Dict[int, Tuple[Tuple, Dict[int, Optional[str]]]]:
         """
-        Carga el perfil completo del usuario y lo reconstruye en un diccionario de Python limpio.
+        Obtiene el estado almacenado que necesita el diff, con tuplas en lugar de diccionarios:
+        {id_experiencia: ((rol, empresa, periodo), {id_logro: descripción})}.
+        """
+        state: Dict[int, Tuple[Tuple, Dict[int, Optional[str]]]] = {}
+        # Un cursor sin `sqlite3.Row` evita crear un objeto por fila en perfiles grandes.
+        cursor = cursor.connection.cursor()
+        cursor.row_factory = None
+        rows = cursor.execute("""
+            SELECT e.id, e.role, e.company, e.period, a.id, a.description
+            FROM experiences e
+            LEFT JOIN achievements a ON a.experience_id = e.id
+            WHERE e.user_id = ?;
+        """, (user_id,))
+        for experience_id, role, company, period, achievement_id, description in rows:
+            entry = state.get(experience_id)
+            if entry is None:
+                entry = state[experience_id] = ((role, company, period), {})
+            if achievement_id is not None:
+                entry[1][achievement_id] = description
+        return state
+
+    @staticmethod
+    def _next_id(cursor: sqlite3.Cursor, table: str) -> int:
+        """Devuelve el siguiente ID libre de una tabla AUTOINCREMENT sin reutilizar IDs anteriores."""
+        cursor.execute(
+            f"SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 0)) + 1;",
+            (table,)
+        )
+        return cursor.fetchone()[0]
+
+    @staticmethod
+    def _fetch_experiences(cursor: sqlite3.Cursor, user_id: int) -> List[Dict[str, Any]]:
+        """Obtiene las experiencias del usuario con sus logros anidados mediante un único LEFT JOIN."""
+        cursor.execute("""
+            SELECT e.id, e.user_id, e.role, e.company, e.period,
+                   a.id AS achievement_id, a.description
+            FROM experiences e
+            LEFT JOIN achievements a ON a.experience_id = e.id
+            WHERE e.user_id = ?
+            ORDER BY e.id, a.id;
+        """, (user_id,))
+        experiences = []
+        experience = None
+        for row in cursor.fetchall():
+            if experience is None or experience['id'] != row['id']:
+                experience = {
+                    "id": row['id'],
+                    "user_id": row['user_id'],
+                    "role": row['role'],
+                    "company": row['company'],
+                    "period": row['period'],
+                    "achievements": [] # Asegurarse de que la clave siempre exista
+                }
+                experiences.append(experience)
+            if row['achievement_id'] is not None:
+                experience['achievements'].append({
+                    "id": row['achievement_id'],
+                    "experience_id": row['id'],
+                    "description": row['description']
+                })
+        return experiences
+
+    def load_profile(self, user_id: int = DEFAULT_USER_ID) -> Optional[Dict[str, Any]]:
+        """
+        Carga el perfil completo del usuario `user_id` y lo reconstruye en un diccionario de Python limpio.
+        Las experiencias y sus logros se obtienen con una única consulta (LEFT JOIN).
         """
         try:
-            with self._get_connection() as conn:
+            with self._pool.connection() as conn:
                 cursor = conn.cursor()
-                
-                cursor.execute("SELECT * FROM user WHERE id = 1;")
+
+                cursor.execute("SELECT * FROM user WHERE id = ?;", (user_id,))
                 user_row = cursor.fetchone()
                 if not user_row:
                     return None  # No hay perfil guardado.
-                
+
                 # Reconstruir el perfil base
                 profile = {
                     "full_name": user_row['full_name'],
@@ -136,29 +404,60 @@ class DatabaseManager:
                         "linkedin": user_row['linkedin'],
                         "phone": user_row['phone']
                     },
-                    "experiences": [] # Asegurarse de que la clave siempre exista
+                    # Experiencias y sus logros anidados, obtenidos en una sola consulta
+                    "experiences": self._fetch_experiences(cursor, user_id)
                 }
-                
-                # Obtener experiencias y sus logros anidados
-                cursor.execute("SELECT * FROM experiences WHERE user_id = 1 ORDER BY id;")
-                for exp_row in cursor.fetchall():
-                    experience = dict(exp_row)
-                    experience['achievements'] = [] # Asegurarse de que la clave siempre exista
-                    
-                    cursor.execute("SELECT * FROM achievements WHERE experience_id = ? ORDER BY id;", (experience['id'],))
-                    ach_rows = cursor.fetchall()
-                    if ach_rows:
-                        experience['achievements'] = [dict(ach_row) for ach_row in ach_rows]
-                    
-                    profile['experiences'].append(experience)
-                    
                 return profile
         except sqlite3.Error as e:
             print(f"Error al cargar el perfil desde la base de datos: {e}")
             return None
 
+    def delete_profile(self, user_id: int) -> bool:
+        """Elimina el perfil de un usuario junto con sus experiencias y logros (ON DELETE CASCADE)."""
+        try:
+            with self._transaction() as cursor:
+                cursor.execute("DELETE FROM user WHERE id = ?;", (user_id,))
+                return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error al eliminar el perfil {user_id}: {e}")
+            raise
+
+    def user_id_for_identity(self, identity: str) -> int:
+        """
+        Devuelve el usuario asociado a una identidad autenticada y, si es nueva, le asigna un ID
+        propio que no coincide con ningún perfil existente (tampoco con el local por defecto).
+        """
+        with self._transaction() as cursor:
+            row = cursor.execute("SELECT user_id FROM user_identities WHERE identity = ?;", (identity,)).fetchone()
+            if row is not None:
+                return row[0]
+            user_id = cursor.execute("""
+                SELECT MAX(id) FROM (
+                    SELECT MAX(id) AS id FROM user UNION ALL SELECT MAX(user_id) FROM user_identities
+                );
+            """).fetchone()[0]
+            user_id = max(user_id or 0, DEFAULT_USER_ID) + 1
+            cursor.execute("INSERT INTO user_identities (identity, user_id) VALUES (?, ?);", (identity, user_id))
+            return user_id
+
+    def list_user_ids(self) -> List[int]:
+        """Devuelve los IDs de todos los usuarios con un perfil guardado."""
+        with self._pool.connection() as conn:
+            return [row[0] for row in conn.execute("SELECT id FROM user ORDER BY id;")]
+
 # Instancia global para ser usada por la aplicación
 db_manager = DatabaseManager()
+_schema_lock = threading.Lock()
+_schema_ready = False
 
-# Crear la estructura de la DB al iniciar el módulo, si es necesario
-db_manager.setup_database()
+def get_db_manager() -> DatabaseManager:
+    """
+    Devuelve la instancia global asegurando que el esquema exista.
+    La creación de tablas se ejecuta una sola vez por proceso (en lugar de al importar el módulo).
+    """
+    global _schema_ready
+    with _schema_lock:
+        if not _schema_ready:
+            db_manager.setup_database()
+            _schema_ready = True
+    return db_manager